@@ -82,4 +82,4 @@ class RawGatewayEvent(BaseEvent):
     """
 
     data: dict = attrs.field(repr=False, factory=dict)
-    """Raw Data from the gateway"""
+    """Raw Data from the gateway. When dispatched to listeners this is a read-only mapping shared between them"""
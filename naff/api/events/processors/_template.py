@@ -9,6 +9,7 @@ from naff.models.discord.user import NaffUser
 if TYPE_CHECKING:
     from naff.client.smart_cache import GlobalCache
     from naff.api.events.internal import BaseEvent
+    from naff.models.discord.snowflake import Snowflake_Type
 
 __all__ = ("Processor", "EventMixinTemplate")
 
@@ -45,6 +46,7 @@ class EventMixinTemplate:
     synchronise_interactions: Callable[[], Coroutine]
     _user: NaffUser
     _guild_event: asyncio.Event
+    _receive_guild: Callable[["Snowflake_Type", bool], None]
 
     def __init__(self) -> None:
         for call in inspect.getmembers(self):
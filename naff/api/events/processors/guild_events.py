@@ -37,15 +37,27 @@ class GuildEvents(EventMixinTemplate):
             # guild already cached, most likely an unavailable guild coming back online
             new_guild = False
 
-        guild = self.cache.place_guild_data(event.data)
+        if self.guild_create_slice_size or self.defer_guild_members:
+            guild = await self.cache.place_guild_data_incremental(
+                event.data,
+                self.guild_create_slice_size or 1000,
+                # once ready, nothing is waiting on GUILD_CREATE, so there is no reason to defer
+                defer_members=self.defer_guild_members and not self.is_ready,
+            )
+        else:
+            guild = self.cache.place_guild_data(event.data)
 
         self._user._guild_ids.add(to_snowflake(event.data.get("id")))  # noqa : w0212
 
+        self._receive_guild(guild.id, unavailable=guild.unavailable)
         self._guild_event.set()
 
         if self.fetch_members and not guild.chunked.is_set():  # noqa
             # delays events until chunking has completed
-            await guild.chunk()
+            if self.chunk_scheduler is not None:
+                await self.chunk_scheduler.chunk(guild)
+            else:
+                await guild.chunk(self.member_fetch_concurrency)
 
         if new_guild:
             self.dispatch(events.GuildJoin(guild.id))
@@ -61,6 +73,8 @@ class GuildEvents(EventMixinTemplate):
     async def _on_raw_guild_delete(self, event: "RawGatewayEvent") -> None:
         guild_id = int(event.data.get("id"))
         if event.data.get("unavailable", False):
+            # a guild that is still unavailable after READY is sent as a delete, rather than a create
+            self._receive_guild(guild_id, unavailable=True)
             self.dispatch(events.GuildUnavailable(guild_id))
         else:
             # noinspection PyProtectedMember
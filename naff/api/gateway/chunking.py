@@ -0,0 +1,182 @@
+"""
+Coordinated member chunking over the gateway.
+
+By default, `fetch_members` makes every guild fetch its members over http on its own, as soon as it is created. A
+`ChunkScheduler` instead requests the members of each guild over the gateway, from a queue per shard that sends the
+requests of the most active guilds first. Requests go through the shard's bulk send queue, so they stay within the
+gateway's send budget, and only a few are in flight on each shard at once, which bounds the memory taken by chunks.
+
+??? Hint "Example Usage:"
+    ```python
+    bot = Client(intents=Intents.DEFAULT | Intents.GUILD_MEMBERS, fetch_members=True, chunk_scheduler=ChunkScheduler())
+    ```
+
+!!! note
+    Discord only accepts one guild per Request Guild Members payload, so each guild is still its own request.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import TYPE_CHECKING, Callable
+
+from naff.client.const import get_logger
+
+if TYPE_CHECKING:
+    from naff.models.discord.guild import Guild
+
+__all__ = ("ChunkScheduler", "guild_activity")
+
+
+def guild_activity(guild: "Guild") -> float:
+    """
+    The default priority of a guild, the number of presences it was created with, falling back on its member count.
+
+    Args:
+        guild: The guild to rank
+
+    Returns:
+        The priority of the guild, higher is chunked sooner
+
+    """
+    return len(guild.presences) or guild.member_count
+
+
+class ChunkScheduler:
+    """
+    Requests the members of guilds over the gateway, a few at a time per shard, in order of priority.
+
+    Args:
+        max_in_flight: How many requests each shard may have waiting for their chunks at once
+        presences: Request the presences of members too, this requires the `GUILD_PRESENCES` intent
+        timeout: How long to wait for the chunks of a guild before giving up on it, in seconds
+        priority: Ranks guilds, those ranked higher are requested first. Defaults to `guild_activity`
+
+    """
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = 4,
+        presences: bool = False,
+        timeout: float = 120,
+        priority: Callable[["Guild"], float] | None = None,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.presences = presences
+        self.timeout = timeout
+        self.priority = priority or guild_activity
+        self.logger = get_logger()
+
+        self.total = 0
+        """The number of guilds scheduled"""
+        self.completed = 0
+        """The number of guilds whose members have been cached"""
+        self.failed = 0
+        """The number of guilds whose chunks did not all arrive in time"""
+
+        self._queues: dict[int, list] = {}
+        self._slots: dict[int, asyncio.Semaphore] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._requests: set[asyncio.Task] = set()
+        self._order = itertools.count()
+        self._started_at: float | None = None
+        self._last_report = 0.0
+
+    @property
+    def progress(self) -> dict:
+        """How many guilds have been chunked, and how many are waiting to be."""
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": len(self._requests),
+            "pending": sum(len(queue) for queue in self._queues.values()),
+            "elapsed": time.monotonic() - self._started_at if self._started_at is not None else 0.0,
+        }
+
+    def schedule(self, guild: "Guild") -> asyncio.Future:
+        """
+        Queue a guild to be chunked.
+
+        Args:
+            guild: The guild to chunk
+
+        Returns:
+            A future that resolves to whether every chunk of the guild was received
+
+        """
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+
+        shard_id = guild._client.get_guild_websocket(guild.id).shard[0]
+        future = asyncio.get_running_loop().create_future()
+        # the order breaks ties, so guilds themselves are never compared
+        heapq.heappush(self._queues.setdefault(shard_id, []), (-self.priority(guild), next(self._order), guild, future))
+        self.total += 1
+
+        worker = self._workers.get(shard_id)
+        if worker is None or worker.done():
+            self._workers[shard_id] = asyncio.create_task(self._run_shard(shard_id))
+        return future
+
+    async def chunk(self, guild: "Guild") -> bool:
+        """
+        Queue a guild to be chunked, and wait for it to be.
+
+        Args:
+            guild: The guild to chunk
+
+        Returns:
+            Whether every chunk of the guild was received
+
+        """
+        return await self.schedule(guild)
+
+    async def _run_shard(self, shard_id: int) -> None:
+        queue = self._queues[shard_id]
+        slots = self._slots.setdefault(shard_id, asyncio.Semaphore(self.max_in_flight))
+
+        while queue:
+            await slots.acquire()
+            if not queue:
+                slots.release()
+                return
+            # the guild is only picked once a slot is free, so guilds queued in the meantime are ranked with the rest
+            _, _, guild, future = heapq.heappop(queue)
+            task = asyncio.create_task(self._request(guild, future))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _request(self, guild: "Guild", future: asyncio.Future) -> None:
+        guild.chunked.clear()
+        try:
+            ws = guild._client.get_guild_websocket(guild.id)
+            await ws.request_member_chunks(
+                guild.id, limit=0, presences=self.presences, nonce=f"naff{next(self._order)}"
+            )
+            await asyncio.wait_for(guild.chunked.wait(), self.timeout)
+        except Exception as e:
+            self.failed += 1
+            self.logger.warning(f"Failed to chunk {guild.id}, continuing without all of its members: {e!r}")
+            # nothing else will set it, and startup waits on it
+            guild.chunked.set()
+            succeeded = False
+        else:
+            self.completed += 1
+            succeeded = True
+
+        if not future.done():
+            future.set_result(succeeded)
+        self._report()
+
+    def _report(self) -> None:
+        progress = self.progress
+        finished = progress["completed"] + progress["failed"]
+        if finished == progress["total"] or time.monotonic() - self._last_report >= 5:
+            self._last_report = time.monotonic()
+            self.logger.info(
+                f"Chunked {finished}/{progress['total']} guilds in {progress['elapsed']:.1f}s"
+                f" ({progress['in_flight']} in flight, {progress['failed']} failed)"
+            )
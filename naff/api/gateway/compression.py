@@ -0,0 +1,115 @@
+"""
+Transport compression for gateway connections.
+
+Each connection owns one instance of a transport compression, as the gateway compresses its stream with a shared
+context for the lifetime of the connection. A new instance must be created whenever the connection is re-established.
+"""
+import zlib
+from abc import ABC, abstractmethod
+
+__all__ = (
+    "TransportCompression",
+    "NoCompression",
+    "ZlibStreamCompression",
+    "ZstdStreamCompression",
+    "get_transport_compression",
+)
+
+try:
+    import zstandard
+
+    zstd_imported = True
+except ImportError:
+    zstd_imported = False
+
+
+class TransportCompression(ABC):
+    """The base class for all transport compressions."""
+
+    name: str | None = None
+    """The name of this compression, as passed to the gateway in the `compress` query parameter."""
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes | None:
+        """
+        Feed a binary websocket frame to the decompressor.
+
+        Args:
+            data: The raw frame
+
+        Returns:
+            The decompressed payload, or None if the payload is not complete yet
+
+        """
+        ...
+
+
+class NoCompression(TransportCompression):
+    """Binary frames are passed through as-is."""
+
+    def decompress(self, data: bytes) -> bytes | None:
+        return data
+
+
+class ZlibStreamCompression(TransportCompression):
+    """A zlib stream, where each payload is terminated with a `Z_SYNC_FLUSH` suffix."""
+
+    name = "zlib-stream"
+    suffix = b"\x00\x00\xff\xff"
+
+    def __init__(self) -> None:
+        self._zlib = zlib.decompressobj()
+        self._buffer = bytearray()
+
+    def decompress(self, data: bytes) -> bytes | None:
+        if not data.endswith(self.suffix):
+            # message isn't complete yet, wait
+            self._buffer.extend(data)
+            return None
+
+        if not self._buffer:
+            # the payload fit in a single frame, which is most of them, inflate it without copying it into the buffer
+            return self._zlib.decompress(data)
+
+        self._buffer.extend(data)
+        msg = self._zlib.decompress(self._buffer)
+        self._buffer.clear()
+        return msg
+
+
+class ZstdStreamCompression(TransportCompression):
+    """A zstd stream, where each frame contains a complete, flushed payload."""
+
+    name = "zstd-stream"
+
+    def __init__(self) -> None:
+        if not zstd_imported:
+            raise RuntimeError("Please install naff[zstd] to use zstd-stream compression.")
+        self._zstd = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes | None:
+        return self._zstd.decompress(data)
+
+
+_compressions: dict[str | None, type[TransportCompression]] = {
+    None: NoCompression,
+    ZlibStreamCompression.name: ZlibStreamCompression,
+    ZstdStreamCompression.name: ZstdStreamCompression,
+}
+
+
+def get_transport_compression(name: str | None) -> type[TransportCompression]:
+    """
+    Get a transport compression by name.
+
+    Args:
+        name: The name of the compression, or None for no compression
+
+    Returns:
+        The transport compression class
+
+    """
+    try:
+        return _compressions[name]
+    except KeyError:
+        raise ValueError(f"Unsupported transport compression: {name}") from None
@@ -0,0 +1,270 @@
+"""
+An implementation of Erlang's External Term Format, as used by Discord's gateway when `encoding=etf` is requested.
+
+Decoded payloads mirror what the JSON gateway produces; binaries become `str`, maps become `dict`, tuples and lists
+become `list`, and the atoms `nil`, `true` and `false` become `None`, `True` and `False`.
+
+!!! note
+    Over ETF, Discord transmits snowflakes as integers rather than strings. Everything in NAFF passes snowflakes
+    through `to_snowflake`, so this is transparent to the event processors.
+
+If `erlpack` is installed, it will be used to encode and decode payloads instead of the pure python implementation.
+"""
+import struct
+import zlib
+from enum import IntEnum
+from typing import Any
+
+__all__ = ("ETFDecodeError", "loads", "dumps")
+
+try:
+    import erlpack
+
+    # erlpack only decodes binaries to `str` when asked to, make sure this version supports that
+    erlpack_available = erlpack.unpack(erlpack.pack("naff"), encoding="utf-8") == "naff"
+except Exception:
+    erlpack_available = False
+
+
+FORMAT_VERSION = 131
+
+
+class Tag(IntEnum):
+    NEW_FLOAT_EXT = 70
+    COMPRESSED = 80
+    SMALL_INTEGER_EXT = 97
+    INTEGER_EXT = 98
+    FLOAT_EXT = 99
+    ATOM_EXT = 100
+    SMALL_TUPLE_EXT = 104
+    LARGE_TUPLE_EXT = 105
+    NIL_EXT = 106
+    STRING_EXT = 107
+    LIST_EXT = 108
+    BINARY_EXT = 109
+    SMALL_BIG_EXT = 110
+    LARGE_BIG_EXT = 111
+    SMALL_ATOM_EXT = 115
+    MAP_EXT = 116
+    ATOM_UTF8_EXT = 118
+    SMALL_ATOM_UTF8_EXT = 119
+
+
+_ATOMS = {"nil": None, "null": None, "true": True, "false": False}
+
+_u16 = struct.Struct(">H")
+_u32 = struct.Struct(">I")
+_i32 = struct.Struct(">i")
+_f64 = struct.Struct(">d")
+
+
+class ETFDecodeError(ValueError):
+    """Raised when a payload is not valid External Term Format."""
+
+
+class _Decoder:
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: bytes) -> None:
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def read(self, size: int) -> memoryview:
+        start = self.offset
+        self.offset += size
+        if self.offset > len(self.data):
+            raise ETFDecodeError("Unexpected end of payload")
+        return self.data[start : self.offset]
+
+    def read_u8(self) -> int:
+        if self.offset + 1 > len(self.data):
+            raise ETFDecodeError("Unexpected end of payload")
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def read_u16(self) -> int:
+        if self.offset + 2 > len(self.data):
+            raise ETFDecodeError("Unexpected end of payload")
+        (value,) = _u16.unpack_from(self.data, self.offset)
+        self.offset += 2
+        return value
+
+    def read_u32(self) -> int:
+        if self.offset + 4 > len(self.data):
+            raise ETFDecodeError("Unexpected end of payload")
+        (value,) = _u32.unpack_from(self.data, self.offset)
+        self.offset += 4
+        return value
+
+    def read_atom(self, size: int, encoding: str) -> Any:
+        name = str(self.read(size), encoding)
+        return _ATOMS.get(name, name)
+
+    def read_big(self, size: int) -> int:
+        sign = self.read_u8()
+        value = int.from_bytes(self.read(size), "little")
+        return -value if sign else value
+
+    def decode(self) -> Any:  # noqa: C901
+        tag = self.read_u8()
+
+        match tag:
+            case Tag.BINARY_EXT:
+                return str(self.read(self.read_u32()), "utf-8")
+            case Tag.MAP_EXT:
+                arity = self.read_u32()
+                result = {}
+                for _ in range(arity):
+                    key = self.decode()
+                    result[key] = self.decode()
+                return result
+            case Tag.SMALL_INTEGER_EXT:
+                return self.read_u8()
+            case Tag.INTEGER_EXT:
+                (value,) = _i32.unpack(self.read(4))
+                return value
+            case Tag.SMALL_ATOM_UTF8_EXT:
+                return self.read_atom(self.read_u8(), "utf-8")
+            case Tag.ATOM_UTF8_EXT:
+                return self.read_atom(self.read_u16(), "utf-8")
+            case Tag.SMALL_ATOM_EXT:
+                return self.read_atom(self.read_u8(), "latin-1")
+            case Tag.ATOM_EXT:
+                return self.read_atom(self.read_u16(), "latin-1")
+            case Tag.LIST_EXT:
+                length = self.read_u32()
+                result = [self.decode() for _ in range(length)]
+                tail = self.decode()
+                if tail != []:
+                    # improper lists do not exist in JSON, keep the tail rather than silently dropping it
+                    result.append(tail)
+                return result
+            case Tag.NIL_EXT:
+                return []
+            case Tag.STRING_EXT:
+                # erlang encodes lists of bytes this way, these are lists of integers in JSON
+                return list(self.read(self.read_u16()))
+            case Tag.SMALL_BIG_EXT:
+                return self.read_big(self.read_u8())
+            case Tag.LARGE_BIG_EXT:
+                return self.read_big(self.read_u32())
+            case Tag.NEW_FLOAT_EXT:
+                (value,) = _f64.unpack(self.read(8))
+                return value
+            case Tag.FLOAT_EXT:
+                return float(str(self.read(31), "latin-1").rstrip("\x00"))
+            case Tag.SMALL_TUPLE_EXT:
+                return [self.decode() for _ in range(self.read_u8())]
+            case Tag.LARGE_TUPLE_EXT:
+                return [self.decode() for _ in range(self.read_u32())]
+            case Tag.COMPRESSED:
+                size = self.read_u32()
+                try:
+                    inflated = zlib.decompress(self.data[self.offset :])
+                except zlib.error as e:
+                    raise ETFDecodeError("Invalid compressed term") from e
+                if len(inflated) != size:
+                    raise ETFDecodeError("Compressed term has an unexpected size")
+                self.offset = len(self.data)
+                return _Decoder(inflated).decode()
+            case _:
+                raise ETFDecodeError(f"Unsupported ETF tag: {tag}")
+
+
+def _encode(obj: Any, buffer: bytearray) -> None:  # noqa: C901
+    if obj is None:
+        buffer.append(Tag.SMALL_ATOM_UTF8_EXT)
+        buffer += b"\x03nil"
+    elif obj is True:
+        buffer.append(Tag.SMALL_ATOM_UTF8_EXT)
+        buffer += b"\x04true"
+    elif obj is False:
+        buffer.append(Tag.SMALL_ATOM_UTF8_EXT)
+        buffer += b"\x05false"
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        buffer.append(Tag.BINARY_EXT)
+        buffer += _u32.pack(len(data))
+        buffer += data
+    elif isinstance(obj, int):
+        if 0 <= obj <= 255:
+            buffer.append(Tag.SMALL_INTEGER_EXT)
+            buffer.append(obj)
+        elif -(2**31) <= obj < 2**31:
+            buffer.append(Tag.INTEGER_EXT)
+            buffer += _i32.pack(obj)
+        else:
+            magnitude = abs(obj)
+            data = magnitude.to_bytes((magnitude.bit_length() + 7) // 8, "little")
+            if len(data) <= 255:
+                buffer.append(Tag.SMALL_BIG_EXT)
+                buffer.append(len(data))
+            else:
+                buffer.append(Tag.LARGE_BIG_EXT)
+                buffer += _u32.pack(len(data))
+            buffer.append(1 if obj < 0 else 0)
+            buffer += data
+    elif isinstance(obj, float):
+        buffer.append(Tag.NEW_FLOAT_EXT)
+        buffer += _f64.pack(obj)
+    elif isinstance(obj, dict):
+        buffer.append(Tag.MAP_EXT)
+        buffer += _u32.pack(len(obj))
+        for key, value in obj.items():
+            _encode(key, buffer)
+            _encode(value, buffer)
+    elif isinstance(obj, (list, tuple, set)):
+        if not obj:
+            buffer.append(Tag.NIL_EXT)
+            return
+        buffer.append(Tag.LIST_EXT)
+        buffer += _u32.pack(len(obj))
+        for item in obj:
+            _encode(item, buffer)
+        buffer.append(Tag.NIL_EXT)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        buffer.append(Tag.BINARY_EXT)
+        buffer += _u32.pack(len(obj))
+        buffer += obj
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not ETF serializable")
+
+
+def loads(data: bytes | bytearray | memoryview) -> Any:
+    """
+    Decode an ETF payload.
+
+    Args:
+        data: The raw payload
+
+    Returns:
+        The decoded object
+
+    """
+    if erlpack_available:
+        return erlpack.unpack(bytes(data), encoding="utf-8")
+
+    decoder = _Decoder(data)
+    if decoder.read_u8() != FORMAT_VERSION:
+        raise ETFDecodeError("Payload is not External Term Format")
+    return decoder.decode()
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object to an ETF payload.
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        The encoded payload
+
+    """
+    if erlpack_available:
+        return erlpack.pack(obj)
+
+    buffer = bytearray((FORMAT_VERSION,))
+    _encode(obj, buffer)
+    return bytes(buffer)
@@ -1,23 +1,28 @@
 """This file outlines the interaction between naff and Discord's Gateway API."""
 import asyncio
+import re
 import sys
 import time
-import zlib
-from types import TracebackType
+from types import MappingProxyType, TracebackType
 from typing import TypeVar, TYPE_CHECKING
 
 from naff.api import events
 from naff.client.const import MISSING, __api_version__
-from naff.client.utils.input_utils import OverriddenJson
+from naff.client.utils.metrics import current_shard
 from naff.client.utils.serializer import dict_filter_none
 from naff.models.discord.enums import Status
 from naff.models.discord.enums import WebSocketOPCodes as OPCODE
 from naff.models.discord.snowflake import to_snowflake
 from naff.models.naff.cooldowns import CooldownSystem
-from .websocket import WebsocketClient
+from .compression import get_transport_compression
+from .pipeline import EventPipeline
+from .session_store import GatewaySession
+from .websocket import SendPriority, WebsocketClient
 
 if TYPE_CHECKING:
     from .state import ConnectionState
+    from naff.client.client import Client
+    from .recorder import GatewayRecorder
     from naff.models.discord.snowflake import Snowflake_Type
 
 __all__ = ("GatewayClient",)
@@ -25,6 +30,67 @@ __all__ = ("GatewayClient",)
 
 SELF = TypeVar("SELF", bound="WebsocketClient")
 
+_header_field = re.compile(rb'"(op|s|t)":\s*(null|-?\d+|"[A-Z0-9_]*")')
+# these events are always needed by the gateway itself
+_gateway_events = frozenset({"READY", "RESUMED", "GUILD_MEMBERS_CHUNK"})
+
+
+def _peek_header(payload: bytes) -> dict | None:
+    """
+    Cheaply extract the `op`, `s` and `t` fields of a JSON payload without decoding it.
+
+    Only the bytes before the `d` field are searched, so fields nested in the event data are never matched.
+
+    Args:
+        payload: The raw JSON payload
+
+    Returns:
+        The header fields, or None if they could not all be found ahead of the event data
+
+    """
+    end = payload.find(b'"d":')
+    if end == -1:
+        return None
+
+    header = {}
+    for match in _header_field.finditer(payload, 0, end):
+        value = match.group(2)
+        if value == b"null":
+            header[match.group(1).decode()] = None
+        elif value.startswith(b'"'):
+            header[match.group(1).decode()] = value[1:-1].decode()
+        else:
+            header[match.group(1).decode()] = int(value)
+
+    if len(header) != 3:
+        return None
+    return header
+
+
+def dispatch_raw(client: "Client", data: dict, event: str) -> None:
+    """
+    Dispatch the raw gateway events for a payload, if anything is listening for them.
+
+    Listeners share a single read-only snapshot of the payload, taken before any processor gets to modify it.
+
+    Args:
+        client: The client to dispatch to
+        data: The payload of the event
+        event: The name of the event
+
+    """
+    raw_name = f"raw_{event.lower()}"
+    listen_all = client.has_listeners("raw_gateway_event")
+    listen_event = client.has_listeners(raw_name)
+    if not listen_all and not listen_event:
+        return
+
+    snapshot = MappingProxyType(data.copy())
+    if listen_all:
+        client.dispatch(events.RawGatewayEvent(snapshot, override_name="raw_gateway_event"))
+    if listen_event:
+        client.dispatch(events.RawGatewayEvent(snapshot, override_name=raw_name))
+
 
 class GatewayRateLimit:
     def __init__(self) -> None:
@@ -66,6 +132,20 @@ class GatewayClient(WebsocketClient):
 
         self.ws_url = state.gateway_url
         self.ws_resume_url = MISSING
+        self.encoding = state.encoding
+        self.compression = state.compression
+
+        self.events_skipped = 0
+        """The number of events that were skipped without being decoded, see `Client.filter_events`"""
+
+        self.pipeline: EventPipeline | None = None
+        """The bounded event pipeline of this shard, if one has been configured"""
+        if state.client.event_pipeline:
+            self.pipeline = EventPipeline(self, state.client.event_pipeline)
+        self.recorder: "GatewayRecorder | None" = state.client.gateway_recorder
+        """Records the dispatches received by this shard, if enabled"""
+        # json payloads are recorded as received, rather than serialised again
+        self._record_raw = self.recorder is not None and self.encoding == "json"
 
         # This lock needs to be held to send something over the gateway, but is also held when
         # reconnecting. That way there's no race conditions between sending and reconnecting.
@@ -81,6 +161,11 @@ class GatewayClient(WebsocketClient):
 
         self._ready = asyncio.Event()
         self._close_gateway = asyncio.Event()
+        # closing with 1000 invalidates the session, any other code keeps it resumable
+        self._close_code = 1000
+        self._events_lost = False
+        self._restored = False
+        self._identify_acquired = False
 
         # Sanity check, it is extremely important that an instance isn't reused.
         self._entered = False
@@ -90,17 +175,34 @@ class GatewayClient(WebsocketClient):
             raise RuntimeError("An instance of 'WebsocketClient' cannot be re-used!")
 
         self._entered = True
-        self._zlib = zlib.decompressobj()
+        self._transport = get_transport_compression(self.compression)()
+        # every task created by this connection from here on inherits the shard, so listeners can be attributed to it
+        current_shard.set(self.shard[0])
 
-        self.ws = await self.state.client.http.websocket_connect(self.state.gateway_url)
+        if not self._restored:
+            # Discord closes connections that take too long to identify, so only connect once this shard may identify
+            await self._acquire_identify()
+
+        try:
+            self.ws = await self.state.client.http.websocket_connect(
+                self.ws_resume_url if self._restored else self.state.gateway_url
+            )
 
-        hello = await self.receive(force=True)
-        self.heartbeat_interval = hello["d"]["heartbeat_interval"] / 1000
-        self._closed.set()
+            hello = await self.receive(force=True)
+            self.heartbeat_interval = hello["d"]["heartbeat_interval"] / 1000
+            self._closed.set()
 
-        self._keep_alive = asyncio.create_task(self.run_bee_gees())
+            self._keep_alive = asyncio.create_task(self.run_bee_gees())
+            if self.pipeline:
+                self.pipeline.start()
 
-        await self._identify()
+            if self._restored:
+                await self._resume_connection()
+            else:
+                await self._identify()
+        finally:
+            # a failed connection must not hold on to the identify slot, nor skip the scheduler when retrying
+            await self._release_identify()
 
         return self
 
@@ -111,6 +213,12 @@ class GatewayClient(WebsocketClient):
         self._close_gateway.set()
 
         try:
+            if self.pipeline:
+                # a session saved for resuming must not resume past events that were never processed
+                resumable = self._close_code == 1012
+                if not await self.pipeline.stop(drain=resumable) and resumable:
+                    self._events_lost = True
+
             if self._keep_alive is not None:
                 self._kill_bee_gees.set()
                 try:
@@ -124,7 +232,7 @@ class GatewayClient(WebsocketClient):
                 # We could be cancelled here, it is extremely important that we close the
                 # WebSocket either way, hence the try/except.
                 try:
-                    await self.ws.close(code=1000)
+                    await self.ws.close(code=self._close_code)
                 finally:
                     self.ws = None
 
@@ -164,7 +272,14 @@ class GatewayClient(WebsocketClient):
                 self.sequence = seq
 
             if op == OPCODE.DISPATCH:
-                asyncio.create_task(self.dispatch_event(data, seq, event))
+                if self.event_metrics is not None:
+                    self.event_metrics.record_dispatch(event, self.shard[0], self._decode_time)
+                if self.recorder is not None:
+                    self.recorder.record(self.shard[0], self._raw_payload if self._record_raw else msg)
+                if self.pipeline:
+                    await self.pipeline.put(data, seq, event)
+                else:
+                    asyncio.create_task(self.dispatch_event(data, seq, event))
                 continue
 
             # This may try to reconnect the connection so it is best to wait
@@ -172,6 +287,32 @@ class GatewayClient(WebsocketClient):
             # possible race conditions to consider.
             await self.dispatch_opcode(data, op)
 
+    def _wants_event(self, event: str) -> bool:
+        """Check if anything in the client will consume an event."""
+        if event in _gateway_events:
+            return True
+        client = self.state.client
+        event_name = f"raw_{event.lower()}"
+        return (
+            event_name in client.processors
+            or client.has_listeners(event_name)
+            or client.has_listeners("raw_gateway_event")
+        )
+
+    def _skip_payload(self, msg: bytes | str) -> bool:
+        if not self.state.client.filter_events or self.encoding != "json" or not isinstance(msg, bytes):
+            return False
+
+        header = _peek_header(msg)
+        if header is None or header["op"] != OPCODE.DISPATCH or self._wants_event(header["t"]):
+            return False
+
+        # nothing would consume this event, so we only need to keep track of the sequence
+        if header["s"]:
+            self.sequence = header["s"]
+        self.events_skipped += 1
+        return True
+
     async def dispatch_opcode(self, data, op: OPCODE) -> None:
         match op:
 
@@ -181,6 +322,7 @@ class GatewayClient(WebsocketClient):
 
             case OPCODE.HEARTBEAT_ACK:
                 self.latency.append(time.perf_counter() - self._last_heartbeat)
+                self.ack_latency.observe(self.latency[-1])
 
                 if self._last_heartbeat != 0 and self.latency[-1] >= 15:
                     self.logger.warning(
@@ -209,20 +351,24 @@ class GatewayClient(WebsocketClient):
                 self._trace = data.get("_trace", [])
                 self.sequence = seq
                 self.session_id = data["session_id"]
-                self.ws_resume_url = (
-                    f"{data['resume_gateway_url']}?encoding=json&v={__api_version__}&compress=zlib-stream"
-                )
+                self.ws_resume_url = f"{data['resume_gateway_url']}?encoding={self.encoding}&v={__api_version__}"
+                if self.compression:
+                    self.ws_resume_url += f"&compress={self.compression}"
+                self.state.expect_guilds({to_snowflake(guild["id"]) for guild in data["guilds"]})
                 self.logger.info(f"Shard {self.shard[0]} has connected to gateway!")
                 self.logger.debug(f"Session ID: {self.session_id} Trace: {self._trace}")
                 return self.state.client.dispatch(events.WebsocketReady(data))
 
             case "RESUMED":
                 self.logger.info(f"Successfully resumed connection! Session_ID: {self.session_id}")
+                self._ready.set()
+                # noinspection PyProtectedMember
+                self.state._shard_ready.set()
                 self.state.client.dispatch(events.Resume())
                 return
 
             case "GUILD_MEMBERS_CHUNK":
-                asyncio.create_task(self._process_member_chunk(data.copy()))
+                asyncio.create_task(self._process_member_chunk(data))
 
             case _:
                 # the above events are "special", and are handled by the gateway itself, the rest can be dispatched
@@ -230,23 +376,74 @@ class GatewayClient(WebsocketClient):
                 processor = self.state.client.processors.get(event_name)
                 if processor:
                     try:
-                        asyncio.create_task(processor(events.RawGatewayEvent(data.copy(), override_name=event_name)))
+                        # processors take ownership of the payload, so it is not copied for them
+                        coro = processor(events.RawGatewayEvent(data, override_name=event_name))
+                        if self.event_metrics is not None:
+                            coro = self.event_metrics.time_processor(coro, event, self.shard[0])
+                        if self.pipeline:
+                            # the processor is awaited by a pipeline worker, so raw listeners need their snapshot now
+                            self._dispatch_raw(data, event)
+                            return await coro
+                        asyncio.create_task(coro)
                     except Exception as ex:
                         self.logger.error(f"Failed to run event processor for {event_name}: {ex}")
                 else:
                     self.logger.debug(f"No processor for `{event_name}`")
 
-        self.state.client.dispatch(events.RawGatewayEvent(data.copy(), override_name="raw_gateway_event"))
-        self.state.client.dispatch(events.RawGatewayEvent(data.copy(), override_name=f"raw_{event.lower()}"))
+        self._dispatch_raw(data, event)
+
+    def _dispatch_raw(self, data: dict, event: str) -> None:
+        """Dispatch the raw gateway events for a payload, if anything is listening for them."""
+        dispatch_raw(self.state.client, data, event)
+
+    def close(self, resumable: bool = False) -> None:
+        """
+        Shutdown the websocket connection.
 
-    def close(self) -> None:
-        """Shutdown the websocket connection."""
+        Args:
+            resumable: Keep the session resumable after closing, so it can be restored by another connection
+
+        """
+        if resumable:
+            self._close_code = 1012
         self._close_gateway.set()
 
+    def export_session(self) -> GatewaySession | None:
+        """Export the state required to resume this session, if it has one."""
+        if not self.session_id or not self.ws_resume_url or self._events_lost:
+            return None
+        return GatewaySession(session_id=self.session_id, sequence=self.sequence, resume_url=self.ws_resume_url)
+
+    def restore_session(self, session: GatewaySession) -> None:
+        """
+        Resume a previous session when connecting, rather than identifying.
+
+        Args:
+            session: The session to resume
+
+        """
+        self.session_id = session.session_id
+        self.sequence = session.sequence
+        self.ws_resume_url = session.resume_url
+        self._restored = True
+
+    async def _acquire_identify(self) -> None:
+        """Wait until this shard may identify, ahead of connecting."""
+        await self.state.client.identify_scheduler.acquire(self.shard[0])
+        self._identify_acquired = True
+
+    async def _release_identify(self) -> None:
+        """Let the next shard of this rate limit key identify, once this one has sent its identify or failed to."""
+        if self._identify_acquired:
+            self._identify_acquired = False
+            await self.state.client.identify_scheduler.release(self.shard[0])
+
     async def _identify(self) -> None:
         """Send an identify payload to the gateway."""
         if self.ws is None:
             raise RuntimeError
+        if not self._identify_acquired:
+            await self._acquire_identify()
         payload = {
             "op": OPCODE.IDENTIFY,
             "d": {
@@ -256,12 +453,17 @@ class GatewayClient(WebsocketClient):
                 "large_threshold": 250,
                 "properties": {"os": sys.platform, "browser": "naff", "device": "naff"},
                 "presence": self.state.presence,
+                # payload compression is never wanted, with or without transport compression
+                "compress": False,
             },
-            "compress": True,
         }
 
-        serialized = OverriddenJson.dumps(payload)
-        await self.ws.send_str(serialized)
+        serialized = self._serialize(payload)
+        try:
+            await self._send_raw(serialized)
+        finally:
+            # the next identify of this key is spaced from when this one was sent
+            await self._release_identify()
 
         self.logger.debug(
             f"Shard ID {self.shard[0]} has identified itself to Gateway, requesting intents: {self.state.intents}!"
@@ -270,7 +472,12 @@ class GatewayClient(WebsocketClient):
     async def reconnect(self, *, resume: bool = False, code: int = 1012, url: str | None = None) -> None:
         self.state.clear_ready()
         self._ready.clear()
-        await super().reconnect(resume=resume, code=code, url=url)
+        if not resume:
+            await self._acquire_identify()
+        try:
+            await super().reconnect(resume=resume, code=code, url=url)
+        finally:
+            await self._release_identify()
 
     async def _resume_connection(self) -> None:
         """Send a resume payload to the gateway."""
@@ -282,8 +489,8 @@ class GatewayClient(WebsocketClient):
             "d": {"token": self.state.client.http.token, "seq": self.sequence, "session_id": self.session_id},
         }
 
-        serialized = OverriddenJson.dumps(payload)
-        await self.ws.send_str(serialized)
+        serialized = self._serialize(payload)
+        await self._send_raw(serialized)
 
         self.logger.debug(f"{self.shard[0]} is attempting to resume a connection")
 
@@ -301,7 +508,7 @@ class GatewayClient(WebsocketClient):
                 "afk": False,
             }
         )
-        await self.send_json({"op": OPCODE.PRESENCE, "d": payload})
+        await self.send_json({"op": OPCODE.PRESENCE, "d": payload}, priority=SendPriority.URGENT)
 
     async def request_member_chunks(
         self,
@@ -326,7 +533,7 @@ class GatewayClient(WebsocketClient):
                 }
             ),
         }
-        await self.send_json(payload)
+        await self.send_json(payload, priority=SendPriority.BULK)
 
     async def _process_member_chunk(self, chunk: dict) -> None:
 
@@ -343,4 +550,4 @@ class GatewayClient(WebsocketClient):
             "op": OPCODE.VOICE_STATE,
             "d": {"guild_id": guild_id, "channel_id": channel_id, "self_mute": muted, "self_deaf": deafened},
         }
-        await self.send_json(payload)
+        await self.send_json(payload, priority=SendPriority.URGENT)
@@ -0,0 +1,156 @@
+"""
+Scheduling of gateway identifies.
+
+Discord limits how often a bot may identify: `max_concurrency` shards may identify every 5 seconds, one for each
+rate limit key (`shard_id % max_concurrency`), and only `session_start_limit.total` identifies are allowed per day.
+An `IdentifyScheduler` is shared by every shard of a client, and is acquired before any identify, including those
+made after the gateway invalidates a session. Shards acquire it before they connect, as Discord closes connections
+that do not identify promptly, so every shard can be started at once while the scheduler spaces out their connections.
+A shard holds its key until it has sent its identify, or failed to connect, and only then releases it; the next
+identify of that key is spaced from when the payload was actually sent, however long connecting took.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from logging import Logger
+
+from naff.client.const import get_logger
+
+__all__ = ("IdentifyScheduler",)
+
+IDENTIFY_INTERVAL = 5.1
+"""How long, in seconds, each rate limit key has to wait between identifies, with a margin over Discord's 5 seconds"""
+
+
+class IdentifyScheduler:
+    """
+    Spaces out the identifies of a bot's shards to respect its session start limit.
+
+    Args:
+        max_concurrency: The number of shards that may identify at the same time
+        total: The number of identifies allowed per reset, or None if it is unknown
+        remaining: The number of identifies remaining until the next reset
+        reset_after: How long, in milliseconds, until the remaining identifies reset
+        logger: The logger to report progress to
+
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 1,
+        total: int | None = None,
+        remaining: int | None = None,
+        reset_after: float = 0,
+        logger: Logger | None = None,
+    ) -> None:
+        self.logger = logger or get_logger()
+        self.max_concurrency = max_concurrency
+        """The number of shards that may identify at the same time"""
+        self.total = total
+        """The number of identifies allowed per reset"""
+        self.remaining = remaining
+        """The number of identifies remaining until the next reset"""
+        self.reset_at = time.monotonic() + reset_after / 1000
+        """When the remaining identifies reset, in `time.monotonic` time"""
+
+        self.expected: int = 0
+        """The number of shards expected to identify on startup"""
+        self.identified: int = 0
+        """The number of identifies that have been sent"""
+
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._next_identify: defaultdict[int, float] = defaultdict(float)
+        self._held: dict[int, int] = {}
+
+    @property
+    def progress(self) -> dict:
+        """A snapshot of the progress of identifies."""
+        return {
+            "identified": self.identified,
+            "expected": self.expected,
+            "remaining": self.remaining,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def update(self, session_start_limit: dict) -> None:
+        """
+        Update the limits of this scheduler.
+
+        Args:
+            session_start_limit: The `session_start_limit` object returned by `get_gateway_bot`
+
+        """
+        self.max_concurrency = session_start_limit["max_concurrency"]
+        self.total = session_start_limit["total"]
+        self.remaining = session_start_limit["remaining"]
+        self.reset_at = time.monotonic() + session_start_limit["reset_after"] / 1000
+
+    def get_key(self, shard_id: int) -> int:
+        """
+        Get the rate limit key of a shard.
+
+        Args:
+            shard_id: The ID of the shard
+
+        Returns:
+            The rate limit key
+
+        """
+        return shard_id % self.max_concurrency
+
+    async def acquire(self, shard_id: int) -> None:
+        """
+        Wait until a shard may identify.
+
+        The shard's rate limit key is held until `release` is called, which must happen once the identify is sent.
+
+        Args:
+            shard_id: The ID of the shard about to identify
+
+        """
+        key = self.get_key(shard_id)
+        lock = self._locks[key]
+        await lock.acquire()
+        try:
+            delay = self._next_identify[key] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            while self.remaining is not None and self.remaining <= 0:
+                delay = self.reset_at - time.monotonic()
+                if delay > 0:
+                    self.logger.warning(f"Session start limit reached, waiting {delay:.0f} seconds to identify")
+                    await asyncio.sleep(delay)
+                # another key may have already reset the limit while this one waited
+                if self.remaining <= 0:
+                    self.remaining = self.total
+                    self.reset_at = time.monotonic() + 24 * 60 * 60
+
+            if self.remaining is not None:
+                self.remaining -= 1
+        except BaseException:
+            lock.release()
+            raise
+        self._held[shard_id] = key
+
+        self.identified += 1
+        if self.identified <= self.expected:
+            self.logger.info(f"Shard {shard_id} is identifying ({self.identified}/{self.expected})")
+        else:
+            self.logger.info(f"Shard {shard_id} is identifying")
+
+    async def release(self, shard_id: int) -> None:
+        """
+        Release a shard's rate limit key once it has sent its identify, or failed to.
+
+        The next identify of the key may only be sent `IDENTIFY_INTERVAL` seconds from now.
+
+        Args:
+            shard_id: The ID of the shard that identified
+
+        """
+        key = self._held.pop(shard_id, None)
+        if key is None:
+            return
+        self._next_identify[key] = time.monotonic() + IDENTIFY_INTERVAL
+        self._locks[key].release()
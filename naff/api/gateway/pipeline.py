@@ -0,0 +1,217 @@
+"""
+A bounded event pipeline for gateway connections.
+
+By default, every dispatch received from the gateway is processed in its own task. Under a burst of events, such as a
+reconnect storm, this means an unbounded number of tasks can pile up. An `EventPipeline` instead puts events in a
+bounded queue that a fixed pool of workers drain, and applies an `OverflowPolicy` when the queue is full.
+
+In `ordered` mode, events are hashed by guild onto serial lanes instead. Events for one guild are then processed in
+the order they were received, while different guilds are still processed concurrently.
+"""
+import asyncio
+import collections
+from enum import Enum
+from typing import TYPE_CHECKING
+
+import attrs
+
+if TYPE_CHECKING:
+    from .gateway import GatewayClient
+
+__all__ = ("OverflowPolicy", "EventPipelineConfig", "EventPipeline")
+
+
+class OverflowPolicy(str, Enum):
+    """What to do with new events when the event queue is full."""
+
+    BLOCK = "block"
+    """Stop reading from the gateway until there is room in the queue"""
+    DROP = "drop"
+    """Discard droppable events, and block for everything else"""
+    SPILL = "spill"
+    """Keep reading, and hold excess events in an unbounded overflow buffer"""
+
+
+@attrs.define(eq=False, order=False, hash=False, kw_only=True)
+class EventPipelineConfig:
+    """Configures the event pipeline of each shard."""
+
+    max_size: int = attrs.field(repr=False, default=1000)
+    """The maximum number of events that may wait to be processed"""
+
+    workers: int = attrs.field(repr=False, default=16)
+    """The number of events that may be processed concurrently"""
+
+    overflow: OverflowPolicy = attrs.field(repr=False, default=OverflowPolicy.BLOCK, converter=OverflowPolicy)
+    """What to do with new events when the queue is full"""
+
+    droppable_events: frozenset[str] = attrs.field(
+        repr=False, factory=lambda: frozenset({"TYPING_START", "PRESENCE_UPDATE"}), converter=frozenset
+    )
+    """The gateway events that may be discarded with the `drop` overflow policy"""
+
+    ordered: bool = attrs.field(repr=False, default=False)
+    """Process the events of each guild in order, using one serial lane per worker. `max_size` is split between lanes"""
+
+    drain_timeout: float = attrs.field(repr=False, default=10)
+    """How long to wait for queued events to be processed before a session is saved for resuming, in seconds"""
+
+
+# chunks are awaited by guild creates when fetching members, so they may never wait behind them. READY must be handled
+# before any guild event of its session, which may otherwise run first on another lane
+_immediate_events = frozenset({"GUILD_MEMBERS_CHUNK", "READY", "RESUMED"})
+# these events carry the guild's ID as `id`, rather than `guild_id`
+_guild_events = frozenset({"GUILD_CREATE", "GUILD_UPDATE", "GUILD_DELETE"})
+
+
+class _Lane:
+    __slots__ = ("queue", "spill")
+
+    def __init__(self, max_size: int) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+        self.spill: collections.deque = collections.deque()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() + len(self.spill)
+
+
+class EventPipeline:
+    """A bounded queue of dispatch events, drained by a pool of workers."""
+
+    def __init__(self, gateway: "GatewayClient", config: EventPipelineConfig) -> None:
+        self.gateway = gateway
+        self.config = config
+        self.logger = gateway.logger
+
+        if config.ordered:
+            lane_size = max(1, config.max_size // config.workers)
+            self._lanes = [_Lane(lane_size) for _ in range(config.workers)]
+        else:
+            self._lanes = [_Lane(config.max_size)]
+        self._workers: list[asyncio.Task] = []
+
+        self.processed: int = 0
+        """The number of events that have been processed"""
+        self.max_depth: int = 0
+        """The highest depth the queue has reached"""
+        self.spilled: int = 0
+        """The number of events that were held in the overflow buffer"""
+        self.dropped: collections.Counter = collections.Counter()
+        """The number of discarded events, per event name"""
+
+    @property
+    def depth(self) -> int:
+        """The number of events waiting to be processed."""
+        return sum(lane.depth for lane in self._lanes)
+
+    @property
+    def stats(self) -> dict:
+        """A snapshot of the metrics of this pipeline."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "max_size": self.config.max_size,
+            "workers": len(self._workers),
+            "lane_depths": [lane.depth for lane in self._lanes],
+            "processed": self.processed,
+            "spilled": self.spilled,
+            "dropped": dict(self.dropped),
+        }
+
+    def start(self) -> None:
+        """Start the workers of this pipeline."""
+        if not self._workers:
+            if self.config.ordered:
+                self._workers = [asyncio.create_task(self._worker(lane)) for lane in self._lanes]
+            else:
+                self._workers = [asyncio.create_task(self._worker(self._lanes[0])) for _ in range(self.config.workers)]
+
+    async def stop(self, drain: bool = False) -> bool:
+        """
+        Stop the workers of this pipeline.
+
+        Args:
+            drain: Process the events still queued first, for up to `drain_timeout` seconds, rather than discarding them
+
+        Returns:
+            Whether every queued event was processed
+
+        """
+        drained = self.depth == 0
+        if drain and not drained and self._workers:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(lane.queue.join() for lane in self._lanes)), self.config.drain_timeout
+                )
+                drained = True
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Shard {self.gateway.shard[0]} could not process {self.depth} queued events before stopping"
+                )
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        return drained
+
+    def _get_lane(self, data: dict, event: str) -> _Lane:
+        if len(self._lanes) == 1:
+            return self._lanes[0]
+
+        key = data.get("guild_id")
+        if key is None and event in _guild_events:
+            key = data.get("id")
+        if key is None:
+            # direct messages have no guild, keep each channel in order instead
+            key = data.get("channel_id")
+        if key is None:
+            return self._lanes[0]
+        # the timestamp bits of a snowflake are evenly distributed, unlike the low bits
+        return self._lanes[(int(key) >> 22) % len(self._lanes)]
+
+    async def put(self, data: dict, seq: int | None, event: str) -> None:
+        """
+        Queue an event for processing, applying the overflow policy if the queue is full.
+
+        Args:
+            data: The event data
+            seq: The sequence of the event
+            event: The name of the event
+
+        """
+        if event in _immediate_events:
+            return await self.gateway.dispatch_event(data, seq, event)
+
+        item = (data, seq, event)
+        lane = self._get_lane(data, event)
+
+        # anything already in the overflow buffer has to be processed first to keep events in order
+        if not lane.spill and not lane.queue.full():
+            lane.queue.put_nowait(item)
+        elif self.config.overflow is OverflowPolicy.SPILL:
+            lane.spill.append(item)
+            self.spilled += 1
+        elif self.config.overflow is OverflowPolicy.DROP and event in self.config.droppable_events:
+            self.dropped[event] += 1
+            return
+        else:
+            self.logger.debug(f"Shard {self.gateway.shard[0]} event queue is full, waiting for room")
+            await lane.queue.put(item)
+
+        self.max_depth = max(self.max_depth, self.depth)
+
+    async def _worker(self, lane: _Lane) -> None:
+        while True:
+            data, seq, event = await lane.queue.get()
+            try:
+                await self.gateway.dispatch_event(data, seq, event)
+            except Exception as e:
+                self.logger.error(f"Failed to process {event}: {e}", exc_info=e)
+            finally:
+                self.processed += 1
+                lane.queue.task_done()
+
+            while lane.spill and not lane.queue.full():
+                lane.queue.put_nowait(lane.spill.popleft())
@@ -0,0 +1,257 @@
+"""
+Recording of gateway traffic, and offline replay of recordings.
+
+A `GatewayRecorder` passed to the client writes every dispatch received by every shard to an append-only file. The
+recording can then be replayed into a client with `replay_recording`, which runs each event through the client's
+processors and listeners without connecting to Discord. This makes it possible to benchmark and profile event
+processing and caching against real traffic.
+
+??? Hint "Example Usage:"
+    ```python
+    bot = Client(gateway_recorder=GatewayRecorder("traffic.naffrec.gz"))
+    ```
+
+    Later, without a connection:
+    ```python
+    async def main():
+        bot = Client()
+        stats = await replay_recording(bot, "traffic.naffrec.gz", speed=None)
+        print(f"Processed {stats['events']} events in {stats['elapsed']:.2f}s")
+
+    asyncio.run(main())
+    ```
+
+A recording is a sequence of frames, each made of a header of the time it was received, the shard it was received by
+and the length of the payload, followed by the payload as the JSON received from Discord. If the path ends with `.gz`, the file is compressed.
+
+!!! warning
+    Recordings contain everything your bot received, including message content and member data. Treat them as
+    sensitive.
+"""
+import asyncio
+import gzip
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, NamedTuple
+
+from naff.api import events
+from naff.client.const import MISSING
+from naff.client.utils.input_utils import OverriddenJson
+from naff.models.discord.snowflake import to_snowflake
+from naff.models.discord.user import NaffUser
+from .gateway import dispatch_raw
+
+if TYPE_CHECKING:
+    from naff.client.client import Client
+
+__all__ = ("GatewayRecorder", "RecordedFrame", "read_recording", "replay_recording")
+
+MAGIC = b"NAFFREC1"
+_frame_header = struct.Struct("<dHI")
+
+# these events are handled by the gateway connection itself, rather than by a processor
+_connection_events = frozenset({"READY", "RESUMED"})
+
+
+def _open(path: Path, mode: str) -> BinaryIO:
+    if path.suffix == ".gz":
+        # a low compression level keeps the cost of recording down, multiple appends form a valid multi-member file
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode)
+
+
+class RecordedFrame(NamedTuple):
+    """A dispatch read from a recording."""
+
+    timestamp: float
+    """When the dispatch was received, as a unix timestamp"""
+    shard_id: int
+    """The shard that received the dispatch"""
+    payload: dict
+    """The full gateway payload of the dispatch"""
+
+
+class GatewayRecorder:
+    """
+    Appends every dispatch received by the client's shards to a file.
+
+    Frames are written to a buffer, which is flushed to the file whenever it fills up and when the client stops. Full
+    buffers are compressed and written by a background thread, so recording does not block the event loop.
+
+    Args:
+        path: The file to record to, it is compressed if it ends in `.gz`
+        buffer_size: How many bytes of frames to buffer before flushing them to the file
+
+    """
+
+    def __init__(self, path: str | os.PathLike, buffer_size: int = 2**18) -> None:
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.frames: int = 0
+        """The number of frames written by this recorder"""
+        self._file: BinaryIO | None = None
+        self._buffer = bytearray()
+        # a single thread, so buffers are written in the order they were filled
+        self._writer: ThreadPoolExecutor | None = None
+
+    def open(self) -> None:
+        """Open the file to record to, this is done automatically when the first frame is written."""
+        if self._file is None:
+            new = not self.path.exists() or self.path.stat().st_size == 0
+            self._file = _open(self.path, "ab")
+            if new:
+                self._file.write(MAGIC)
+
+    def record(self, shard_id: int, payload: dict | str | bytes) -> None:
+        """
+        Record a gateway payload.
+
+        Args:
+            shard_id: The shard that received the payload
+            payload: The full gateway payload, either decoded or as the raw JSON received
+
+        """
+        if isinstance(payload, dict):
+            payload = OverriddenJson.dumps(payload)
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._buffer += _frame_header.pack(time.time(), shard_id, len(payload))
+        self._buffer += payload
+        self.frames += 1
+
+        if len(self._buffer) >= self.buffer_size:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="naff-recorder")
+            self._writer.submit(self._write, data)
+
+    def _write(self, data: bytes) -> None:
+        if self._file is None:
+            self.open()
+        self._file.write(data)
+
+    def close(self) -> None:
+        """Flush and close the recording file."""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._buffer:
+            self._write(bytes(self._buffer))
+            self._buffer.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_recording(path: str | os.PathLike) -> Iterator[RecordedFrame]:
+    """
+    Read the frames of a recording.
+
+    Args:
+        path: The recording to read
+
+    Returns:
+        An iterator of the frames in the recording
+
+    """
+    path = Path(path)
+    with _open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a gateway recording")
+
+        while True:
+            try:
+                header = file.read(_frame_header.size)
+                if len(header) < _frame_header.size:
+                    # the end of the recording, or the recorder was interrupted mid-frame
+                    return
+                timestamp, shard_id, length = _frame_header.unpack(header)
+                data = file.read(length)
+            except EOFError:
+                # a compressed recording that was cut off, i.e. by a crash
+                return
+            if len(data) < length:
+                return
+            yield RecordedFrame(timestamp, shard_id, OverriddenJson.loads(data))
+
+
+async def _replay_frame(client: "Client", data: dict, event: str) -> None:
+    if event == "GUILD_MEMBERS_CHUNK":
+        if guild := client.cache.get_guild(to_snowflake(data["guild_id"])):
+            await guild.process_member_chunk(data)
+        return
+
+    event_name = f"raw_{event.lower()}"
+    # listeners have to see the payload before the processor modifies it
+    dispatch_raw(client, data, event)
+    if processor := client.processors.get(event_name):
+        await processor(events.RawGatewayEvent(data, override_name=event_name))
+
+
+async def replay_recording(
+    client: "Client",
+    path: str | os.PathLike,
+    *,
+    speed: float | None = 1.0,
+    shard_id: int | None = None,
+) -> dict:
+    """
+    Replay a recording into a client, without connecting to Discord.
+
+    Each dispatch is run through the client's processors and listeners, the same way it would be when received from
+    the gateway. Connection events such as `READY` are not replayed, although the bot's user is taken from the first
+    `READY` if the client has not logged in.
+
+    !!! note
+        Events are processed one at a time, the next event is only replayed once the processor of the previous one
+        has finished. Listeners still run in their own tasks.
+
+    Args:
+        client: The client to replay the recording into
+        path: The recording to replay
+        speed: How fast to replay the recording relative to the speed it was recorded at, or None to replay it as fast as possible
+        shard_id: Only replay the dispatches received by this shard
+
+    Returns:
+        The number of `events` replayed, the time it `elapsed` in seconds, and the number replayed of each event as `counts`
+
+    """
+    counts: dict[str, int] = {}
+    replayed = 0
+    first_timestamp = None
+    start = time.perf_counter()
+
+    for frame in read_recording(path):
+        if shard_id is not None and frame.shard_id != shard_id:
+            continue
+
+        if speed is not None:
+            if first_timestamp is None:
+                first_timestamp = frame.timestamp
+            delay = (frame.timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        event = frame.payload["t"]
+        data = frame.payload["d"]
+        if event in _connection_events:
+            if event == "READY" and client._user is MISSING:
+                client._user = NaffUser.from_dict(data["user"], client)
+                client.cache.place_user_data(data["user"])
+            continue
+
+        try:
+            await _replay_frame(client, data, event)
+        except Exception as e:
+            client.logger.error(f"Failed to replay {event}: {e}", exc_info=e)
+
+        counts[event] = counts.get(event, 0) + 1
+        replayed += 1
+        # let listeners run, as they would between gateway reads
+        await asyncio.sleep(0)
+
+    return {"events": replayed, "elapsed": time.perf_counter() - start, "counts": counts}
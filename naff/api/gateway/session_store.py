@@ -0,0 +1,142 @@
+"""
+Persistence of gateway sessions across process restarts.
+
+When a session store is passed to the client, each shard saves its session when the client is stopped, and attempts
+to resume it the next time it starts. Resuming skips the READY and GUILD_CREATE flood of a fresh identify, as well as
+the identify rate limit.
+
+!!! warning
+    A resumed session does not replay the state of the previous process. Caches start empty and are filled as events
+    arrive or objects are fetched, so `Client.guilds` will not list every guild straight away.
+
+If Discord no longer accepts the session, it invalidates it and the shard falls back to a fresh identify.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import attrs
+
+from naff.client.utils.input_utils import OverriddenJson
+
+__all__ = ("GatewaySession", "SessionStore", "FileSessionStore")
+
+
+@attrs.define(eq=False, order=False, hash=False, kw_only=True)
+class GatewaySession:
+    """The state required to resume a gateway session."""
+
+    session_id: str = attrs.field(repr=True)
+    """The ID of the session"""
+    sequence: int | None = attrs.field(repr=False, default=None)
+    """The sequence of the last event received"""
+    resume_url: str = attrs.field(repr=False)
+    """The URL to connect to when resuming"""
+    saved_at: float = attrs.field(repr=False, factory=time.time)
+    """When this session was saved, as a unix timestamp"""
+
+
+class SessionStore(ABC):
+    """The base class for all session stores."""
+
+    max_age: float = 300
+    """How long, in seconds, a saved session is considered resumable"""
+
+    @abstractmethod
+    async def load(self, shard_id: int, total_shards: int) -> GatewaySession | None:
+        """
+        Load the saved session of a shard.
+
+        Args:
+            shard_id: The ID of the shard
+            total_shards: The total number of shards
+
+        Returns:
+            The saved session, or None if there is none
+
+        """
+        ...
+
+    @abstractmethod
+    async def save(self, shard_id: int, total_shards: int, session: GatewaySession) -> None:
+        """
+        Save the session of a shard.
+
+        Args:
+            shard_id: The ID of the shard
+            total_shards: The total number of shards
+            session: The session to save
+
+        """
+        ...
+
+    @abstractmethod
+    async def delete(self, shard_id: int, total_shards: int) -> None:
+        """
+        Delete the saved session of a shard.
+
+        Args:
+            shard_id: The ID of the shard
+            total_shards: The total number of shards
+
+        """
+        ...
+
+    async def restore(self, shard_id: int, total_shards: int) -> GatewaySession | None:
+        """
+        Load the saved session of a shard, if it is still resumable. A session can only be restored once.
+
+        Args:
+            shard_id: The ID of the shard
+            total_shards: The total number of shards
+
+        Returns:
+            The session, or None if there is no resumable session
+
+        """
+        session = await self.load(shard_id, total_shards)
+        if session is None:
+            return None
+
+        await self.delete(shard_id, total_shards)
+        if time.time() - session.saved_at > self.max_age:
+            return None
+        return session
+
+
+class FileSessionStore(SessionStore):
+    """
+    Stores each shard's session as a JSON file in a directory.
+
+    Args:
+        directory: The directory to store sessions in
+        max_age: How long, in seconds, a saved session is considered resumable
+
+    """
+
+    def __init__(self, directory: str | Path = ".naff_sessions", max_age: float = 300) -> None:
+        self.directory = Path(directory)
+        self.max_age = max_age
+
+    def _path(self, shard_id: int, total_shards: int) -> Path:
+        return self.directory / f"{shard_id}-{total_shards}.json"
+
+    def _read(self, path: Path) -> GatewaySession | None:
+        try:
+            return GatewaySession(**OverriddenJson.loads(path.read_bytes()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write(self, path: Path, session: GatewaySession) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(OverriddenJson.dumps(attrs.asdict(session)))
+
+    async def load(self, shard_id: int, total_shards: int) -> GatewaySession | None:
+        return await asyncio.to_thread(self._read, self._path(shard_id, total_shards))
+
+    async def save(self, shard_id: int, total_shards: int, session: GatewaySession) -> None:
+        await asyncio.to_thread(self._write, self._path(shard_id, total_shards), session)
+
+    async def delete(self, shard_id: int, total_shards: int) -> None:
+        await asyncio.to_thread(self._path(shard_id, total_shards).unlink, missing_ok=True)
@@ -1,4 +1,5 @@
 import asyncio
+import time
 import traceback
 from datetime import datetime
 from logging import Logger
@@ -38,7 +39,13 @@ class ConnectionState:
     """The DateTime the bot started at"""
 
     gateway_url: str = MISSING
-    """The URL that the gateway should connect to."""
+    """The URL that the gateway should connect to. If not set before starting, it is fetched from Discord"""
+
+    encoding: str = attrs.field(default="json", kw_only=True)
+    """The payload encoding used by the gateway, either `json` or `etf`"""
+
+    compression: str | None = attrs.field(default="zlib-stream", kw_only=True)
+    """The transport compression used by the gateway, either `zlib-stream`, `zstd-stream` or None"""
 
     gateway_started: asyncio.Event = asyncio.Event()
     """Event to check if the gateway has been started."""
@@ -47,6 +54,11 @@ class ConnectionState:
 
     logger: Logger = attrs.field(repr=False, init=False, factory=get_logger)
 
+    _pending_guilds: set["Snowflake_Type"] = attrs.field(repr=False, init=False, factory=set)
+    _guilds_expected: int = attrs.field(repr=False, init=False, default=0)
+    _unavailable_guilds: set["Snowflake_Type"] = attrs.field(repr=False, init=False, factory=set)
+    _guild_received: asyncio.Event = attrs.field(repr=False, init=False, factory=asyncio.Event)
+
     def __attrs_post_init__(self, *args, **kwargs) -> None:
         self._shard_ready = asyncio.Event()
 
@@ -60,6 +72,112 @@ class ConnectionState:
         """Returns the average latency of the websocket connection."""
         return self.gateway.average_latency
 
+    @property
+    def bytes_received(self) -> int:
+        """Returns the number of bytes received over the wire by the websocket connection."""
+        return self.gateway.bytes_received if self.gateway else 0
+
+    @property
+    def bytes_decoded(self) -> int:
+        """Returns the number of decompressed bytes decoded by the websocket connection."""
+        return self.gateway.bytes_decoded if self.gateway else 0
+
+    @property
+    def event_queue_stats(self) -> dict | None:
+        """Returns the metrics of the event pipeline of this shard, if enabled."""
+        if self.gateway and self.gateway.pipeline:
+            return self.gateway.pipeline.stats
+        return None
+
+    @property
+    def send_queue_stats(self) -> dict | None:
+        """Returns the wait time metrics of each send priority of the websocket connection."""
+        if self.gateway:
+            return self.gateway.rl_manager.stats
+        return None
+
+    @property
+    def metrics(self) -> dict:
+        """Returns a snapshot of the health metrics of the websocket connection."""
+        if not self.gateway:
+            return {"connected": False}
+        return {
+            "connected": True,
+            "latency": self.gateway.average_latency,
+            "ack_latency": self.gateway.ack_latency.to_dict(),
+            "heartbeat_jitter": self.gateway.heartbeat_jitter.to_dict(),
+            "bytes_received": self.gateway.bytes_received,
+            "bytes_decoded": self.gateway.bytes_decoded,
+            "event_queue": self.event_queue_stats,
+            "send_queue": self.send_queue_stats,
+            "guilds": self.guild_progress,
+        }
+
+    @property
+    def guild_progress(self) -> dict:
+        """Returns how many of the guilds in the last READY have been received."""
+        return {
+            "expected": self._guilds_expected,
+            "received": self._guilds_expected - len(self._pending_guilds),
+            "unavailable": len(self._unavailable_guilds),
+        }
+
+    def expect_guilds(self, guild_ids: set["Snowflake_Type"]) -> None:
+        """
+        Start waiting for the guilds of a READY to be received.
+
+        Args:
+            guild_ids: The IDs of the guilds in READY
+
+        """
+        self._pending_guilds = set(guild_ids)
+        self._guilds_expected = len(self._pending_guilds)
+        self._unavailable_guilds = set()
+        self._guild_received.clear()
+
+    def receive_guild(self, guild_id: "Snowflake_Type", unavailable: bool = False) -> None:
+        """
+        Mark a guild of the last READY as received.
+
+        Args:
+            guild_id: The ID of the guild
+            unavailable: Whether the guild was received as unavailable
+
+        """
+        if guild_id in self._pending_guilds:
+            self._pending_guilds.remove(guild_id)
+            if unavailable:
+                self._unavailable_guilds.add(guild_id)
+            self._guild_received.set()
+
+    async def wait_for_guilds(self, timeout: float) -> bool:
+        """
+        Wait for every guild of the last READY to be received.
+
+        Args:
+            timeout: How long to wait for the next guild before giving up, in seconds
+
+        Returns:
+            Whether every guild was received
+
+        """
+        last_report = time.monotonic()
+        while self._pending_guilds:
+            try:
+                await asyncio.wait_for(self._guild_received.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+            self._guild_received.clear()
+
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                progress = self.guild_progress
+                self.logger.info(
+                    f"Shard {self.shard_id} has received {progress['received']}/{progress['expected']} guilds"
+                    f" ({progress['unavailable']} unavailable)"
+                )
+        return True
+
     @property
     def presence(self) -> dict:
         """Returns the presence of the bot."""
@@ -70,7 +188,8 @@ class ConnectionState:
 
     async def start(self) -> None:
         """Connect to the Discord Gateway."""
-        self.gateway_url = await self.client.http.get_gateway()
+        if self.gateway_url is MISSING:
+            self.gateway_url = await self.client.http.get_gateway(self.encoding, self.compression)
 
         self.logger.debug(f"Starting Shard ID {self.shard_id}")
         self.start_time = datetime.now()
@@ -85,14 +204,23 @@ class ConnectionState:
     async def stop(self) -> None:
         """Disconnect from the Discord Gateway."""
         self.logger.debug(f"Shutting down shard ID {self.shard_id}")
-        if self.gateway is not None:
-            self.gateway.close()
+        session_store = self.client.session_store
+        # a shard that failed to connect never had a gateway
+        gateway = self.gateway or None
+        if gateway is not None:
+            gateway.close(resumable=session_store is not None)
             self.gateway = None
 
         if self._shard_task is not None:
             await self._shard_task
             self._shard_task = None
 
+        if gateway is not None and session_store is not None:
+            # the connection has closed by now, so the sequence will not change anymore
+            if session := gateway.export_session():
+                await session_store.save(self.shard_id, self.client.total_shards, session)
+                self.logger.debug(f"Saved session of shard ID {self.shard_id} for resuming")
+
         self.gateway_started.clear()
 
     def clear_ready(self) -> None:
@@ -103,8 +231,14 @@ class ConnectionState:
     async def _ws_connect(self) -> None:
         """Connect to the Discord Gateway."""
         self.logger.info(f"Shard {self.shard_id} is attempting to connect to gateway...")
+        gateway = GatewayClient(self, (self.shard_id, self.client.total_shards))
+        if self.client.session_store is not None:
+            if session := await self.client.session_store.restore(self.shard_id, self.client.total_shards):
+                self.logger.info(f"Shard {self.shard_id} is resuming session {session.session_id}")
+                gateway.restore_session(session)
+
         try:
-            async with GatewayClient(self, (self.shard_id, self.client.total_shards)) as self.gateway:
+            async with gateway as self.gateway:
                 try:
                     await self.gateway.run()
                 finally:
@@ -1,40 +1,132 @@
 import asyncio
 import collections
+import heapq
+import itertools
 import random
 import time
-import zlib
 from abc import abstractmethod
+from enum import IntEnum
 from types import TracebackType
 from typing import TypeVar, TYPE_CHECKING
 
 from aiohttp import WSMsgType
 
+from naff.api.gateway import etf
+from naff.api.gateway.compression import get_transport_compression
 from naff.client.errors import WebSocketClosed
 from naff.client.utils.input_utils import OverriddenJson
-from naff.models.naff.cooldowns import CooldownSystem
+from naff.client.utils.metrics import Histogram
 
 if TYPE_CHECKING:
     from naff.api.gateway.state import ConnectionState
 
-__all__ = ("WebsocketClient", "WebsocketRateLimit")
+__all__ = ("WebsocketClient", "WebsocketRateLimit", "SendPriority")
 
 
 SELF = TypeVar("SELF", bound="WebsocketClient")
 
 
+class SendPriority(IntEnum):
+    """The priority classes of gateway sends, lower values are sent first."""
+
+    URGENT = 0
+    """Voice state and presence updates"""
+    NORMAL = 1
+    """Anything without a specific priority"""
+    BULK = 2
+    """Member requests, which are often sent in bursts"""
+
+
 class WebsocketRateLimit:
-    def __init__(self) -> None:
-        self.lock = asyncio.Lock()
-        # docs state 120 calls per 60 seconds, this is set conservatively to 110 per 60 seconds.
-        rate = 110
-        interval = 60
-        self.cooldown_system = CooldownSystem(1, interval / rate)
-        # hacky way to throttle how frequently we send messages to the gateway
+    """
+    A token bucket that throttles gateway sends, serving queued sends by priority.
+
+    Discord allows 120 sends per 60 seconds. The bucket holds up to `burst` tokens and refills so that, even after a
+    full burst, no more than `rate` tokens can be used in any `interval`. The default rate leaves a margin below the
+    limit for heartbeats, which are never throttled.
+
+    Args:
+        rate: The maximum number of sends per interval
+        interval: The length of the interval, in seconds
+        burst: The number of sends that may be made at once
+
+    """
+
+    def __init__(self, rate: int = 110, interval: float = 60, burst: int = 10) -> None:
+        self.burst = burst
+        self.refill_rate = (rate - burst) / interval
+        self.tokens: float = burst
+        self._last_refill = time.monotonic()
+
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._drain_task: asyncio.Task | None = None
+
+        self.sent: collections.Counter = collections.Counter()
+        """The number of sends, per priority"""
+        self.total_wait: collections.Counter = collections.Counter()
+        """The time spent waiting for the rate limit, per priority"""
+        self.max_wait: collections.Counter = collections.Counter()
+        """The longest time spent waiting for the rate limit, per priority"""
 
-    async def rate_limit(self) -> None:
-        async with self.lock:
-            while not self.cooldown_system.acquire_token():
-                await asyncio.sleep(self.cooldown_system.get_cooldown_time())
+    @property
+    def stats(self) -> dict:
+        """A snapshot of the wait time metrics of each priority."""
+        queued = collections.Counter(priority for priority, _, future in self._waiters if not future.done())
+        return {
+            priority.name.lower(): {
+                "sent": self.sent[priority],
+                "queued": queued[priority],
+                "average_wait": self.total_wait[priority] / self.sent[priority] if self.sent[priority] else 0.0,
+                "max_wait": self.max_wait[priority],
+            }
+            for priority in SendPriority
+        }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.refill_rate)
+        self._last_refill = now
+
+    def _record(self, priority: SendPriority, waited: float) -> None:
+        self.sent[priority] += 1
+        self.total_wait[priority] += waited
+        self.max_wait[priority] = max(self.max_wait[priority], waited)
+
+    async def rate_limit(self, priority: SendPriority = SendPriority.NORMAL) -> None:
+        """
+        Wait until a send is allowed.
+
+        Args:
+            priority: The priority of the send
+
+        """
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return self._record(priority, 0.0)
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+
+        await future
+        self._record(priority, time.monotonic() - start)
+
+    async def _drain(self) -> None:
+        while self._waiters:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            # a cancelled send does not use a token
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
 
 
 class WebsocketClient:
@@ -43,11 +135,26 @@ class WebsocketClient:
         self.logger = state.client.logger
         self.ws = None
         self.ws_url = None
+        self.encoding = "json"
+        self.compression = "zlib-stream"
 
         self.rl_manager = WebsocketRateLimit()
 
         self.heartbeat_interval = None
         self.latency = collections.deque(maxlen=10)
+        self.ack_latency = Histogram()
+        """How long heartbeats took to be acknowledged"""
+        self.heartbeat_jitter = Histogram()
+        """How much later than scheduled each heartbeat was sent"""
+        self.event_metrics = state.client.event_metrics
+        self._decode_time: float | None = None
+        self._record_raw = False
+        self._raw_payload: bytes | str | None = None
+
+        self.bytes_received = 0
+        """The number of bytes received over the wire by this connection"""
+        self.bytes_decoded = 0
+        """The number of bytes of decompressed payloads that have been decoded by this connection"""
 
         # This lock needs to be held to send something over the gateway, but is also held when
         # reconnecting. That way there's no race conditions between sending and reconnecting.
@@ -72,7 +179,7 @@ class WebsocketClient:
             raise RuntimeError("An instance of 'WebsocketClient' cannot be re-used!")
 
         self._entered = True
-        self._zlib = zlib.decompressobj()
+        self._transport = get_transport_compression(self.compression)()
 
         self.ws = await self.state.client.http.websocket_connect(self.ws_url)
 
@@ -125,36 +232,60 @@ class WebsocketClient:
     def close(self) -> None:
         self._close_gateway.set()
 
-    async def send(self, data: str, bypass=False) -> None:
+    def _serialize(self, data: dict) -> str | bytes:
+        """Serialize a payload using the encoding of this connection."""
+        if self.encoding == "etf":
+            return etf.dumps(data)
+        return OverriddenJson.dumps(data)
+
+    def _deserialize(self, data: bytes | str) -> dict:
+        """Deserialize a payload using the encoding of this connection."""
+        if self.encoding == "etf":
+            return etf.loads(data)
+        # both orjson and the json module accept utf-8 bytes, so there is no need to decode to a str first
+        return OverriddenJson.loads(data)
+
+    async def _send_raw(self, data: str | bytes) -> None:
+        """Send already serialized data over the websocket, using the appropriate frame type."""
+        if isinstance(data, bytes):
+            await self.ws.send_bytes(data)
+        else:
+            await self.ws.send_str(data)
+
+    async def send(self, data: str | bytes, bypass=False, priority: SendPriority = SendPriority.NORMAL) -> None:
         """
         Send data to the websocket.
 
         Args:
             data: The data to send
             bypass: Should the rate limit be ignored for this send (used for heartbeats)
+            priority: The priority of this send, while waiting for the rate limit
 
         """
         self.logger.debug(f"Sending data to websocket: {data}")
 
+        # wait for the rate limit outside the lock, so a backlog of sends does not hold up reconnecting
+        if not bypass:
+            await self.rl_manager.rate_limit(priority)
+
         async with self._race_lock:
             if self.ws is None:
                 return self.logger.warning("Attempted to send data while websocket is not connected!")
-            if not bypass:
-                await self.rl_manager.rate_limit()
 
-            await self.ws.send_str(data)
+            await self._send_raw(data)
 
-    async def send_json(self, data: dict, bypass=False) -> None:
+    async def send_json(self, data: dict, bypass=False, priority: SendPriority = SendPriority.NORMAL) -> None:
         """
-        Send JSON data to the websocket.
+        Serialize and send data to the websocket.
 
         Args:
             data: The data to send
             bypass: Should the rate limit be ignored for this send (used for heartbeats)
+            priority: The priority of this send, while waiting for the rate limit
 
         """
-        serialized = OverriddenJson.dumps(data)
-        await self.send(serialized, bypass)
+        serialized = self._serialize(data)
+        await self.send(serialized, bypass, priority)
 
     async def receive(self, force: bool = False) -> str:
         """
@@ -167,8 +298,6 @@ class WebsocketClient:
                 be tried.
 
         """
-        buffer = bytearray()
-
         while True:
             if not force:
                 # If we are currently reconnecting in another task, wait for it to complete.
@@ -218,25 +347,50 @@ class WebsocketClient:
                 continue
 
             if isinstance(resp.data, bytes):
-                buffer.extend(resp.data)
-
-                if len(resp.data) < 4 or resp.data[-4:] != b"\x00\x00\xff\xff":
+                self.bytes_received += len(resp.data)
+                msg = self._transport.decompress(resp.data)
+                if msg is None:
                     # message isn't complete yet, wait
                     continue
-
-                msg = self._zlib.decompress(buffer)
-                msg = msg.decode("utf-8")
+                self.bytes_decoded += len(msg)
             else:
+                # text frames arrive already decoded, count their size on the wire rather than in characters
+                frame_size = len(resp.data.encode("utf-8"))
+                self.bytes_received += frame_size
+                self.bytes_decoded += frame_size
                 msg = resp.data
 
+            if self._skip_payload(msg):
+                continue
+            if self._record_raw:
+                self._raw_payload = msg
+
             try:
-                msg = OverriddenJson.loads(msg)
+                if self.event_metrics is not None:
+                    start = time.perf_counter()
+                    msg = self._deserialize(msg)
+                    self._decode_time = time.perf_counter() - start
+                else:
+                    msg = self._deserialize(msg)
             except Exception as e:
                 self.logger.error(e)
                 continue
 
             return msg
 
+    def _skip_payload(self, msg: bytes | str) -> bool:
+        """
+        Determine if a payload can be discarded before it is decoded.
+
+        Args:
+            msg: The raw, decompressed payload
+
+        Returns:
+            True if the payload should not be decoded
+
+        """
+        return False
+
     async def reconnect(self, *, resume: bool = False, code: int = 1012, url: str | None = None) -> None:
         async with self._race_lock:
             self._closed.clear()
@@ -245,7 +399,7 @@ class WebsocketClient:
                 await self.ws.close(code=code)
 
             self.ws = None
-            self._zlib = zlib.decompressobj()
+            self._transport = get_transport_compression(self.compression)()
 
             self.ws = await self.state.client.http.websocket_connect(url or self.ws_url)
 
@@ -295,7 +449,11 @@ class WebsocketClient:
 
             self._acknowledged.clear()
             await self.send_heartbeat()
-            self._last_heartbeat = time.perf_counter()
+            now = time.perf_counter()
+            if self._last_heartbeat:
+                # a heartbeat that is sent late is a sign that the event loop is blocked
+                self.heartbeat_jitter.observe(max(0.0, now - self._last_heartbeat - self.heartbeat_interval))
+            self._last_heartbeat = now
 
             try:
                 # wait for next iteration, accounting for latency
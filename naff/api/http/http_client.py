@@ -1,5 +1,7 @@
 """This file handles the interaction with discords http endpoints."""
 import asyncio
+import copy
+import sys
 import time
 from logging import Logger
 from typing import Any, cast
@@ -37,77 +39,69 @@ from naff.client.const import (
 )
 from naff.client.errors import DiscordError, Forbidden, GatewayNotFound, HTTPException, NotFound, LoginError
 from naff.client.mixins.serialization import DictSerializationMixin
+from naff.client.utils.cache import TTLCache
 from naff.client.utils.input_utils import response_decode, OverriddenJson
+from naff.client.utils.misc_utils import _copy_exception
 from naff.client.utils.serializer import dict_filter
 from naff.models.discord.file import UPLOADABLE_TYPE
+from .ratelimit import GlobalLock, LocalRateLimitBackend, RateLimitBackend
 from .route import Route
 
 __all__ = ("HTTPClient",)
 
 
-class GlobalLock:
-    def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self.max_requests = 45
-        self._calls = self.max_requests
-        self._reset_time = 0
-
-    @property
-    def calls_remaining(self) -> int:
-        """Returns the amount of calls remaining."""
-        return self.max_requests - self._calls
-
-    def reset_calls(self) -> None:
-        """Resets the calls to the max amount."""
-        self._calls = self.max_requests
-        self._reset_time = time.perf_counter() + 1
-
-    def set_reset_time(self, delta: float) -> None:
-        """
-        Sets the reset time to the current time + delta.
-
-        To be called if a 429 is received.
-        Args:
-            delta: The time to wait before resetting the calls.
-        """
-        self._reset_time = time.perf_counter() + delta
-        self._calls = 0
-
-    async def wait(self) -> None:
-        """Throttles calls to prevent hitting the global rate limit."""
-        async with self._lock:
-            if self._reset_time <= time.perf_counter():
-                self.reset_calls()
-            elif self._calls <= 0:
-                await asyncio.sleep(self._reset_time - time.perf_counter())
-                self.reset_calls()
-        self._calls -= 1
-
-
 class BucketLock:
-    """Manages the ratelimit for each bucket"""
+    """
+    Manages the ratelimit for each bucket.
 
-    def __init__(self) -> None:
-        self._lock: asyncio.Lock = asyncio.Lock()
+    Up to `remaining` requests may be in flight in a bucket at once. A slot is reserved before each request is sent,
+    and the count is reconciled with the ratelimit headers of every response. Until the first response reveals the
+    limit of the bucket, requests are sent one at a time.
+    """
 
-        self.unlock_on_exit: bool = True
+    def __init__(self) -> None:
+        self._condition: asyncio.Condition = asyncio.Condition()
 
         self.bucket_hash: str | None = None
         self.limit: int = -1
         self.remaining: int = -1
         self.delta: float = 0.0
+        self.in_flight: int = 0
+        """The number of requests that have reserved a slot, and are waiting for their response"""
+
+        self._reset_at: float = 0.0
+        self._blocked_until: float = 0.0
 
     def __repr__(self) -> str:
         return f"<BucketLock: {self.bucket_hash or 'Generic'}>"
 
+    @property
+    def available(self) -> int:
+        """The number of requests that may be sent right now."""
+        self._refresh()
+        if self._blocked_until > time.monotonic():
+            return 0
+        if self.remaining < 0:
+            # the limit is unknown until the first response
+            return 1 - self.in_flight
+        return self.remaining - self.in_flight
+
     @property
     def locked(self) -> bool:
-        """Return True if lock is acquired."""
-        return self._lock.locked()
+        """Return True if no more requests may be sent right now."""
+        return self.available <= 0
+
+    @property
+    def locked_for(self) -> float:
+        """How long until this bucket may be used again, zero unless it is exhausted or blocked."""
+        self._refresh()
+        until = max(self._blocked_until, self._reset_at if self.remaining == 0 else 0.0)
+        return max(0.0, until - time.monotonic())
 
-    def unlock(self) -> None:
-        """Unlock this bucket."""
-        self._lock.release()
+    def _refresh(self) -> None:
+        if self.remaining >= 0 and self._reset_at <= time.monotonic():
+            # the bucket has reset
+            self.remaining = self.limit
 
     def ingest_ratelimit_header(self, header: CIMultiDictProxy) -> None:
         """
@@ -118,28 +112,96 @@ class BucketLock:
         """
         self.bucket_hash = header.get("x-ratelimit-bucket")
         self.limit = int(header.get("x-ratelimit-limit") or -1)
-        self.remaining = int(header.get("x-ratelimit-remaining") or -1)
         self.delta = float(header.get("x-ratelimit-reset-after", 0.0))
+        remaining = int(header.get("x-ratelimit-remaining") or -1)
+
+        self._refresh()
+        # responses can arrive out of order, so the lowest count seen before the bucket resets is the accurate one
+        if self.remaining < 0 or remaining < 0:
+            self.remaining = remaining
+        else:
+            self.remaining = min(self.remaining, remaining)
+        self._reset_at = max(self._reset_at, time.monotonic() + self.delta)
+
+    def block(self, delay: float | None = None) -> None:
+        """
+        Stop any more requests from being sent in this bucket for a while.
 
-    async def blind_defer_unlock(self) -> None:
-        """Unlocks the BucketLock but doesn't wait for completion."""
-        self.unlock_on_exit = False
-        loop = asyncio.get_running_loop()
-        loop.call_later(self.delta, self.unlock)
+        Args:
+            delay: How long to block the bucket for, defaults to the time until the bucket resets
 
-    async def defer_unlock(self, reset_after: float | None = None) -> None:
-        """Unlocks the BucketLock after a specified delay."""
-        self.unlock_on_exit = False
-        await asyncio.sleep(reset_after or self.delta)
-        self.unlock()
+        """
+        self._blocked_until = max(self._blocked_until, time.monotonic() + (delay if delay is not None else self.delta))
+
+    async def acquire(self) -> None:
+        """Reserve a slot in this bucket, waiting for one if none are available."""
+        async with self._condition:
+            while self.available <= 0:
+                now = time.monotonic()
+                if self._blocked_until > now:
+                    timeout = self._blocked_until - now
+                elif self._reset_at > now:
+                    timeout = self._reset_at - now
+                else:
+                    # every slot is in flight, or the limit is unknown until the first response
+                    timeout = None
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        """Release a slot reserved in this bucket."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
 
     async def __aenter__(self) -> None:
-        await self._lock.acquire()
+        await self.acquire()
 
     async def __aexit__(self, *args) -> None:
-        if self.unlock_on_exit and self._lock.locked():
-            self.unlock()
-        self.unlock_on_exit = True
+        await self.release()
+
+
+class BucketRegistry(TTLCache):
+    """
+    Maps the rate limit bucket of each route to the bucket hash discord assigned it.
+
+    Routes include the IDs of the resources they act on, so a long-running bot sees an ever-growing number of them.
+    Routes that go unused for `ttl` seconds, and the least recently used routes past `hard_limit`, are evicted. An
+    evicted route only loses its bucket hash, which is restored by its next response, so no rate limit state is lost.
+    Bucket hashes are shared by many routes, so they are interned.
+    """
+
+    def __init__(self, ttl: int = 3600, soft_limit: int = 1000, hard_limit: int = 10000) -> None:
+        super().__init__(ttl=ttl, soft_limit=soft_limit, hard_limit=hard_limit, on_expire=self._on_evict)
+        self.hits: int = 0
+        """The number of lookups that found the route"""
+        self.misses: int = 0
+        """The number of lookups that did not find the route"""
+        self.evictions: int = 0
+        """The number of routes evicted"""
+
+    @property
+    def hit_rate(self) -> float:
+        """The proportion of lookups that found the route."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, sys.intern(value))
+
+    def get(self, key: str, default: str | None = None, reset_expiration: bool = True) -> str | None:
+        value = super().get(key, default, reset_expiration)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _on_evict(self, key: str, value: object) -> None:
+        self.evictions += 1
 
 
 class HTTPClient(
@@ -159,15 +221,28 @@ class HTTPClient(
 ):
     """A http client for sending requests to the Discord API."""
 
-    def __init__(self, connector: BaseConnector | None = None, logger: Logger = MISSING) -> None:
+    def __init__(
+        self,
+        connector: BaseConnector | None = None,
+        logger: Logger = MISSING,
+        ratelimit_backend: RateLimitBackend | None = None,
+    ) -> None:
         self.connector: BaseConnector | None = connector
         self.__session: ClientSession | None = None
         self.token: str | None = None
         self.global_lock: GlobalLock = GlobalLock()
+        self.ratelimit_backend: RateLimitBackend = ratelimit_backend or LocalRateLimitBackend(self.global_lock)
+        """Shares the global rate limit, and blocked buckets, with any other client using the same backend"""
         self._max_attempts: int = 3
 
         self.ratelimit_locks: WeakValueDictionary[str, BucketLock] = WeakValueDictionary()
-        self._endpoints = {}
+        self._held_locks: dict[BucketLock, asyncio.TimerHandle] = {}
+        """Exhausted and blocked locks, kept alive until they reset as `ratelimit_locks` only references them weakly"""
+        self._endpoints: BucketRegistry = BucketRegistry()
+        self._inflight_gets: dict[tuple, list[asyncio.Future]] = {}
+        self._coalescing: set[asyncio.Task] = set()
+        self.coalesced_requests: int = 0
+        """The number of GET requests that shared the response of an identical request already in flight"""
 
         self.user_agent: str = (
             f"DiscordBot ({__repo_url__} {__version__} Python/{__py_version__}) aiohttp/{aiohttp.__version__}"
@@ -213,6 +288,15 @@ class HTTPClient(
             self.logger.debug(f"Caching ingested rate limit data for: {bucket_lock.bucket_hash}")
             self._endpoints[route.rl_bucket] = bucket_lock.bucket_hash
             self.ratelimit_locks[bucket_lock.bucket_hash] = bucket_lock
+            self._hold_lock(bucket_lock)
+
+    def _hold_lock(self, lock: BucketLock) -> None:
+        """Keep a cached lock alive until it may be used again, so the next request still waits for it to reset."""
+        if not lock.bucket_hash or (delay := lock.locked_for) <= 0:
+            return
+        if handle := self._held_locks.get(lock):
+            handle.cancel()
+        self._held_locks[lock] = asyncio.get_running_loop().call_later(delay, self._held_locks.pop, lock, None)
 
     @staticmethod
     def _process_payload(
@@ -272,6 +356,9 @@ class HTTPClient(
         """
         Make a request to discord.
 
+        Concurrent GET requests for the same route and params are coalesced, only one of them is sent and every caller
+        receives its result.
+
         Args:
             route: The route to take
             payload: The payload for this request
@@ -279,6 +366,49 @@ class HTTPClient(
             reason: Attach a reason to this request, used for audit logs
 
         """
+        if route.method != "GET" or payload is not None or files or kwargs:
+            return await self._request(route, payload, files, reason, params, **kwargs)
+
+        key = (route.url, reason, str(sorted(params.items())) if params else None)
+        future = asyncio.get_running_loop().create_future()
+        if (waiters := self._inflight_gets.get(key)) is not None:
+            waiters.append(future)
+            self.coalesced_requests += 1
+        else:
+            self._inflight_gets[key] = [future]
+            # the request runs in its own task, so cancelling the first caller does not cancel it for the others
+            task = asyncio.create_task(self._coalesced_get(key, route, reason, params))
+            self._coalescing.add(task)
+            task.add_done_callback(self._coalescing.discard)
+        return await future
+
+    async def _coalesced_get(self, key: tuple, route: Route, reason: str | None, params: dict | None) -> None:
+        try:
+            result = await self._request(route, reason=reason, params=params)
+        except asyncio.CancelledError:
+            for future in self._inflight_gets.pop(key):
+                future.cancel()
+            raise
+        except Exception as e:
+            # raising one exception from several callers would mix their tracebacks into it
+            for index, future in enumerate(self._inflight_gets.pop(key)):
+                if not future.done():
+                    future.set_exception(e if index == 0 else _copy_exception(e))
+        else:
+            # every caller gets its own copy before any of them can mutate it
+            for index, future in enumerate(self._inflight_gets.pop(key)):
+                if not future.done():
+                    future.set_result(result if index == 0 else copy.deepcopy(result))
+
+    async def _request(
+        self,
+        route: Route,
+        payload: list | dict | None = None,
+        files: list[UPLOADABLE_TYPE] | None = None,
+        reason: str | None = None,
+        params: dict | None = None,
+        **kwargs: dict,
+    ) -> str | dict[str, Any] | None:
         # Assemble headers
         kwargs["headers"] = {"User-Agent": self.user_agent}
         if self.token:
@@ -307,7 +437,7 @@ class HTTPClient(
                         kwargs["data"] = processed_data  # pyright: ignore
                     else:
                         kwargs["json"] = processed_data  # pyright: ignore
-                    await self.global_lock.wait()
+                    await self.ratelimit_backend.acquire(self._shared_bucket(route, lock))
 
                     async with self.__session.request(route.method, route.url, **kwargs) as response:
                         result = await response_decode(response)
@@ -322,7 +452,7 @@ class HTTPClient(
                                 self.logger.error(
                                     f"Bot has exceeded global ratelimit, locking REST API for {result['retry_after']} seconds"
                                 )
-                                self.global_lock.set_reset_time(float(result["retry_after"]))
+                                await self.ratelimit_backend.global_limited(float(result["retry_after"]))
                                 continue
                             elif result.get("message") == "The resource is being rate limited.":
                                 # resource ratelimit is reached
@@ -330,8 +460,10 @@ class HTTPClient(
                                     f"{route.endpoint} The resource is being rate limited! "
                                     f"Reset in {result.get('retry_after')} seconds"
                                 )
-                                # lock this resource and wait for unlock
-                                await lock.defer_unlock(float(result["retry_after"]))
+                                # block this resource until it can be retried
+                                lock.block(float(result["retry_after"]))
+                                self._hold_lock(lock)
+                                await self._share_block(route, lock, float(result["retry_after"]))
                                 continue
                             else:
                                 # endpoint ratelimit is reached
@@ -340,14 +472,16 @@ class HTTPClient(
                                 self.logger.warning(
                                     f"{route.endpoint} Has exceeded it's ratelimit ({lock.limit})! Reset in {lock.delta} seconds"
                                 )
-                                await lock.defer_unlock()  # lock this route and wait for unlock
+                                lock.block()  # block this route until it resets
+                                self._hold_lock(lock)
+                                await self._share_block(route, lock, lock.delta)
                                 continue
                         elif lock.remaining == 0:
-                            # Last call available in the bucket, lock until reset
+                            # Last call available in the bucket, further requests wait for it to reset
                             self.logger.debug(
                                 f"{route.endpoint} Has exhausted its ratelimit ({lock.limit})! Locking route for {lock.delta} seconds"
                             )
-                            await lock.blind_defer_unlock()  # lock this route, but continue processing the current response
+                            await self._share_block(route, lock, lock.delta)
 
                         elif response.status in {500, 502, 504}:
                             # Server issues, retry
@@ -370,6 +504,18 @@ class HTTPClient(
                         continue
                     raise
 
+    @staticmethod
+    def _shared_bucket(route: Route, lock: BucketLock) -> str | None:
+        """The key of a route's bucket in the rate limit backend, Discord limits each bucket per major parameter."""
+        if not lock.bucket_hash:
+            return None
+        return f"{lock.bucket_hash}:{route.channel_id}:{route.guild_id}:{route.webhook_id}"
+
+    async def _share_block(self, route: Route, lock: BucketLock, delay: float) -> None:
+        """Tell the rate limit backend that a bucket must wait, so other clients sharing it wait too."""
+        if (bucket := self._shared_bucket(route, lock)) and delay > 0:
+            await self.ratelimit_backend.block_bucket(bucket, delay)
+
     async def _raise_exception(self, response, route, result) -> None:
         self.logger.error(f"{route.method}::{route.url}: {response.status}")
 
@@ -416,11 +562,19 @@ class HTTPClient(
         """Close the session."""
         if self.__session and not self.__session.closed:
             await self.__session.close()
+        for handle in self._held_locks.values():
+            handle.cancel()
+        self._held_locks.clear()
+        await self.ratelimit_backend.close()
 
-    async def get_gateway(self) -> str:
+    async def get_gateway(self, encoding: str = "json", compression: str | None = "zlib-stream") -> str:
         """
         Gets the gateway url.
 
+        Args:
+            encoding: The payload encoding the gateway should use, either `json` or `etf`
+            compression: The transport compression the gateway should use, or None to disable it
+
         Returns:
             The gateway url
 
@@ -430,7 +584,10 @@ class HTTPClient(
             result = cast(dict[str, Any], result)
         except HTTPException as exc:
             raise GatewayNotFound from exc
-        return "{0}?encoding={1}&v={2}&compress=zlib-stream".format(result["url"], "json", __api_version__)
+        url = "{0}?encoding={1}&v={2}".format(result["url"], encoding, __api_version__)
+        if compression:
+            url += f"&compress={compression}"
+        return url
 
     async def get_gateway_bot(self) -> discord_typings.GetGatewayBotData:
         try:
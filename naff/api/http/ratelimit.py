@@ -0,0 +1,386 @@
+"""
+Rate limit state that can be shared between the http clients of several processes.
+
+Each `HTTPClient` tracks the global rate limit, and the rate limit of every bucket, for its own requests only. When
+several processes use the same token (cluster workers, cron jobs, dashboards...), none of them know about the requests
+of the others, so together they exceed the global rate limit. A shared rate limit backend makes every process draw
+from the same global budget, and makes a bucket that one process exhausted, or got a 429 on, wait in every process.
+
+Run a `RateLimitCoordinator` in one process, and give every client a `SharedRateLimitBackend` connected to it.
+
+??? Hint "Example Usage:"
+    ```python
+    # in a long-running process, such as the one running a ClusterManager
+    coordinator = RateLimitCoordinator("/tmp/naff-ratelimit.sock")
+    await coordinator.start()
+
+    # in every process using the token
+    bot = Client(ratelimit_backend=SharedRateLimitBackend("/tmp/naff-ratelimit.sock"))
+    ```
+
+!!! note
+    The coordinator listens on a unix socket, so every process must run on the same machine. Anyone that can write to
+    the socket can use the budget, so place it somewhere only the bot's user can access.
+
+If the coordinator cannot be reached, a shared backend falls back on local rate limits until it can reconnect.
+"""
+import asyncio
+import itertools
+import os
+import stat
+import time
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from logging import Logger
+
+from naff.client.const import get_logger
+from naff.client.utils.input_utils import OverriddenJson
+
+__all__ = ("GlobalLock", "RateLimitBackend", "LocalRateLimitBackend", "SharedRateLimitBackend", "RateLimitCoordinator")
+
+_STREAM_LIMIT = 2**16
+
+
+class GlobalLock:
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self.max_requests = 45
+        self._calls = self.max_requests
+        self._reset_time = 0
+
+    @property
+    def calls_remaining(self) -> int:
+        """Returns the amount of calls remaining."""
+        return self.max_requests - self._calls
+
+    def reset_calls(self) -> None:
+        """Resets the calls to the max amount."""
+        self._calls = self.max_requests
+        self._reset_time = time.perf_counter() + 1
+
+    def set_reset_time(self, delta: float) -> None:
+        """
+        Sets the reset time to the current time + delta.
+
+        To be called if a 429 is received.
+        Args:
+            delta: The time to wait before resetting the calls.
+        """
+        self._reset_time = time.perf_counter() + delta
+        self._calls = 0
+
+    async def wait(self) -> None:
+        """Throttles calls to prevent hitting the global rate limit."""
+        async with self._lock:
+            if self._reset_time <= time.perf_counter():
+                self.reset_calls()
+            elif self._calls <= 0:
+                await asyncio.sleep(self._reset_time - time.perf_counter())
+                self.reset_calls()
+        self._calls -= 1
+
+
+async def _send(writer: asyncio.StreamWriter, payload: dict) -> None:
+    writer.write(OverriddenJson.dumps(payload).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+class RateLimitBackend(ABC):
+    """
+    The base class for all rate limit backends.
+
+    A backend holds the rate limit state that is shared by every client using it. The client still tracks each of its
+    buckets with a `BucketLock`, the backend is told when a bucket must wait so that other clients wait too.
+    """
+
+    @abstractmethod
+    async def acquire(self, bucket: str | None) -> None:
+        """
+        Wait until a request may be sent.
+
+        Args:
+            bucket: The key of the request's bucket, if it is known
+
+        """
+        ...
+
+    @abstractmethod
+    async def global_limited(self, retry_after: float) -> None:
+        """
+        Report that the global rate limit was exceeded.
+
+        Args:
+            retry_after: How long to wait before sending any request, in seconds
+
+        """
+        ...
+
+    @abstractmethod
+    async def block_bucket(self, bucket: str, delay: float) -> None:
+        """
+        Report that a bucket must wait before it is used again.
+
+        Args:
+            bucket: The key of the bucket
+            delay: How long the bucket must wait, in seconds
+
+        """
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release any resources held by this backend."""
+        ...
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    The default backend, which only limits the requests of its own process.
+
+    Args:
+        global_lock: The lock tracking the global rate limit
+
+    """
+
+    def __init__(self, global_lock: GlobalLock | None = None) -> None:
+        self.global_lock = global_lock or GlobalLock()
+
+    async def acquire(self, bucket: str | None) -> None:
+        await self.global_lock.wait()
+
+    async def global_limited(self, retry_after: float) -> None:
+        self.global_lock.set_reset_time(retry_after)
+
+    async def block_bucket(self, bucket: str, delay: float) -> None:
+        # the client's own bucket lock already waits
+        pass
+
+    async def close(self) -> None:
+        # nothing to release
+        pass
+
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """
+    A backend that shares rate limits with other processes through a `RateLimitCoordinator`.
+
+    Args:
+        path: The path of the coordinator's unix socket
+        reconnect_interval: How long to wait before reconnecting to the coordinator after failing to, in seconds
+        logger: The logger to use
+
+    """
+
+    def __init__(self, path: str, *, reconnect_interval: float = 5, logger: Logger | None = None) -> None:
+        self.path = path
+        self.reconnect_interval = reconnect_interval
+        self.logger = logger or get_logger()
+
+        self.fallback = LocalRateLimitBackend()
+        """The backend used while the coordinator cannot be reached"""
+
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connect_lock = asyncio.Lock()
+        self._retry_at = 0.0
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    @property
+    def connected(self) -> bool:
+        """Whether this backend is connected to the coordinator."""
+        return self._writer is not None
+
+    async def _connect(self) -> bool:
+        if self._writer is not None:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+
+        async with self._connect_lock:
+            if self._writer is not None:
+                return True
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=_STREAM_LIMIT)
+            except OSError as e:
+                self._retry_at = time.monotonic() + self.reconnect_interval
+                self.logger.warning(
+                    f"Could not connect to the rate limit coordinator at {self.path}, using local rate limits: {e}"
+                )
+                return False
+
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read(reader))
+            self.logger.debug(f"Connected to the rate limit coordinator at {self.path}")
+            return True
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                payload = OverriddenJson.loads(line)
+                future = self._pending.pop(payload["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(True)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Lost the connection to the rate limit coordinator: {e!r}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            # requests waiting on the coordinator fall back on local rate limits
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(False)
+            self._pending.clear()
+
+    async def _notify(self, payload: dict) -> bool:
+        if not await self._connect():
+            return False
+        try:
+            await _send(self._writer, payload)
+        except OSError:
+            return False
+        return True
+
+    async def acquire(self, bucket: str | None) -> None:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        if not await self._notify({"op": "acquire", "id": request_id, "bucket": bucket}):
+            self._pending.pop(request_id, None)
+            return await self.fallback.acquire(bucket)
+        try:
+            granted = await future
+        finally:
+            self._pending.pop(request_id, None)
+        if not granted:
+            await self.fallback.acquire(bucket)
+
+    async def global_limited(self, retry_after: float) -> None:
+        await self.fallback.global_limited(retry_after)
+        await self._notify({"op": "global_limited", "retry_after": retry_after})
+
+    async def block_bucket(self, bucket: str, delay: float) -> None:
+        await self._notify({"op": "block", "bucket": bucket, "delay": delay})
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+class RateLimitCoordinator:
+    """
+    Holds the global rate limit budget, and the buckets that must wait, for every process using a token.
+
+    Processes connect with a `SharedRateLimitBackend`, and ask the coordinator before sending each request. The
+    coordinator answers once the global rate limit, and the request's bucket, allow it.
+
+    Args:
+        path: The path of the unix socket to listen on
+        logger: The logger to use
+
+    """
+
+    def __init__(self, path: str, *, logger: Logger | None = None) -> None:
+        self.path = path
+        self.logger = logger or get_logger()
+
+        self.global_lock = GlobalLock()
+        """The global rate limit shared by every process"""
+        self.blocked_buckets: dict[str, float] = {}
+        """When each blocked bucket may be used again, by bucket key, as a monotonic time"""
+
+        self._server: asyncio.AbstractServer | None = None
+        self._grants: dict[asyncio.StreamWriter, set[asyncio.Task]] = {}
+
+    async def start(self) -> None:
+        """Start listening for connections."""
+        # a socket left behind by a coordinator that did not stop cleanly would make binding fail
+        with suppress(FileNotFoundError):
+            if stat.S_ISSOCK(os.stat(self.path).st_mode):
+                os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.path, limit=_STREAM_LIMIT)
+        os.chmod(self.path, 0o600)
+        self.logger.info(f"Rate limit coordinator listening on {self.path}")
+
+    async def stop(self) -> None:
+        """Stop listening, and disconnect every process."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        tasks = []
+        for writer, grants in self._grants.items():
+            writer.close()
+            tasks.extend(grants)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+    def run(self) -> None:
+        """Run the coordinator until interrupted, as a standalone service."""
+
+        async def serve() -> None:
+            await self.start()
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await self.stop()
+
+        with suppress(KeyboardInterrupt):
+            asyncio.run(serve())
+
+    def block_bucket(self, bucket: str, delay: float) -> None:
+        """
+        Make a bucket wait, in every process.
+
+        Args:
+            bucket: The key of the bucket
+            delay: How long the bucket must wait, in seconds
+
+        """
+        now = time.monotonic()
+        if len(self.blocked_buckets) > 1000:
+            self.blocked_buckets = {key: until for key, until in self.blocked_buckets.items() if until > now}
+        self.blocked_buckets[bucket] = max(self.blocked_buckets.get(bucket, 0.0), now + delay)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # grants are tracked per process, so the requests of a process that disconnects stop using the budget
+        grants = self._grants.setdefault(writer, set())
+        try:
+            while line := await reader.readline():
+                payload = OverriddenJson.loads(line)
+                match payload.get("op"):
+                    case "acquire":
+                        task = asyncio.create_task(self._grant(writer, payload["id"], payload.get("bucket")))
+                        grants.add(task)
+                        task.add_done_callback(grants.discard)
+                    case "block":
+                        self.block_bucket(payload["bucket"], float(payload["delay"]))
+                    case "global_limited":
+                        self.logger.warning(
+                            f"A process exceeded the global ratelimit, locking REST API for {payload['retry_after']} seconds"
+                        )
+                        self.global_lock.set_reset_time(float(payload["retry_after"]))
+        except (OSError, ValueError) as e:
+            self.logger.debug(f"Rate limit connection closed: {e!r}")
+        finally:
+            self._grants.pop(writer, None)
+            for task in grants:
+                task.cancel()
+            writer.close()
+
+    async def _grant(self, writer: asyncio.StreamWriter, request_id: int, bucket: str | None) -> None:
+        if bucket:
+            # the bucket may be blocked again while waiting
+            while (delay := self.blocked_buckets.get(bucket, 0.0) - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+        if writer.is_closing():
+            return
+        await self.global_lock.wait()
+        with suppress(OSError):
+            await _send(writer, {"op": "grant", "id": request_id})
@@ -96,8 +96,6 @@ class VoiceGateway(WebsocketClient):
             await self.dispatch_opcode(data, op)
 
     async def receive(self, force=False) -> str:
-        buffer = bytearray()
-
         while True:
             if not force:
                 await self._closed.wait()
@@ -144,13 +142,10 @@ class VoiceGateway(WebsocketClient):
                 continue
 
             if isinstance(resp.data, bytes):
-                buffer.extend(resp.data)
-
-                if len(resp.data) < 4 or resp.data[-4:] != b"\x00\x00\xff\xff":
+                msg = self._transport.decompress(resp.data)
+                if msg is None:
                     # message isn't complete yet, wait
                     continue
-
-                msg = self._zlib.decompress(buffer)
                 msg = msg.decode("utf-8")
             else:
                 msg = resp.data
@@ -166,6 +161,7 @@ class VoiceGateway(WebsocketClient):
         match op:
             case OP.HEARTBEAT_ACK:
                 self.latency.append(time.perf_counter() - self._last_heartbeat)
+                self.ack_latency.observe(self.latency[-1])
 
                 if self._last_heartbeat != 0 and self.latency[-1] >= 15:
                     self.logger.warning(
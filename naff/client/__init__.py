@@ -1,6 +1,7 @@
 from .const import *
 from .client import Client
 from .auto_shard_client import AutoShardedClient
+from .cluster import ClusterManager, Cluster
 from . import smart_cache
 from . import errors
 from . import utils
@@ -1,6 +1,4 @@
 import asyncio
-import time
-from collections import defaultdict
 from typing import TYPE_CHECKING, Optional
 
 import naff.api.events as events
@@ -16,6 +14,7 @@ from naff.models.discord import Status, Activity
 from naff.models.naff.listener import Listener
 
 if TYPE_CHECKING:
+    from naff.client.cluster import Cluster
     from naff.models import Snowflake_Type
 
 __all__ = ("AutoShardedClient",)
@@ -28,9 +27,11 @@ class AutoShardedClient(Client):
     A client to automatically shard the bot.
 
     You can optionally specify the total number of shards to start with, or it will be determined automatically.
+    To only run some of those shards in this process, pass `shard_ids`; see `ClusterManager` to run every shard across
+    several processes.
     """
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, shard_ids: list[int] | None = None, **kwargs) -> None:
         if "total_shards" not in kwargs:
             self.auto_sharding = True
         else:
@@ -38,9 +39,16 @@ class AutoShardedClient(Client):
 
         super().__init__(*args, **kwargs)
 
+        self.shard_ids: list[int] | None = shard_ids
+        """The shards to run in this process, or None to run every shard"""
+        self.cluster: "Cluster | None" = None
+        """The connection to the cluster manager, if this client is running as part of a cluster"""
+
         self._connection_state = None
 
         self._connection_states: list[ConnectionState] = []
+        self._states_by_shard: dict[int, ConnectionState] = {}
+        self._startup_lock = asyncio.Lock()
 
         self.max_start_concurrency: int = 1
 
@@ -77,8 +85,13 @@ class AutoShardedClient(Client):
         """Shutdown the bot."""
         self.logger.debug("Stopping the bot.")
         self._ready.clear()
-        await self.http.close()
+        if self.loop_monitor is not None:
+            self.loop_monitor.stop()
         await asyncio.gather(*(state.stop() for state in self._connection_states))
+        # the websockets use the http session, so it has to outlive them
+        await self.http.close()
+        if self.gateway_recorder is not None:
+            self.gateway_recorder.close()
 
     def get_guild_websocket(self, guild_id: "Snowflake_Type") -> GatewayClient:
         """
@@ -105,6 +118,14 @@ class AutoShardedClient(Client):
         """
         return [guild for key, guild in self.cache.guild_cache.items() if ((key >> 22) % self.total_shards) == shard_id]
 
+    def _receive_guild(self, guild_id: "Snowflake_Type", unavailable: bool = False) -> None:
+        """Count a guild down from those its shard is waiting for."""
+        shard_id = self.get_shard_id(guild_id)
+        if len(self._states_by_shard) != len(self._connection_states):
+            self._states_by_shard = {state.shard_id: state for state in self._connection_states}
+        if state := self._states_by_shard.get(shard_id):
+            state.receive_guild(guild_id, unavailable)
+
     def get_shard_id(self, guild_id: "Snowflake_Type") -> int:
         """
         Get the shard ID for a given guild.
@@ -131,16 +152,11 @@ class AutoShardedClient(Client):
         connection_state = next((state for state in self._connection_states if state.shard_id == shard_id), None)
 
         if len(expected_guilds) != 0:
-            while True:
-                try:
-                    await asyncio.wait_for(self._guild_event.wait(), self.guild_event_timeout)
-                except asyncio.TimeoutError:
-                    self.logger.warning("Timeout waiting for guilds cache: Not all guilds will be in cache")
-                    break
-                self._guild_event.clear()
-                if all(self.cache.get_guild(g_id) is not None for g_id in expected_guilds):
-                    # all guilds cached
-                    break
+            if not await connection_state.wait_for_guilds(self.guild_event_timeout):
+                progress = connection_state.guild_progress
+                self.logger.warning(
+                    f"Timeout waiting for guilds cache: Shard {shard_id} only received {progress['received']}/{progress['expected']} guilds"
+                )
 
             if self.fetch_members:
                 self.logger.info(f"Shard {shard_id} is waiting for members to be chunked")
@@ -154,26 +170,47 @@ class AutoShardedClient(Client):
         self.dispatch(ShardConnect(shard_id))
         self.logger.debug(f"Shard {shard_id} is now ready")
 
+        await self._wait_for_shards()
+
+    @Listener.create()
+    async def on_resume(self) -> None:
+        # a session restored from a previous process resumes without a READY, the other shards may still be connecting
+        await self._wait_for_shards(resumed=True)
+
+    async def _wait_for_shards(self, resumed: bool = False) -> None:
+        """
+        Wait for every shard to be ready, then start up if needed and dispatch the client `READY` signal.
+
+        Args:
+            resumed: Whether a shard resumed its session, which only dispatches `READY` when starting up
+
+        """
         # noinspection PyProtectedMember
         await asyncio.gather(*[shard._shard_ready.wait() for shard in self._connection_states])
 
-        # run any pending startup tasks
-        if self.async_startup_tasks:
-            try:
-                await asyncio.gather(*self.async_startup_tasks)
-            except Exception as e:
-                self.dispatch(events.Error(source="async-extension-loader", error=e))
+        # every shard waits here, only one of them may start up
+        async with self._startup_lock:
+            if self._ready.is_set():
+                return
 
-        # cache slash commands
-        if not self._startup:
-            await self._init_interactions()
-
-        if not self._ready.is_set():
-            self._ready.set()
             if not self._startup:
+                # run any pending startup tasks
+                if self.async_startup_tasks:
+                    try:
+                        await asyncio.gather(*self.async_startup_tasks)
+                    except Exception as e:
+                        self.dispatch(events.Error(source="async-extension-loader", error=e))
+
+                # cache slash commands
+                await self._init_interactions()
+
                 self._startup = True
                 self.dispatch(events.Startup())
-            self.dispatch(events.Ready())
+                resumed = False
+
+            self._ready.set()
+            if not resumed:
+                self.dispatch(events.Ready())
 
     async def astart(self, token: str) -> None:
         """
@@ -185,29 +222,8 @@ class AutoShardedClient(Client):
         self.logger.debug("Starting http client...")
         await self.login(token)
 
-        tasks = []
-
-        # Sort shards into their respective ratelimit buckets
-        shard_buckets = defaultdict(list)
-        for shard in self._connection_states:
-            bucket = str(shard.shard_id % self.max_start_concurrency)
-            shard_buckets[bucket].append(shard)
-
-        for bucket in shard_buckets.values():
-            for shard in bucket:
-                self.logger.debug(f"Starting {shard.shard_id}")
-                start = time.perf_counter()
-                tasks.append(asyncio.create_task(shard.start()))
-
-                if self.max_start_concurrency == 1:
-                    # connection ratelimiting when discord has asked for one connection concurrently
-                    # noinspection PyProtectedMember
-                    await shard._shard_ready.wait()
-                    await asyncio.sleep(5.1 - (time.perf_counter() - start))
-
-            # wait for shards to finish starting
-            # noinspection PyProtectedMember
-            await asyncio.gather(*[shard._shard_ready.wait() for shard in self._connection_states])
+        # every shard is started at once, the identify scheduler spaces out their connections and identifies
+        tasks = [asyncio.create_task(shard.start()) for shard in self._connection_states]
 
         try:
             await asyncio.gather(*tasks)
@@ -229,6 +245,7 @@ class AutoShardedClient(Client):
         data = await self.http.get_gateway_bot()
 
         self.max_start_concurrency = data["session_start_limit"]["max_concurrency"]
+        self.identify_scheduler.update(data["session_start_limit"])
         if self.auto_sharding:
             self.total_shards = data["shards"]
         elif data["shards"] != self.total_shards:
@@ -239,8 +256,13 @@ class AutoShardedClient(Client):
 
         self.logger.debug(f"Starting bot with {self.total_shards} shard{'s' if self.total_shards != 1 else ''}")
         self._connection_states: list[ConnectionState] = [
-            ConnectionState(self, self.intents, shard_id) for shard_id in range(self.total_shards)
+            ConnectionState(
+                self, self.intents, shard_id, encoding=self.gateway_encoding, compression=self.gateway_compression
+            )
+            for shard_id in (self.shard_ids if self.shard_ids is not None else range(self.total_shards))
         ]
+        self._states_by_shard = {state.shard_id: state for state in self._connection_states}
+        self.identify_scheduler.expected = len(self._connection_states)
 
     async def change_presence(
         self,
@@ -264,4 +286,7 @@ class AutoShardedClient(Client):
         if shard_id is None:
             await asyncio.gather(*[shard.change_presence(status, activity) for shard in self._connection_states])
         else:
-            await self._connection_states[shard_id].change_presence(status, activity)
+            state = next((state for state in self._connection_states if state.shard_id == shard_id), None)
+            if state is None:
+                raise ValueError(f"Shard {shard_id} is not running in this process")
+            await state.change_presence(status, activity)
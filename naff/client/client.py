@@ -34,9 +34,16 @@ from discord_typings.interactions.receiving import (
 import naff.api.events as events
 import naff.client.const as constants
 from naff.api.events import BaseEvent, Component, RawGatewayEvent, processors, MessageCreate
+from naff.api.gateway.compression import get_transport_compression
 from naff.api.gateway.gateway import GatewayClient
+from naff.api.gateway.identify import IdentifyScheduler
+from naff.api.gateway.chunking import ChunkScheduler
+from naff.api.gateway.pipeline import EventPipelineConfig
+from naff.api.gateway.recorder import GatewayRecorder
+from naff.api.gateway.session_store import SessionStore
 from naff.api.gateway.state import ConnectionState
 from naff.api.http.http_client import HTTPClient
+from naff.api.http.ratelimit import RateLimitBackend
 from naff.client import errors
 from naff.client.const import GLOBAL_SCOPE, MISSING, MENTION_PREFIX, Absent, EMBED_MAX_DESC_LENGTH, get_logger
 from naff.client.errors import (
@@ -51,6 +58,7 @@ from naff.client.errors import (
 from naff.client.smart_cache import GlobalCache
 from naff.client.utils import NullCache
 from naff.client.utils.input_utils import get_first_word, get_args
+from naff.client.utils.metrics import EventMetrics, LoopMonitor
 from naff.client.utils.misc_utils import get_event_name, wrap_partial
 from naff.client.utils.serializer import to_image_data
 from naff.models import (
@@ -207,10 +215,19 @@ class Client(
         activity: The activity the bot should log in "playing"
 
         sync_interactions: Should application commands be synced with discord?
+        chunk_scheduler: Fetch members over the gateway through this scheduler when `fetch_members` is enabled, rather than over http one guild at a time
+        defer_guild_members: Cache the members included in GUILD_CREATE once the client is ready, rather than delaying it. Implies `guild_create_slice_size`
         delete_unused_application_cmds: Delete any commands from discord that aren't implemented in this client
         enforce_interaction_perms: Enforce discord application command permissions, locally
+        event_metrics: Record the count, decode, processor and listener time of each event per shard. See `Client.get_event_metrics`
+        event_pipeline: Process gateway events through a bounded queue with a fixed pool of workers, instead of a task per event
         fetch_members: Should the client fetch members from guilds upon startup (this will delay the client being ready)
+        filter_events: Skip decoding gateway events that have no processor, listener or waiter. Only applies to the `json` encoding
+        loop_monitor: Measure the event loop's lag, and record what was running when it stalls. See `Client.get_metrics`
+        member_fetch_concurrency: How many ranges of member IDs each guild fetches at once over http when `fetch_members` is enabled, guilds with up to 1000 members are fetched in one request, see `Guild.http_chunk`
+        ratelimit_backend: Share REST rate limits with other processes using the same token, i.e. `SharedRateLimitBackend(path)`
         send_command_tracebacks: Automatically send uncaught tracebacks if a command throws an exception
+        session_store: Save gateway sessions when stopping, and resume them on the next start, i.e. `FileSessionStore()`
 
         auto_defer: AutoDefer: A system to automatically defer commands after a set duration
         interaction_context: Type[InteractionContext]: InteractionContext: The object to instantiate for Interaction Context
@@ -222,6 +239,10 @@ class Client(
 
         total_shards: The total number of shards in use
         shard_id: The zero based int ID of this shard
+        gateway_compression: The transport compression the gateway should use, `zlib-stream`, `zstd-stream` (requires `zstandard`) or None
+        gateway_encoding: The payload encoding the gateway should use, either `json` or `etf`. `etf` is faster to decode and smaller on the wire when `erlpack` is installed
+        gateway_recorder: Record every dispatch received from the gateway to a file, to be replayed with `replay_recording`
+        guild_create_slice_size: Cache the channels, members and voice states of GUILD_CREATE this many at a time, yielding to the event loop in between. Defaults to caching them all at once
 
         debug_scope: Force all application commands to be registered within this scope
         disable_dm_commands: Should interaction commands be disabled in DMs?
@@ -249,23 +270,36 @@ class Client(
         auto_defer: Absent[Union[AutoDefer, bool]] = MISSING,
         autocomplete_context: Type[AutocompleteContext] = AutocompleteContext,
         component_context: Type[ComponentContext] = ComponentContext,
+        chunk_scheduler: Optional[ChunkScheduler] = None,
         debug_scope: Absent["Snowflake_Type"] = MISSING,
         default_prefix: str | Iterable[str] = MENTION_PREFIX,
+        defer_guild_members: bool = False,
         delete_unused_application_cmds: bool = False,
         disable_dm_commands: bool = False,
         enforce_interaction_perms: bool = True,
+        event_metrics: bool = False,
+        event_pipeline: Absent[EventPipelineConfig] = MISSING,
         fetch_members: bool = False,
+        filter_events: bool = False,
+        gateway_compression: str | None = "zlib-stream",
+        gateway_encoding: str = "json",
+        gateway_recorder: Optional[GatewayRecorder] = None,
         generate_prefixes: Absent[Callable[..., Coroutine]] = MISSING,
         global_post_run_callback: Absent[Callable[..., Coroutine]] = MISSING,
         global_pre_run_callback: Absent[Callable[..., Coroutine]] = MISSING,
+        guild_create_slice_size: Optional[int] = None,
         intents: Union[int, Intents] = Intents.DEFAULT,
         interaction_context: Type[InteractionContext] = InteractionContext,
         logger: logging.Logger = MISSING,
+        loop_monitor: bool = False,
+        member_fetch_concurrency: int = 1,
         owner_ids: Iterable["Snowflake_Type"] = (),
         modal_context: Type[ModalContext] = ModalContext,
         prefixed_context: Type[PrefixedContext] = PrefixedContext,
         hybrid_context: Type[HybridContext] = HybridContext,
+        ratelimit_backend: Optional[RateLimitBackend] = None,
         send_command_tracebacks: bool = True,
+        session_store: Optional[SessionStore] = None,
         shard_id: int = 0,
         status: Status = Status.ONLINE,
         sync_interactions: bool = True,
@@ -314,7 +348,7 @@ class Client(
 
         # resources
 
-        self.http: HTTPClient = HTTPClient(logger=self.logger)
+        self.http: HTTPClient = HTTPClient(logger=self.logger, ratelimit_backend=ratelimit_backend)
         """The HTTP client to use when interacting with discord endpoints"""
 
         # context objects
@@ -343,12 +377,42 @@ class Client(
 
         # Sharding
         self.total_shards = total_shards
-        self._connection_state: ConnectionState = ConnectionState(self, intents, shard_id)
+        self.gateway_encoding = gateway_encoding
+        """The payload encoding used by the gateway"""
+        self.gateway_compression = gateway_compression
+        """The transport compression used by the gateway"""
+        self._connection_state: ConnectionState = ConnectionState(
+            self, intents, shard_id, encoding=gateway_encoding, compression=gateway_compression
+        )
+        self.identify_scheduler = IdentifyScheduler(logger=self.logger)
+        """Spaces out the identifies of every shard, to respect the session start limit"""
 
         self.enforce_interaction_perms = enforce_interaction_perms
 
         self.fetch_members = fetch_members
         """Fetch the full members list of all guilds on startup"""
+        self.member_fetch_concurrency: int = member_fetch_concurrency
+        """How many ranges of member IDs each guild fetches at once, when fetching members over http"""
+        self.chunk_scheduler: Optional[ChunkScheduler] = chunk_scheduler
+        """Coordinates fetching the members of every guild, if set"""
+        self.guild_create_slice_size: Optional[int] = guild_create_slice_size
+        """How many objects of a GUILD_CREATE to cache before yielding to the event loop, if it is cached incrementally"""
+        self.defer_guild_members = defer_guild_members
+        """Cache the members included in GUILD_CREATE once the client is ready"""
+
+        self.session_store: Optional[SessionStore] = session_store
+        """Where gateway sessions are saved to be resumed after a restart, if anywhere"""
+        self.event_pipeline: Absent[EventPipelineConfig] = event_pipeline
+        """The configuration of the bounded event pipeline of each shard, if enabled"""
+
+        self.filter_events = filter_events
+        """Skip decoding gateway events that nothing will consume, see `Client.remove_event_processor`"""
+        self.gateway_recorder: Optional[GatewayRecorder] = gateway_recorder
+        """Records every dispatch received from the gateway, if enabled"""
+        self.loop_monitor: Optional[LoopMonitor] = LoopMonitor(logger=self.logger) if loop_monitor else None
+        """Measures the event loop's lag and stalls, if enabled"""
+        self.event_metrics: Optional[EventMetrics] = EventMetrics() if event_metrics else None
+        """Records the throughput and latency of each event, if enabled"""
 
         self._mention_reg = MISSING
 
@@ -422,6 +486,15 @@ class Client(
         """Returns the latency of the websocket connection."""
         return self._connection_state.latency
 
+    @property
+    def shards(self) -> list[ConnectionState]:
+        """Returns a list of all shards currently in use."""
+        return [self._connection_state]
+
+    def _receive_guild(self, guild_id: "Snowflake_Type", unavailable: bool = False) -> None:
+        """Count a guild down from those its shard is waiting for."""
+        self._connection_state.receive_guild(guild_id, unavailable)
+
     @property
     def average_latency(self) -> float:
         """Returns the average latency of the websocket connection."""
@@ -517,6 +590,14 @@ class Client(
                 "As `delete_unused_application_cmds` is enabled, the client must cache all guilds app-commands, this could take a while."
             )
 
+        if self.gateway_encoding not in ("json", "etf"):
+            raise BotException(f"Unsupported gateway encoding: {self.gateway_encoding}, use `json` or `etf`")
+
+        try:
+            get_transport_compression(self.gateway_compression)
+        except ValueError as e:
+            raise BotException(str(e)) from None
+
         if Intents.GUILDS not in self._connection_state.intents:
             self.logger.warning("GUILD intent has not been enabled; this is very likely to cause errors")
 
@@ -574,9 +655,12 @@ class Client(
 
                 if len(_event.__attrs_attrs__) == 2:
                     # override_name & bot
-                    await _coro()
+                    call = _coro()
                 else:
-                    await _coro(_event, *_args, **_kwargs)
+                    call = _coro(_event, *_args, **_kwargs)
+                if self.event_metrics is not None:
+                    call = self.event_metrics.time_listener(call, _event.resolved_name)
+                await call
             except asyncio.CancelledError:
                 pass
             except Exception as e:
@@ -808,6 +892,12 @@ class Client(
 
     @Listener.create()
     async def on_resume(self) -> None:
+        if not self._startup:
+            # a session restored from a previous process resumes without a READY to start up from
+            self._startup = True
+            await self._init_interactions()
+            self.dispatch(events.Startup())
+            self.dispatch(events.Ready())
         self._ready.set()
 
     @Listener.create(is_default_listener=True)
@@ -823,22 +913,14 @@ class Client(
         expected_guilds = {to_snowflake(guild["id"]) for guild in data["guilds"]}
         self._user._add_guilds(expected_guilds)
 
-        if not self._startup:
-            while True:
-                try:  # wait to let guilds cache
-                    await asyncio.wait_for(self._guild_event.wait(), self.guild_event_timeout)
-                except asyncio.TimeoutError:
-                    # this will *mostly* occur when a guild has been shadow deleted by discord T&S.
-                    # there is no way to check for this, so we just need to wait for this to time out.
-                    # We still log it though, just in case.
-                    self.logger.debug("Timeout waiting for guilds cache")
-                    break
-                self._guild_event.clear()
-
-                if len(self.cache.guild_cache) == len(expected_guilds):
-                    # all guilds cached
-                    break
+        # wait to let guilds cache, the gateway counts them down as they are received
+        if not await self._connection_state.wait_for_guilds(self.guild_event_timeout):
+            # this will *mostly* occur when a guild has been shadow deleted by discord T&S.
+            # there is no way to check for this, so we just need to wait for this to time out.
+            # We still log it though, just in case.
+            self.logger.debug(f"Timeout waiting for guilds cache: {self._connection_state.guild_progress}")
 
+        if not self._startup:
             if self.fetch_members:
                 # ensure all guilds have completed chunking
                 for guild in self.guilds:
@@ -853,26 +935,6 @@ class Client(
             self._startup = True
             self.dispatch(events.Startup())
 
-        else:
-            # reconnect ready
-            ready_guilds = set()
-
-            async def _temp_listener(_event: events.RawGatewayEvent) -> None:
-                ready_guilds.add(_event.data["id"])
-
-            listener = Listener.create("_on_raw_guild_create")(_temp_listener)
-            self.add_listener(listener)
-
-            while True:
-                try:
-                    await asyncio.wait_for(self._guild_event.wait(), self.guild_event_timeout)
-                    if len(ready_guilds) == len(expected_guilds):
-                        break
-                except asyncio.TimeoutError:
-                    break
-
-            self.listeners["raw_guild_create"].remove(listener)
-
         self._ready.set()
         self.dispatch(events.Ready())
 
@@ -902,6 +964,9 @@ class Client(
         if self.app.owner:
             self.owner_ids.add(self.app.owner.id)
 
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+
         self.dispatch(events.Login())
 
     async def astart(self, token: str) -> None:
@@ -949,8 +1014,13 @@ class Client(
         """Shutdown the bot."""
         self.logger.debug("Stopping the bot.")
         self._ready.clear()
-        await self.http.close()
+        if self.loop_monitor is not None:
+            self.loop_monitor.stop()
         await self._connection_state.stop()
+        # the websockets use the http session, so it has to outlive them
+        await self.http.close()
+        if self.gateway_recorder is not None:
+            self.gateway_recorder.close()
 
     def dispatch(self, event: events.BaseEvent, *args, **kwargs) -> None:
         """
@@ -983,6 +1053,59 @@ class Client(
             for idx in sorted(index_to_remove, reverse=True):
                 _waits.pop(idx)
 
+    def get_metrics(self) -> dict:
+        """
+        Get a snapshot of the health metrics of the bot.
+
+        This includes the latency, heartbeat jitter and acknowledgement latency histograms, byte counts, and queue
+        statistics of each shard, as well as the lag and recent stalls of the event loop if `loop_monitor` is enabled,
+        the metrics of each event if `event_metrics` is enabled, and the member chunking progress if `chunk_scheduler` is set.
+
+        Returns:
+            The metrics of the event loop as `loop`, those of each shard by ID as `shards`, those of each event as `events`, and the chunking progress as `chunking`
+        """
+        return {
+            "loop": self.loop_monitor.stats if self.loop_monitor is not None else None,
+            "shards": {state.shard_id: state.metrics for state in self.shards},
+            "events": self.event_metrics.to_dict() if self.event_metrics is not None else None,
+            "chunking": self.chunk_scheduler.progress if self.chunk_scheduler is not None else None,
+        }
+
+    def get_event_metrics(self, output: str = "dict") -> dict | str | None:
+        """
+        Get the throughput and latency of each event, if `event_metrics` is enabled.
+
+        Args:
+            output: The format to export the metrics in, either `dict` or `prometheus`
+
+        Returns:
+            The metrics of each event, or None if `event_metrics` is not enabled
+
+        Raises:
+            ValueError: If the format is not supported
+
+        """
+        if output not in ("dict", "prometheus"):
+            raise ValueError(f"Unknown metrics format: {output}, expected dict or prometheus")
+        if self.event_metrics is None:
+            return None
+        if output == "prometheus":
+            return self.event_metrics.to_prometheus()
+        return self.event_metrics.to_dict()
+
+    def has_listeners(self, event_name: str) -> bool:
+        """
+        Check if anything is listening for an event.
+
+        Args:
+            event_name: The resolved name of the event
+
+        Returns:
+            True if any listeners or waiters are registered for this event
+
+        """
+        return bool(self.listeners.get(event_name) or self.waits.get(event_name))
+
     async def wait_until_ready(self) -> None:
         """Waits for the client to become ready."""
         await self._ready.wait()
@@ -1142,6 +1265,19 @@ class Client(
 
         return wrapper
 
+    def remove_event_processor(self, event_name: str) -> None:
+        """
+        Remove an event processor.
+
+        This will stop the client from caching and dispatching anything for this event. Combined with `filter_events`,
+        events that have neither a processor nor a listener are not decoded at all.
+
+        Args:
+            event_name: The name of the processor to remove, i.e. `raw_typing_start`
+
+        """
+        self.processors.pop(event_name, None)
+
     def add_listener(self, listener: Listener) -> None:
         """
         Add a listener for an event, if no event is passed, one is determined.
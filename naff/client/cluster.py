@@ -0,0 +1,541 @@
+"""
+Run a large bot as several processes, each running an `AutoShardedClient` for a range of its shards.
+
+A `ClusterManager` splits the shards of the bot into clusters and spawns a process for each of them. It also acts as
+a coordinator between clusters: it relays queries from one cluster to the others, and schedules the identifies of
+every shard so that the `max_concurrency` limit of the bot is honoured across processes.
+
+??? Hint "Example Usage:"
+    ```python
+    from naff import AutoShardedClient, ClusterManager
+
+    def create_bot() -> AutoShardedClient:
+        bot = AutoShardedClient()
+        bot.load_extension("my_extension")
+        return bot
+
+    if __name__ == "__main__":
+        ClusterManager(create_bot, shards_per_cluster=16).start("token")
+    ```
+
+    Within a cluster, `bot.cluster` can then be used to query the other clusters:
+    ```python
+    guild_count = await bot.cluster.guild_count()
+    guild_info = await bot.cluster.get_guild(guild_id)
+    ```
+
+!!! note
+    Clusters are started with the `spawn` method, so the client factory must be importable; a module-level function.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import secrets
+import tempfile
+from contextlib import suppress
+from logging import Logger
+from typing import TYPE_CHECKING, Any, Callable, Coroutine
+
+from naff.api.gateway.identify import IdentifyScheduler
+from naff.api.http.http_client import HTTPClient
+from naff.api.http.ratelimit import RateLimitCoordinator, SharedRateLimitBackend
+from naff.client.const import get_logger
+from naff.client.utils.input_utils import OverriddenJson
+
+if TYPE_CHECKING:
+    from naff.client.auto_shard_client import AutoShardedClient
+    from naff.models.discord.snowflake import Snowflake_Type
+
+__all__ = ("Cluster", "ClusterManager")
+
+_STREAM_LIMIT = 2**24
+
+
+async def _send(writer: asyncio.StreamWriter, payload: dict) -> None:
+    writer.write(OverriddenJson.dumps(payload).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+class Cluster:
+    """
+    The connection of one cluster to its `ClusterManager`.
+
+    This is created by the manager in each cluster process, and is available as `AutoShardedClient.cluster`.
+
+    Attributes:
+        cluster_id: The ID of this cluster
+        shard_ids: The shards this cluster runs
+        cluster_shards: The shards of every cluster, by cluster ID
+        total_shards: The total number of shards of the bot
+
+    """
+
+    def __init__(
+        self,
+        client: "AutoShardedClient",
+        cluster_id: int,
+        cluster_shards: list[list[int]],
+        total_shards: int,
+        port: int,
+        secret: str,
+    ) -> None:
+        self.client = client
+        self.cluster_id = cluster_id
+        self.cluster_shards = cluster_shards
+        self.shard_ids = cluster_shards[cluster_id]
+        self.total_shards = total_shards
+        self.logger: Logger = client.logger
+
+        self._port = port
+        self._secret = secret
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+        self.handlers: dict[str, Callable[..., Coroutine]] = {
+            "guild_count": self._guild_count,
+            "get_guild": self._get_guild,
+        }
+        """The queries this cluster can answer, by name"""
+
+    def register_handler(
+        self, name: str | None = None
+    ) -> Callable[[Callable[..., Coroutine]], Callable[..., Coroutine]]:
+        """
+        A decorator to register a query that other clusters can send to this cluster.
+
+        The handler is called with the keyword arguments of the query, and must return something JSON serializable.
+
+        Args:
+            name: The name of the query, if not the coroutine name
+
+        """
+
+        def wrapper(coro: Callable[..., Coroutine]) -> Callable[..., Coroutine]:
+            self.handlers[name or coro.__name__] = coro
+            return coro
+
+        return wrapper
+
+    def get_cluster_id(self, shard_id: int) -> int:
+        """
+        Get the cluster running a shard.
+
+        Args:
+            shard_id: The ID of the shard
+
+        Returns:
+            The ID of the cluster
+
+        """
+        return next(c_id for c_id, shards in enumerate(self.cluster_shards) if shard_id in shards)
+
+    async def connect(self) -> None:
+        """Connect to the cluster manager."""
+        reader, self._writer = await asyncio.open_connection("127.0.0.1", self._port, limit=_STREAM_LIMIT)
+        await _send(self._writer, {"op": "hello", "cluster_id": self.cluster_id, "secret": self._secret})
+        self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def close(self) -> None:
+        """Disconnect from the cluster manager."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                payload = OverriddenJson.loads(line)
+                match payload["op"]:
+                    case "reply":
+                        future = self._pending.pop(payload["id"], None)
+                        if future is not None and not future.done():
+                            future.set_result(payload["result"])
+                    case "call":
+                        asyncio.create_task(self._answer(payload))
+        finally:
+            # nothing will answer the requests still waiting
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost the connection to the cluster manager"))
+            self._pending.clear()
+
+    async def _answer(self, payload: dict) -> None:
+        try:
+            handler = self.handlers[payload["method"]]
+            result = await handler(**payload["kwargs"])
+        except Exception as e:
+            self.logger.error(f"Cluster query {payload['method']} failed: {e}", exc_info=e)
+            result = None
+        if self._writer is None or self._writer.is_closing():
+            # the connection was lost while answering, nobody is waiting for the reply anymore
+            return
+        await _send(self._writer, {"op": "reply", "id": payload["id"], "result": result})
+
+    async def _request(self, op: str, *, timeout: float | None = None, **kwargs) -> Any:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await _send(self._writer, {"op": op, "id": request_id, **kwargs})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def query(
+        self, method: str, cluster_id: int | None = None, *, timeout: float = 30, **kwargs
+    ) -> dict[int, Any]:
+        """
+        Send a query to other clusters.
+
+        Args:
+            method: The name of the query
+            cluster_id: The cluster to query, or None to query every cluster that is connected to the manager, including this one. Clusters that have not connected yet are left out of the results
+            timeout: How long to wait for each cluster to answer, in seconds. Clusters that do not answer in time, or that disconnect, have a result of None
+            **kwargs: The arguments of the query, these must be JSON serializable
+
+        Returns:
+            The result of each cluster, by cluster ID
+
+        Raises:
+            asyncio.TimeoutError: If the manager itself did not answer in time
+            ConnectionError: If the connection to the manager was lost
+
+        """
+        results = await self._request(
+            "query",
+            method=method,
+            cluster_id=cluster_id,
+            kwargs=kwargs,
+            query_timeout=timeout,
+            # the manager answers with whatever it has once the clusters time out, this only catches a stuck manager
+            timeout=timeout + 5,
+        )
+        return {int(c_id): result for c_id, result in results.items()}
+
+    async def acquire_identify(self, shard_id: int) -> None:
+        """
+        Wait until the manager allows a shard to identify.
+
+        Args:
+            shard_id: The ID of the shard about to identify
+
+        """
+        await self._request("identify", shard_id=shard_id)
+
+    async def release_identify(self, shard_id: int) -> None:
+        """
+        Tell the manager that a shard has sent its identify, or failed to, so that the next shard may identify.
+
+        Args:
+            shard_id: The ID of the shard that identified
+
+        """
+        if self._writer is None or self._writer.is_closing():
+            # the manager releases the identifies of a cluster that disconnected
+            return
+        with suppress(OSError):
+            await _send(self._writer, {"op": "identified", "shard_id": shard_id})
+
+    async def guild_count(self) -> int:
+        """
+        Get the number of guilds across every cluster.
+
+        Clusters that are not connected, or that do not answer, are left out of the count, and logged.
+        """
+        results = await self.query("guild_count")
+        if missing := [c_id for c_id in range(len(self.cluster_shards)) if results.get(c_id) is None]:
+            self.logger.warning(f"The guild count is missing clusters {missing}, which did not answer")
+        return sum(count for count in results.values() if count is not None)
+
+    async def get_guild(self, guild_id: "Snowflake_Type") -> dict | None:
+        """
+        Get basic information about a guild from the cluster that runs its shard.
+
+        Args:
+            guild_id: The ID of the guild
+
+        Returns:
+            The guild's `id`, `name`, `member_count` and `shard_id`, or None if it is not cached
+
+        """
+        shard_id = (int(guild_id) >> 22) % self.total_shards
+        cluster_id = self.get_cluster_id(shard_id)
+        if cluster_id == self.cluster_id:
+            return await self._get_guild(guild_id=int(guild_id))
+        return (await self.query("get_guild", cluster_id, guild_id=int(guild_id)))[cluster_id]
+
+    async def _guild_count(self) -> int:
+        return len(self.client.cache.guild_cache)
+
+    async def _get_guild(self, guild_id: int) -> dict | None:
+        guild = self.client.cache.get_guild(guild_id)
+        if guild is None:
+            return None
+        return {
+            "id": str(guild.id),
+            "name": guild.name,
+            "member_count": guild.member_count,
+            "shard_id": self.client.get_shard_id(guild.id),
+        }
+
+
+class _ClusterIdentifyScheduler(IdentifyScheduler):
+    """An identify scheduler that defers to the cluster manager, which schedules the identifies of every cluster."""
+
+    def __init__(self, cluster: Cluster) -> None:
+        super().__init__(logger=cluster.logger)
+        self.cluster = cluster
+
+    async def acquire(self, shard_id: int) -> None:
+        await self.cluster.acquire_identify(shard_id)
+        self.identified += 1
+        self.logger.info(f"Shard {shard_id} is identifying ({self.identified}/{len(self.cluster.shard_ids)})")
+
+    async def release(self, shard_id: int) -> None:
+        await self.cluster.release_identify(shard_id)
+
+
+def _run_cluster(
+    client_factory: Callable[[], "AutoShardedClient"],
+    token: str,
+    cluster_id: int,
+    cluster_shards: list[list[int]],
+    total_shards: int,
+    port: int,
+    secret: str,
+    ratelimit_path: str | None,
+) -> None:
+    """The entry point of a cluster process."""
+    client = client_factory()
+    if ratelimit_path:
+        client.http.ratelimit_backend = SharedRateLimitBackend(ratelimit_path, logger=client.logger)
+    client.auto_sharding = False
+    client.total_shards = total_shards
+    client.shard_ids = cluster_shards[cluster_id]
+    client.cluster = Cluster(client, cluster_id, cluster_shards, total_shards, port, secret)
+    client.identify_scheduler = _ClusterIdentifyScheduler(client.cluster)
+
+    async def run() -> None:
+        await client.cluster.connect()
+        try:
+            await client.astart(token)
+        finally:
+            await client.cluster.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+class ClusterManager:
+    """
+    Splits a bot's shards into clusters, and runs each cluster in its own process.
+
+    Args:
+        client_factory: A module-level function that creates the `AutoShardedClient` of a cluster
+        total_shards: The total number of shards, defaults to the number recommended by Discord
+        shards_per_cluster: The number of shards each cluster runs
+        clusters: The number of clusters to split the shards into, overrides `shards_per_cluster`
+        share_ratelimits: Share REST rate limits between clusters through a `RateLimitCoordinator`, so that together they stay within the global rate limit. Requires unix sockets
+
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], "AutoShardedClient"],
+        *,
+        total_shards: int | None = None,
+        shards_per_cluster: int = 16,
+        clusters: int | None = None,
+        share_ratelimits: bool = False,
+    ) -> None:
+        self.client_factory = client_factory
+        self.total_shards = total_shards
+        self.shards_per_cluster = shards_per_cluster
+        self.cluster_count = clusters
+        self.logger: Logger = get_logger()
+
+        self.cluster_shards: list[list[int]] = []
+        """The shards of every cluster, by cluster ID"""
+        self.processes: list[multiprocessing.Process] = []
+        """The process of every cluster, by cluster ID"""
+        self.identify_scheduler = IdentifyScheduler(logger=self.logger)
+        """Schedules the identifies of every cluster"""
+        self.ratelimit_coordinator: RateLimitCoordinator | None = None
+        """Shares REST rate limits between clusters, if `share_ratelimits` is enabled"""
+
+        self._secret = secrets.token_hex(16)
+        if share_ratelimits:
+            self.ratelimit_coordinator = RateLimitCoordinator(
+                os.path.join(tempfile.gettempdir(), f"naff-ratelimit-{self._secret[:16]}.sock"), logger=self.logger
+            )
+        self._clusters: dict[int, asyncio.StreamWriter] = {}
+        self._pending: dict[int, tuple[int, asyncio.Future]] = {}  # key: call ID; value: (cluster ID, future)
+        self._ids = itertools.count()
+
+    def split_shards(self, total_shards: int) -> list[list[int]]:
+        """
+        Split the shards of the bot into clusters.
+
+        Args:
+            total_shards: The total number of shards
+
+        Returns:
+            The shards of each cluster
+
+        """
+        if self.cluster_count:
+            per_cluster = -(-total_shards // self.cluster_count)
+        else:
+            per_cluster = self.shards_per_cluster
+        return [list(range(i, min(i + per_cluster, total_shards))) for i in range(0, total_shards, per_cluster)]
+
+    def start(self, token: str) -> None:
+        """
+        Start every cluster, and block until they have all exited.
+
+        Args:
+            token: Your bot's token
+
+        """
+        try:
+            asyncio.run(self.astart(token))
+        except KeyboardInterrupt:
+            pass
+
+    async def astart(self, token: str) -> None:
+        """
+        Asynchronous method to start every cluster.
+
+        Args:
+            token: Your bot's token
+
+        """
+        http = HTTPClient(logger=self.logger)
+        try:
+            await http.login(token)
+            gateway = await http.get_gateway_bot()
+        finally:
+            await http.close()
+
+        total_shards = self.total_shards or gateway["shards"]
+        self.cluster_shards = self.split_shards(total_shards)
+        self.identify_scheduler.update(gateway["session_start_limit"])
+        self.identify_scheduler.expected = total_shards
+
+        server = await asyncio.start_server(self._handle_connection, "127.0.0.1", 0, limit=_STREAM_LIMIT)
+        port = server.sockets[0].getsockname()[1]
+        if self.ratelimit_coordinator:
+            await self.ratelimit_coordinator.start()
+
+        self.logger.info(f"Starting {len(self.cluster_shards)} clusters for {total_shards} shards")
+        context = multiprocessing.get_context("spawn")
+        for cluster_id in range(len(self.cluster_shards)):
+            process = context.Process(
+                target=_run_cluster,
+                args=(
+                    self.client_factory,
+                    token,
+                    cluster_id,
+                    self.cluster_shards,
+                    total_shards,
+                    port,
+                    self._secret,
+                    self.ratelimit_coordinator.path if self.ratelimit_coordinator else None,
+                ),
+                name=f"naff-cluster-{cluster_id}",
+            )
+            process.start()
+            self.processes.append(process)
+
+        try:
+            async with server:
+                await asyncio.gather(*(asyncio.to_thread(process.join) for process in self.processes))
+        finally:
+            for process in self.processes:
+                if process.is_alive():
+                    process.terminate()
+            if self.ratelimit_coordinator:
+                await self.ratelimit_coordinator.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        hello = OverriddenJson.loads(await reader.readline())
+        if hello.get("op") != "hello" or not secrets.compare_digest(hello.get("secret", ""), self._secret):
+            writer.close()
+            return
+
+        cluster_id = hello["cluster_id"]
+        self._clusters[cluster_id] = writer
+        self.logger.debug(f"Cluster {cluster_id} has connected")
+
+        try:
+            while line := await reader.readline():
+                payload = OverriddenJson.loads(line)
+                match payload["op"]:
+                    case "reply":
+                        _, future = self._pending.pop(payload["id"], (None, None))
+                        if future is not None and not future.done():
+                            future.set_result(payload["result"])
+                    case "query":
+                        asyncio.create_task(self._relay_query(writer, payload))
+                    case "identify":
+                        asyncio.create_task(self._grant_identify(writer, cluster_id, payload))
+                    case "identified":
+                        await self.identify_scheduler.release(payload["shard_id"])
+        finally:
+            if self._clusters.get(cluster_id) is writer:
+                del self._clusters[cluster_id]
+            # a disconnected cluster will never report the identifies it was allowed to send
+            for shard_id in self.cluster_shards[cluster_id] if cluster_id < len(self.cluster_shards) else ():
+                await self.identify_scheduler.release(shard_id)
+            # a disconnected cluster will never answer its calls
+            for call_id, (owner, future) in list(self._pending.items()):
+                if owner == cluster_id:
+                    del self._pending[call_id]
+                    if not future.done():
+                        future.set_result(None)
+            self.logger.debug(f"Cluster {cluster_id} has disconnected")
+
+    async def _call(self, cluster_id: int, method: str, kwargs: dict, timeout: float | None) -> Any:
+        writer = self._clusters.get(cluster_id)
+        if writer is None:
+            return None
+
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = (cluster_id, future)
+        try:
+            await _send(writer, {"op": "call", "id": call_id, "method": method, "kwargs": kwargs})
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.logger.warning(f"Cluster {cluster_id} did not answer the query {method}")
+            return None
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def _relay_query(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        if payload["cluster_id"] is None:
+            cluster_ids = list(self._clusters)
+        else:
+            cluster_ids = [payload["cluster_id"]]
+
+        timeout = payload.get("query_timeout")
+        results = await asyncio.gather(
+            *(self._call(c_id, payload["method"], payload["kwargs"], timeout) for c_id in cluster_ids)
+        )
+        await _send(writer, {"op": "reply", "id": payload["id"], "result": dict(zip(map(str, cluster_ids), results))})
+
+    async def _grant_identify(self, writer: asyncio.StreamWriter, cluster_id: int, payload: dict) -> None:
+        await self.identify_scheduler.acquire(payload["shard_id"])
+        try:
+            if self._clusters.get(cluster_id) is not writer:
+                raise ConnectionError(f"Cluster {cluster_id} disconnected while waiting to identify")
+            await _send(writer, {"op": "reply", "id": payload["id"], "result": None})
+        except OSError:
+            # the cluster is gone, and will never report this identify
+            await self.identify_scheduler.release(payload["shard_id"])
@@ -1,6 +1,7 @@
+import asyncio
 from contextlib import suppress
 from logging import Logger
-from typing import TYPE_CHECKING, List, Dict, Any, Optional, Union
+from typing import TYPE_CHECKING, List, Dict, Any, Awaitable, Callable, Optional, Union
 
 import attrs
 import discord_typings
@@ -8,6 +9,7 @@ import discord_typings
 from naff.client.const import Absent, MISSING, get_logger
 from naff.client.errors import NotFound, Forbidden
 from naff.client.utils.cache import TTLCache, NullCache
+from naff.client.utils.misc_utils import _copy_exception
 from naff.models import VoiceState
 from naff.models.discord.channel import BaseChannel, GuildChannel, ThreadChannel
 from naff.models.discord.emoji import CustomEmoji
@@ -82,6 +84,8 @@ class GlobalCache:
 
     logger: Logger = attrs.field(repr=False, init=False, factory=get_logger)
 
+    _fetches: dict = attrs.field(repr=False, init=False, factory=dict)  # key: (kind, *ids); value: the fetch's task
+
     def __attrs_post_init__(self) -> None:
         if not isinstance(self.message_cache, TTLCache):
             self.logger.warning(
@@ -92,6 +96,30 @@ class GlobalCache:
         if self.enable_emoji_cache:
             self.emoji_cache = {}
 
+    async def _fetch_once(self, key: tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a fetch, unless the same fetch is already running, in which case its result is shared.
+
+        Args:
+            key: Identifies the fetch
+            fetch: Starts the fetch
+
+        Returns:
+            The result of the fetch
+
+        """
+        task = self._fetches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._fetches[key] = task
+            task.add_done_callback(lambda _: self._fetches.pop(key, None))
+        # waited on rather than awaited, so a cancelled caller does not cancel the fetch for everyone else
+        await asyncio.wait((task,))
+        if (e := task.exception()) is not None:
+            # raising one exception from several callers would mix their tracebacks into it
+            raise _copy_exception(e)
+        return task.result()
+
     # region User cache
 
     async def fetch_user(self, user_id: "Snowflake_Type") -> User:
@@ -109,10 +137,13 @@ class GlobalCache:
 
         user = self.user_cache.get(user_id)
         if user is None:
-            data = await self._client.http.get_user(user_id)
-            user = self.place_user_data(data)
+            user = await self._fetch_once(("user", user_id), lambda: self._fetch_user(user_id))
         return user
 
+    async def _fetch_user(self, user_id: "Snowflake_Type") -> User:
+        data = await self._client.http.get_user(user_id)
+        return self.place_user_data(data)
+
     def get_user(self, user_id: Optional["Snowflake_Type"]) -> Optional[User]:
         """
         Get a user by their ID.
@@ -175,10 +206,15 @@ class GlobalCache:
         user_id = to_snowflake(user_id)
         member = self.member_cache.get((guild_id, user_id))
         if member is None:
-            data = await self._client.http.get_member(guild_id, user_id)
-            member = self.place_member_data(guild_id, data)
+            member = await self._fetch_once(
+                ("member", guild_id, user_id), lambda: self._fetch_member(guild_id, user_id)
+            )
         return member
 
+    async def _fetch_member(self, guild_id: "Snowflake_Type", user_id: "Snowflake_Type") -> Member:
+        data = await self._client.http.get_member(guild_id, user_id)
+        return self.place_member_data(guild_id, data)
+
     def get_member(self, guild_id: Optional["Snowflake_Type"], user_id: Optional["Snowflake_Type"]) -> Optional[Member]:
         """
         Get a member by their guild and user IDs.
@@ -449,14 +485,17 @@ class GlobalCache:
         channel_id = to_snowflake(channel_id)
         channel = self.channel_cache.get(channel_id)
         if channel is None:
-            try:
-                data = await self._client.http.get_channel(channel_id)
-                channel = self.place_channel_data(data)
-            except Forbidden:
-                self.logger.warning(f"Forbidden access to channel {channel_id}. Generating fallback channel object")
-                channel = BaseChannel.from_dict({"id": channel_id, "type": MISSING}, self._client)
+            channel = await self._fetch_once(("channel", channel_id), lambda: self._fetch_channel(channel_id))
         return channel
 
+    async def _fetch_channel(self, channel_id: "Snowflake_Type") -> "TYPE_ALL_CHANNEL":
+        try:
+            data = await self._client.http.get_channel(channel_id)
+            return self.place_channel_data(data)
+        except Forbidden:
+            self.logger.warning(f"Forbidden access to channel {channel_id}. Generating fallback channel object")
+            return BaseChannel.from_dict({"id": channel_id, "type": MISSING}, self._client)
+
     def get_channel(self, channel_id: Optional["Snowflake_Type"]) -> Optional["TYPE_ALL_CHANNEL"]:
         """
         Get a channel based on its ID.
@@ -588,10 +627,13 @@ class GlobalCache:
         guild_id = to_snowflake(guild_id)
         guild = self.guild_cache.get(guild_id)
         if guild is None:
-            data = await self._client.http.get_guild(guild_id)
-            guild = self.place_guild_data(data)
+            guild = await self._fetch_once(("guild", guild_id), lambda: self._fetch_guild(guild_id))
         return guild
 
+    async def _fetch_guild(self, guild_id: "Snowflake_Type") -> Guild:
+        data = await self._client.http.get_guild(guild_id)
+        return self.place_guild_data(data)
+
     def get_guild(self, guild_id: Optional["Snowflake_Type"]) -> Optional[Guild]:
         """
         Get a guild based on its ID.
@@ -623,6 +665,79 @@ class GlobalCache:
             guild.update_from_dict(data)
         return guild
 
+    async def place_guild_data_incremental(
+        self, data: discord_typings.GuildData, slice_size: int = 1000, *, defer_members: bool = False
+    ) -> Guild:
+        """
+        Take json data representing a guild, process it, and cache it without blocking the event loop for long.
+
+        The guild is cached before its channels, threads, members and voice states, which are then placed in slices
+        of `slice_size`, yielding to the event loop between each slice. `Guild.members_loaded` is set once its
+        members have been placed.
+
+        Args:
+            data: json representation of the guild
+            slice_size: How many objects to place before yielding to the event loop
+            defer_members: Place the members and voice states once the client is ready, rather than before returning
+
+        Returns:
+            The processed guild, which may still be loading its members
+        """
+        guild_id = to_snowflake(data["id"])
+        channels_data = data.pop("channels", [])
+        threads_data = data.pop("threads", [])
+        members_data = data.pop("members", [])
+        voice_states = data.pop("voice_states", [])
+
+        guild = self.place_guild_data(data)
+        guild.members_loaded.clear()
+
+        for i in range(0, len(channels_data), slice_size):
+            for channel_data in channels_data[i : i + slice_size]:
+                channel_data["guild_id"] = guild_id
+                guild._channel_ids.add(self.place_channel_data(channel_data).id)
+            await asyncio.sleep(0)
+
+        for i in range(0, len(threads_data), slice_size):
+            for thread_data in threads_data[i : i + slice_size]:
+                guild._thread_ids.add(self.place_channel_data(thread_data).id)
+            await asyncio.sleep(0)
+
+        if defer_members:
+            guild._member_task = asyncio.create_task(
+                self._place_guild_members(guild, members_data, voice_states, slice_size, wait_until_ready=True)
+            )
+        else:
+            await self._place_guild_members(guild, members_data, voice_states, slice_size)
+        return guild
+
+    async def _place_guild_members(
+        self,
+        guild: Guild,
+        members_data: list[dict],
+        voice_states: list[dict],
+        slice_size: int,
+        wait_until_ready: bool = False,
+    ) -> None:
+        try:
+            if wait_until_ready:
+                await self._client.wait_until_ready()
+
+            for i in range(0, len(members_data), slice_size):
+                for member_data in members_data[i : i + slice_size]:
+                    # any member already placed was received after this GUILD_CREATE, so is more up to date
+                    if to_snowflake(member_data["user"]["id"]) not in guild._member_ids:
+                        self.place_member_data(guild.id, member_data)
+                await asyncio.sleep(0)
+
+            for i in range(0, len(voice_states), slice_size):
+                for state in voice_states[i : i + slice_size]:
+                    await self.place_voice_state_data(state | {"guild_id": guild.id})
+                await asyncio.sleep(0)
+        finally:
+            guild._member_task = None
+            guild.members_loaded.set()
+
     def delete_guild(self, guild_id: "Snowflake_Type") -> None:
         """
         Delete a guild from the cache.
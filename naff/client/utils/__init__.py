@@ -6,3 +6,4 @@ from .misc_utils import *
 from .serializer import *
 from .formatting import *
 from .text_utils import *
+from .metrics import *
@@ -58,19 +58,27 @@ class OverriddenJson:
 
 async def response_decode(response: aiohttp.ClientResponse) -> Union[Dict[str, Any], str]:
     """
-    Return the response text in its correct format, be it dict, or string.
+    Return the response body in its correct format, be it dict, or string.
+
+    JSON is decoded straight from the body's bytes, without decoding it to a string first.
 
     Args:
         response: the aiohttp response
     Returns:
-        the response text field in its correct type
+        the response body in its correct type
 
     """
-    text = await response.text(encoding="utf-8")
-
-    if response.headers.get("content-type") == "application/json":
-        return OverriddenJson.loads(text)
-    return text
+    body = await response.read()
+
+    # content_type is the parsed mime type, without parameters such as charset
+    content_type = response.content_type
+    if content_type == "application/json" or content_type.endswith("+json"):
+        return OverriddenJson.loads(body)
+    try:
+        return body.decode(response.charset or "utf-8", errors="replace")
+    except LookupError:
+        # an unknown charset
+        return body.decode("utf-8", errors="replace")
 
 
 def get_args(text: str) -> list:
@@ -0,0 +1,356 @@
+import asyncio
+import bisect
+import collections
+import sys
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from logging import Logger
+from typing import Awaitable, Coroutine
+
+from naff.client.const import get_logger
+
+__all__ = ("Histogram", "LoopStall", "LoopMonitor", "EventMetrics", "current_shard")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+"""The default upper bounds of histogram buckets, in seconds"""
+
+current_shard: ContextVar[int | None] = ContextVar("naff_current_shard", default=None)
+"""The shard whose gateway connection the current task descends from, if any"""
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram of observed values.
+
+    Args:
+        buckets: The upper bounds of the buckets, in ascending order
+
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        """The number of observations in each bucket, the last bucket holds everything above the largest bound"""
+        self.count = 0
+        """The number of observations"""
+        self.sum = 0.0
+        """The sum of all observations"""
+        self.max = 0.0
+        """The largest observation"""
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value: The value to record
+
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def average(self) -> float:
+        """The average of all observations."""
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        """
+        Export this histogram as a dict.
+
+        Returns:
+            The count, sum, average and max of all observations, and the cumulative count of each bucket by its bound
+
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "average": self.average, "max": self.max, "buckets": buckets}
+
+
+class LoopStall:
+    """A period during which the event loop was blocked."""
+
+    __slots__ = ("started_at", "duration", "task", "stack")
+
+    def __init__(self, started_at: float, task: str | None, stack: list[str]) -> None:
+        self.started_at = started_at
+        """When the loop last ran before the stall, as a unix timestamp"""
+        self.duration: float = 0.0
+        """How long the loop was blocked for, in seconds. This is updated once the loop runs again"""
+        self.task = task
+        """The task that was running when the stall was detected"""
+        self.stack = stack
+        """The formatted stack of the loop's thread when the stall was detected"""
+
+    def to_dict(self) -> dict:
+        return {"started_at": self.started_at, "duration": self.duration, "task": self.task, "stack": self.stack}
+
+
+class LoopMonitor:
+    """
+    Measures how late the event loop runs its callbacks, and records what was running when it stalls.
+
+    A task on the loop wakes every `interval` seconds, and records how late it woke up as the loop lag. A watchdog
+    thread checks that this task keeps running. If it has not run for `stall_threshold` seconds, the loop is blocked,
+    so the watchdog records the task and stack that are running on the loop.
+
+    Args:
+        interval: How often to measure the loop lag, in seconds
+        stall_threshold: How long the loop has to be blocked to be considered stalled, in seconds
+        logger: The logger to report stalls to
+
+    """
+
+    def __init__(self, interval: float = 0.25, stall_threshold: float = 1.0, logger: Logger | None = None) -> None:
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.logger = logger or get_logger()
+
+        self.lag = Histogram()
+        """The loop lag measured at each interval"""
+        self.stalls: collections.deque[LoopStall] = collections.deque(maxlen=20)
+        """The most recent stalls"""
+        self.stall_count = 0
+        """The number of stalls detected"""
+
+        self._last_tick = 0.0
+        self._current_stall: LoopStall | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        """Whether the monitor is running."""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def stats(self) -> dict:
+        """A snapshot of the loop lag and recent stalls."""
+        return {
+            "lag": self.lag.to_dict(),
+            "stall_count": self.stall_count,
+            "stalls": [stall.to_dict() for stall in self.stalls],
+        }
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="naff-loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stop monitoring the event loop."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag.observe(max(0.0, now - expected))
+            self._last_tick = now
+
+            if stall := self._current_stall:
+                self._current_stall = None
+                stall.duration = time.time() - stall.started_at
+                self.logger.warning(f"Event loop was blocked for {stall.duration:.2f}s while running {stall.task}")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._current_stall is not None:
+                continue
+            blocked = time.monotonic() - self._last_tick - self.interval
+            if blocked < self.stall_threshold:
+                continue
+
+            task = asyncio.current_task(self._loop)
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = traceback.format_stack(frame) if frame is not None else []
+
+            stall = LoopStall(time.time() - blocked, repr(task) if task else None, stack)
+            self._current_stall = stall
+            self.stalls.append(stall)
+            self.stall_count += 1
+            self.logger.warning(
+                f"Event loop has been blocked for {blocked:.2f}s by {stall.task}, stack:\n{''.join(stack)}"
+            )
+
+
+class _Timing:
+    __slots__ = ("count", "seconds", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "seconds": self.seconds, "max": self.max}
+
+
+class EventMetrics:
+    """
+    Records how many of each event is received, and how long they take to decode, process and listen to.
+
+    Gateway events are recorded by their dispatch name (i.e. `MESSAGE_CREATE`), and listeners by the name of the
+    event they listen to (i.e. `message_create`). Both are recorded per shard, listeners that do not descend from a
+    gateway connection are recorded with a shard of None. Listener and processor times are wall times, so they include
+    any time spent waiting.
+    """
+
+    def __init__(self) -> None:
+        self.dispatches: collections.Counter[tuple[str, int | None]] = collections.Counter()
+        """The number of dispatches received, by event and shard"""
+        self.decode: collections.defaultdict[tuple[str, int | None], _Timing] = collections.defaultdict(_Timing)
+        """The time spent decoding dispatches, by event and shard"""
+        self.processors: collections.defaultdict[tuple[str, int | None], _Timing] = collections.defaultdict(_Timing)
+        """The time spent in processors, by event and shard"""
+        self.listeners: collections.defaultdict[tuple[str, int | None], _Timing] = collections.defaultdict(_Timing)
+        """The time spent in listeners, by event and shard"""
+
+    def record_dispatch(self, event: str, shard_id: int | None, decode_time: float | None = None) -> None:
+        """
+        Record a dispatch received from the gateway.
+
+        Args:
+            event: The name of the dispatch
+            shard_id: The shard that received it
+            decode_time: How long the payload took to decode, in seconds
+
+        """
+        key = (event, shard_id)
+        self.dispatches[key] += 1
+        if decode_time is not None:
+            self.decode[key].add(decode_time)
+
+    async def time_processor(self, coro: Coroutine, event: str, shard_id: int | None) -> None:
+        """
+        Run a processor, and record how long it took.
+
+        Args:
+            coro: The processor's coroutine
+            event: The name of the dispatch being processed
+            shard_id: The shard that received it
+
+        """
+        start = time.perf_counter()
+        try:
+            await coro
+        finally:
+            self.processors[(event, shard_id)].add(time.perf_counter() - start)
+
+    async def time_listener(self, coro: Awaitable, event: str) -> None:
+        """
+        Run a listener, and record how long it took against the current shard.
+
+        Args:
+            coro: The listener's coroutine
+            event: The name of the event being listened to
+
+        """
+        start = time.perf_counter()
+        try:
+            await coro
+        finally:
+            self.listeners[(event, current_shard.get())].add(time.perf_counter() - start)
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        self.dispatches.clear()
+        self.decode.clear()
+        self.processors.clear()
+        self.listeners.clear()
+
+    def to_dict(self) -> dict:
+        """
+        Export the recorded metrics as a dict.
+
+        Returns:
+            The metrics of each gateway event as `events`, and of each listened to event as `listeners`, both by name and then by shard
+        """
+        gateway_events: dict[str, dict] = {}
+        for (event, shard_id), count in self.dispatches.items():
+            key = (event, shard_id)
+            gateway_events.setdefault(event, {})[shard_id] = {
+                "count": count,
+                "decode": self.decode[key].to_dict() if key in self.decode else None,
+                "processor": self.processors[key].to_dict() if key in self.processors else None,
+            }
+
+        listeners: dict[str, dict] = {}
+        for (event, shard_id), timing in self.listeners.items():
+            listeners.setdefault(event, {})[shard_id] = timing.to_dict()
+
+        return {"events": gateway_events, "listeners": listeners}
+
+    def to_prometheus(self, prefix: str = "naff") -> str:
+        """
+        Export the recorded metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix: The prefix of every metric name
+
+        Returns:
+            The metrics, ready to be served to a Prometheus scraper
+        """
+
+        def labels(event: str, shard_id: int | None) -> str:
+            shard = "" if shard_id is None else shard_id
+            return f'{{event="{event}",shard="{shard}"}}'
+
+        lines = []
+
+        def counter(name: str, description: str, values: dict[tuple[str, int | None], float]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.extend(f"{prefix}_{name}{labels(*key)} {value}" for key, value in values.items())
+
+        counter("gateway_events_total", "Dispatches received from the gateway", dict(self.dispatches))
+        counter(
+            "gateway_event_decode_seconds_total",
+            "Time spent decoding dispatches",
+            {key: timing.seconds for key, timing in self.decode.items()},
+        )
+        counter(
+            "event_processor_seconds_total",
+            "Time spent in event processors",
+            {key: timing.seconds for key, timing in self.processors.items()},
+        )
+        counter(
+            "event_listener_calls_total",
+            "Listener calls",
+            {key: timing.count for key, timing in self.listeners.items()},
+        )
+        counter(
+            "event_listener_seconds_total",
+            "Time spent in listeners",
+            {key: timing.seconds for key, timing in self.listeners.items()},
+        )
+        return "\n".join(lines) + "\n"
@@ -233,3 +233,11 @@ async def maybe_coroutine(func: Callable, *args, **kwargs) -> Any:
         return await func(*args, **kwargs)
     else:
         return func(*args, **kwargs)
+
+
+def _copy_exception(exception: Exception) -> Exception:
+    """Copy an exception without calling its constructor, the copy is caused by the original."""
+    clone = type(exception).__new__(type(exception), *exception.args)
+    clone.__dict__.update(exception.__dict__)
+    clone.__cause__ = exception
+    return clone
@@ -59,7 +59,12 @@ def get_cache_state(bot: "Client") -> str:
     adjust_subcolumn(table, 1, aligns=[">", "<"])
 
     labels = ["Cache", "Amount", "Expire"]
-    return make_table(table, labels)
+    endpoints = bot.http._endpoints
+    return (
+        f"{make_table(table, labels)}\n"
+        f"Endpoints: {endpoints.hit_rate:.1%} hit rate, {endpoints.evictions} evicted, "
+        f"{bot.http.coalesced_requests} GETs coalesced"
+    )
 
 
 def strf_delta(time_delta: datetime.timedelta, show_seconds: bool = True) -> str:
@@ -9,7 +9,8 @@ from warnings import warn
 import attrs
 
 import naff.models as models
-from naff.client.const import Absent, MISSING, PREMIUM_GUILD_LIMITS
+from naff.api import events
+from naff.client.const import Absent, DISCORD_EPOCH, MISSING, PREMIUM_GUILD_LIMITS
 from naff.client.errors import EventLocationNotProvided, NotFound
 from naff.client.mixins.serialization import DictSerializationMixin
 from naff.client.utils.attr_converters import optional
@@ -125,6 +126,18 @@ class GuildPreview(BaseGuild):
         return super()._process_dict(data, client)
 
 
+_MIN_MEMBER_RANGE = 86_400_000 << 22
+"""The smallest range of member IDs that is split between workers, a day's worth of snowflakes"""
+_MEMBER_PAGE_SIZE = 1000
+"""The most members that can be listed in one request"""
+
+
+def _set_event() -> asyncio.Event:
+    event = asyncio.Event()
+    event.set()
+    return event
+
+
 class MemberIterator(AsyncIterator):
     def __init__(self, guild: "Guild", limit: int = 0) -> None:
         super().__init__(limit)
@@ -216,6 +229,8 @@ class Guild(BaseGuild):
     """Stage instances in the guild."""
     chunked = attrs.field(repr=False, factory=asyncio.Event, metadata=no_export_meta)
     """An event that is fired when this guild has been chunked"""
+    members_loaded = attrs.field(repr=False, factory=_set_event, metadata=no_export_meta)
+    """An event that is set once the members included in GUILD_CREATE have been cached, see `Client.guild_create_slice_size`"""
     command_permissions: dict[Snowflake_Type, CommandPermissions] = attrs.field(
         repr=False, factory=dict, metadata=no_export_meta
     )
@@ -226,7 +241,8 @@ class Guild(BaseGuild):
     _thread_ids: Set[Snowflake_Type] = attrs.field(repr=False, factory=set)
     _member_ids: Set[Snowflake_Type] = attrs.field(repr=False, factory=set)
     _role_ids: Set[Snowflake_Type] = attrs.field(repr=False, factory=set)
-    _chunk_cache: list = attrs.field(repr=False, factory=list)
+    _chunk_progress: dict[Optional[str], tuple[int, float]] = attrs.field(repr=False, factory=dict)
+    _member_task: Optional[asyncio.Task] = attrs.field(repr=False, default=None, metadata=no_export_meta)
     _channel_gui_positions: Dict[Snowflake_Type, int] = attrs.field(repr=False, factory=dict)
 
     @classmethod
@@ -552,19 +568,77 @@ class Guild(BaseGuild):
         """
         await self.me.edit_nickname(new_nickname, reason=reason)
 
-    async def http_chunk(self) -> None:
-        """Populates all members of this guild using the REST API."""
+    async def http_chunk(self, concurrency: int = 1) -> None:
+        """
+        Populates all members of this guild using the REST API.
+
+        Args:
+            concurrency: How many ranges of member IDs to fetch at once. Requests are still subject to the rate limit of the route. Guilds whose members fit in one page are fetched in one request regardless
+
+        """
         start_time = time.perf_counter()
 
-        iterator = MemberIterator(self)
-        async for member in iterator:
-            self._client.cache.place_member_data(self.id, member)
+        # every range costs at least one request, so there is no point in more ranges than pages of members
+        concurrency = min(concurrency, -(-self.member_count // _MEMBER_PAGE_SIZE))
+        if concurrency > 1:
+            total_retrieved = await self._fetch_member_ranges(concurrency)
+        else:
+            iterator = MemberIterator(self)
+            async for member in iterator:
+                self._client.cache.place_member_data(self.id, member)
+            total_retrieved = iterator.total_retrieved
 
         self.chunked.set()
         self.logger.info(
-            f"Cached {iterator.total_retrieved} members for {self.id} in {time.perf_counter() - start_time:.2f} seconds"
+            f"Cached {total_retrieved} members for {self.id} in {time.perf_counter() - start_time:.2f} seconds"
         )
 
+    async def _fetch_member_ranges(self, concurrency: int) -> int:
+        """Fetch every member by splitting the ID space into ranges, and paging through them concurrently."""
+        # member IDs are user IDs, which can predate the guild, so the ranges cover every snowflake up to now
+        upper = (int(time.time() * 1000 - DISCORD_EPOCH) + 1) << 22
+        step = upper // concurrency
+        # each range is the IDs after its cursor, up to and including its end, and whether its last page was full
+        ranges = [[i * step, upper if i == concurrency - 1 else (i + 1) * step, False] for i in range(concurrency)]
+        retrieved = 0
+
+        async def fetch(member_range: list) -> None:
+            nonlocal retrieved
+            while member_range[0] < member_range[1]:
+                page = await self._client.http.list_members(self.id, limit=_MEMBER_PAGE_SIZE, after=member_range[0])
+                member_range[2] = len(page) == _MEMBER_PAGE_SIZE
+                for member in page:
+                    user_id = int(member["user"]["id"])
+                    # the end of a range moves down when it is split, the rest of the page belongs to the new range
+                    if user_id > member_range[1]:
+                        member_range[0] = member_range[1]
+                        break
+                    self._client.cache.place_member_data(self.id, member)
+                    retrieved += 1
+                    member_range[0] = user_id
+                else:
+                    if not member_range[2]:
+                        member_range[0] = member_range[1]
+
+        async def worker(member_range: list) -> None:
+            while True:
+                await fetch(member_range)
+                # ranges are lists, and two of them can be equal, so remove this one by identity
+                del ranges[next(i for i, r in enumerate(ranges) if r is member_range)]
+
+                # members are not spread evenly over the ID space, so a finished worker takes half of the largest
+                # range that is known to have more members, empty ranges would only cost requests
+                dense = [r for r in ranges if r[2] and r[1] - r[0] >= _MIN_MEMBER_RANGE]
+                if not dense:
+                    return
+                largest = max(dense, key=lambda r: r[1] - r[0])
+                member_range = [(largest[0] + largest[1]) // 2, largest[1], False]
+                largest[1] = member_range[0]
+                ranges.append(member_range)
+
+        await asyncio.gather(*(worker(member_range) for member_range in list(ranges)))
+        return retrieved
+
     async def gateway_chunk(self, wait=True, presences=True) -> None:
         """
         Trigger a gateway `get_members` event, populating this object with members.
@@ -578,9 +652,15 @@ class Guild(BaseGuild):
         if wait:
             await self.chunked.wait()
 
-    async def chunk(self) -> None:
-        """Populates all members of this guild using the REST API."""
-        await self.http_chunk()
+    async def chunk(self, concurrency: int = 1) -> None:
+        """
+        Populates all members of this guild using the REST API.
+
+        Args:
+            concurrency: How many ranges of member IDs to fetch at once, see `http_chunk`
+
+        """
+        await self.http_chunk(concurrency)
 
     async def chunk_guild(self, wait=True, presences=True) -> None:
         """
@@ -603,7 +683,10 @@ class Guild(BaseGuild):
 
     async def process_member_chunk(self, chunk: dict) -> None:
         """
-        Receive and either cache or process the chunks of members from gateway.
+        Receive and cache a chunk of members from gateway.
+
+        Members are cached as each chunk arrives, and a `GuildMembersChunk` event is dispatched once they have been.
+        `chunked` is set once every chunk of the response has been cached.
 
         Args:
             chunk: A member chunk from discord
@@ -612,42 +695,49 @@ class Guild(BaseGuild):
         if self.chunked.is_set():
             self.chunked.clear()
 
+        members_data = chunk.get("members", [])
         if presences := chunk.get("presences"):
             # combine the presence dict into the members dict
+            members_by_id = {member_data["user"]["id"]: member_data for member_data in members_data}
             for presence in presences:
-                u_id = presence["user"]["id"]
-                # find the user this presence is for
-                member_index = next(
-                    (index for (index, d) in enumerate(chunk.get("members")) if d["user"]["id"] == u_id), None
-                )
-                del presence["user"]
-                chunk["members"][member_index]["user"] = chunk["members"][member_index]["user"] | presence
-
-        if not self._chunk_cache:
-            self._chunk_cache: List = chunk.get("members")
-        else:
-            self._chunk_cache = self._chunk_cache + chunk.get("members")
-
-        if chunk.get("chunk_index") != chunk.get("chunk_count") - 1:
-            return self.logger.debug(f"Cached chunk of {len(chunk.get('members'))} members for {self.id}")
-        else:
-            members = self._chunk_cache
-            self.logger.info(f"Processing {len(members)} members for {self.id}")
-
-            s = time.monotonic()
-            start_time = time.perf_counter()
-
-            for member in members:
-                self._client.cache.place_member_data(self.id, member)
-                if (time.monotonic() - s) > 0.05:
-                    # look, i get this *could* be a thread, but because it needs to modify data in the main thread,
-                    # it is still blocking. So by periodically yielding to the event loop, we can avoid blocking, and still
-                    # process this data properly
-                    await asyncio.sleep(0)
-                    s = time.monotonic()
+                member_data = members_by_id.get(presence.pop("user")["id"])
+                if member_data is not None:
+                    member_data["user"] = member_data["user"] | presence
+
+        nonce = chunk.get("nonce")
+        chunk_count = chunk.get("chunk_count", 1)
+        received, start_time = self._chunk_progress.get(nonce, (0, time.perf_counter()))
+        self._chunk_progress[nonce] = (received, start_time)
+
+        members = []
+        s = time.monotonic()
+        for member_data in members_data:
+            members.append(self._client.cache.place_member_data(self.id, member_data))
+            if (time.monotonic() - s) > 0.05:
+                # look, i get this *could* be a thread, but because it needs to modify data in the main thread,
+                # it is still blocking. So by periodically yielding to the event loop, we can avoid blocking, and still
+                # process this data properly
+                await asyncio.sleep(0)
+                s = time.monotonic()
+
+        # chunks are processed concurrently, so the number placed is counted, rather than trusting the chunk index
+        received = self._chunk_progress[nonce][0] + 1
+        self._chunk_progress[nonce] = (received, start_time)
+        self.logger.debug(f"Cached chunk {received}/{chunk_count} of {len(members)} members for {self.id}")
+        self._client.dispatch(
+            events.GuildMembersChunk(
+                self.id,
+                chunk_index=chunk.get("chunk_index", 0),
+                chunk_count=chunk_count,
+                presences=presences or [],
+                nonce=nonce,
+                members=members,
+            )
+        )
 
+        if received >= chunk_count:
+            del self._chunk_progress[nonce]
             total_time = time.perf_counter() - start_time
-            self.chunk_cache = []
             self.logger.info(f"Cached members for {self.id} in {total_time:.2f} seconds")
             self.chunked.set()
 
@@ -12,8 +12,10 @@ extras_require = {
     "speedup": ["aiodns", "orjson", "Brotli"],
     "sentry": ["sentry-sdk"],
     "jurigged": ["jurigged"],
+    "zstd": ["zstandard"],
 }
 extras_require["all"] = list(itertools.chain.from_iterable(extras_require.values()))
+extras_require["etf"] = ["erlpack"]
 extras_require["docs"] = extras_require["all"] + [
     "mkdocs-autorefs",
     "mkdocs-awesome-pages-plugin",
@@ -0,0 +1,443 @@
+"""
+A local stand-in for the Discord gateway, for load and reconnect testing.
+
+`FakeGateway` is an aiohttp websocket server that speaks enough of the gateway protocol to drive a real client:
+HELLO, heartbeats, IDENTIFY and RESUME, READY followed by a burst of GUILD_CREATEs, member requests, and a
+configurable rate of dispatches. Its control methods send RECONNECT or INVALIDATE_SESSION to any shard, to exercise
+reconnect storms. Connections are compressed with zlib-stream when the client asks for it.
+
+`connect_client` starts a client's shards against the server, without logging in over HTTP. `run_client` does the
+same for the duration of an `async with` block, and stops the client when leaving it.
+
+??? Hint "Example Usage:"
+    ```python
+    async with FakeGateway(guilds_per_shard=100, event_rate=500) as gateway:
+        bot = AutoShardedClient(total_shards=256)
+        async with run_client(bot, gateway, wait_until_ready=False):
+            await gateway.wait_for_identifies(256)
+            await gateway.invalidate_session()
+    ```
+"""
+import asyncio
+import itertools
+import secrets
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+import aiohttp
+from aiohttp import WSMsgType, web
+
+from naff.api.gateway import etf, identify
+from naff.api.gateway.state import ConnectionState
+from naff.client.auto_shard_client import AutoShardedClient
+from naff.client.client import Client
+from naff.client.const import __api_version__
+from naff.client.utils.input_utils import OverriddenJson
+from naff.models.discord.enums import WebSocketOPCodes as OPCODE
+from naff.models.discord.user import NaffUser
+from tests.consts import SAMPLE_GUILD_DATA, SAMPLE_USER_DATA
+
+__all__ = ("FakeGateway", "connect_client", "run_client", "fake_guild", "fake_presence")
+
+
+def _bot_user() -> dict:
+    return SAMPLE_USER_DATA() | {"bot": True, "verified": True, "mfa_enabled": False, "flags": 0}
+
+
+def fake_guild(guild_id: int) -> dict:
+    """Create the GUILD_CREATE payload of an empty guild."""
+    return SAMPLE_GUILD_DATA() | {
+        "id": str(guild_id),
+        "name": f"guild {guild_id}",
+        "unavailable": False,
+        "large": False,
+        "member_count": 1,
+        "joined_at": "2022-07-16T20:56:55.999419+00:00",
+        "channels": [],
+        "threads": [],
+        "members": [],
+        "presences": [],
+        "voice_states": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+    }
+
+
+def fake_presence(shard_id: int, total_shards: int, sequence: int, guild_ids: list[int]) -> tuple[str, dict]:
+    """Create a presence update of an uncached user, which is processed without any HTTP requests."""
+    return "PRESENCE_UPDATE", {
+        "guild_id": str(guild_ids[sequence % len(guild_ids)]) if guild_ids else "0",
+        "user": {"id": str(sequence + 1)},
+        "status": "online",
+        "activities": [],
+        "client_status": {"desktop": "online"},
+    }
+
+
+class _Session:
+    def __init__(self, shard_id: int, total_shards: int) -> None:
+        self.session_id = secrets.token_hex(16)
+        self.shard_id = shard_id
+        self.total_shards = total_shards
+        self.sequence = 0
+
+
+class _Connection:
+    def __init__(self, ws: web.WebSocketResponse, encoding: str, compress: bool) -> None:
+        self.ws = ws
+        self.encoding = encoding
+        self.compressor = zlib.compressobj() if compress else None
+        self.compress_payloads = False
+        self.session: _Session | None = None
+        self.dispatcher: asyncio.Task | None = None
+
+    async def send(self, payload: dict) -> None:
+        data = etf.dumps(payload) if self.encoding == "etf" else OverriddenJson.dumps(payload).encode("utf-8")
+        if self.compressor is not None:
+            await self.ws.send_bytes(self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        elif self.compress_payloads:
+            await self.ws.send_bytes(zlib.compress(data))
+        elif self.encoding == "etf":
+            await self.ws.send_bytes(data)
+        else:
+            await self.ws.send_str(data.decode("utf-8"))
+
+    async def dispatch(self, event: str, data: dict) -> None:
+        self.session.sequence += 1
+        await self.send({"op": OPCODE.DISPATCH, "t": event, "s": self.session.sequence, "d": data})
+
+
+class FakeGateway:
+    """
+    A local websocket server that imitates the Discord gateway.
+
+    Args:
+        guilds_per_shard: The number of guilds sent to each shard after READY
+        guild_factory: Creates the GUILD_CREATE payload of a guild from its ID
+        event_rate: The number of dispatches per second sent to each shard once its guilds are sent
+        event_factory: Creates the event name and payload of each dispatch from the shard ID, total shards, sequence and guild IDs
+        heartbeat_interval: The heartbeat interval sent in HELLO, in milliseconds
+        host: The host to listen on
+
+    """
+
+    def __init__(
+        self,
+        *,
+        guilds_per_shard: int = 1,
+        guild_factory: Callable[[int], dict] = fake_guild,
+        event_rate: float = 0,
+        event_factory: Callable[[int, int, int, list[int]], tuple[str, dict]] = fake_presence,
+        heartbeat_interval: int = 41250,
+        host: str = "127.0.0.1",
+    ) -> None:
+        self.guilds_per_shard = guilds_per_shard
+        self.guild_factory = guild_factory
+        self.event_rate = event_rate
+        self.event_factory = event_factory
+        self.heartbeat_interval = heartbeat_interval
+        self.host = host
+        self.port: int | None = None
+
+        self.connections: set[_Connection] = set()
+        self.sessions: dict[str, _Session] = {}
+
+        self.identifies = 0
+        """The number of identifies received"""
+        self.resumes = 0
+        """The number of successful resumes"""
+        self.heartbeats = 0
+        """The number of heartbeats received"""
+        self.member_requests = 0
+        """The number of member requests received"""
+
+        self._runner: web.AppRunner | None = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        return f"ws://{self.host}:{self.port}/"
+
+    def gateway_url(self, encoding: str = "json", compression: str | None = "zlib-stream") -> str:
+        """
+        Get the URL a shard should connect to.
+
+        Args:
+            encoding: The payload encoding
+            compression: The transport compression, either `zlib-stream` or None
+
+        """
+        url = f"{self.url}?encoding={encoding}&v={__api_version__}"
+        if compression:
+            url += f"&compress={compression}"
+        return url
+
+    async def start(self) -> None:
+        """Start the server on a free port."""
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Close every connection and stop the server."""
+        for connection in list(self.connections):
+            await connection.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self) -> "FakeGateway":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.stop()
+
+    def guild_ids(self, shard_id: int, total_shards: int) -> list[int]:
+        """
+        Get the IDs of the guilds sent to a shard.
+
+        Args:
+            shard_id: The ID of the shard
+            total_shards: The total number of shards
+
+        """
+        # the timestamp bits of a snowflake decide its shard
+        return [((i * total_shards + shard_id) << 22) | 1 for i in range(1, self.guilds_per_shard + 1)]
+
+    async def wait_for(self, predicate: Callable[[], bool], timeout: float = 10) -> None:
+        """
+        Wait until a condition on the server's counters is met.
+
+        Args:
+            predicate: The condition to wait for
+            timeout: How long to wait, in seconds
+
+        """
+
+        async def _wait() -> None:
+            async with self._changed:
+                await self._changed.wait_for(predicate)
+
+        await asyncio.wait_for(_wait(), timeout)
+
+    async def wait_for_identifies(self, count: int, timeout: float = 10) -> None:
+        """Wait until a number of identifies have been received."""
+        await self.wait_for(lambda: self.identifies >= count, timeout)
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _targets(self, shard_id: int | None) -> list[_Connection]:
+        return [c for c in self.connections if c.session and (shard_id is None or c.session.shard_id == shard_id)]
+
+    async def dispatch(self, event: str, data: dict, shard_id: int | None = None) -> None:
+        """
+        Send a dispatch to connected shards.
+
+        Args:
+            event: The name of the event
+            data: The payload of the event
+            shard_id: The shard to send it to, or None for every shard
+
+        """
+        await asyncio.gather(*(c.dispatch(event, data) for c in self._targets(shard_id)))
+
+    async def send_reconnect(self, shard_id: int | None = None) -> None:
+        """
+        Ask shards to reconnect and resume.
+
+        Args:
+            shard_id: The shard to send it to, or None for every shard
+
+        """
+        await asyncio.gather(*(c.send({"op": OPCODE.RECONNECT, "d": None}) for c in self._targets(shard_id)))
+
+    async def invalidate_session(self, shard_id: int | None = None, resumable: bool = False) -> None:
+        """
+        Invalidate the sessions of shards.
+
+        Args:
+            shard_id: The shard to invalidate, or None for every shard
+            resumable: Whether the session may be resumed
+
+        """
+        for connection in self._targets(shard_id):
+            if not resumable:
+                self.sessions.pop(connection.session.session_id, None)
+            await connection.send({"op": OPCODE.INVALIDATE_SESSION, "d": resumable})
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+
+        connection = _Connection(
+            ws, request.query.get("encoding", "json"), request.query.get("compress") == "zlib-stream"
+        )
+        self.connections.add(connection)
+        try:
+            await connection.send({"op": OPCODE.HELLO, "d": {"heartbeat_interval": self.heartbeat_interval}})
+            async for msg in ws:
+                if msg.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    break
+                payload = etf.loads(msg.data) if connection.encoding == "etf" else OverriddenJson.loads(msg.data)
+                await self._handle_payload(connection, payload)
+        finally:
+            self.connections.discard(connection)
+            if connection.dispatcher is not None:
+                connection.dispatcher.cancel()
+        return ws
+
+    async def _handle_payload(self, connection: _Connection, payload: dict) -> None:
+        data = payload.get("d")
+        match payload["op"]:
+            case OPCODE.HEARTBEAT:
+                self.heartbeats += 1
+                await self._notify()
+                await connection.send({"op": OPCODE.HEARTBEAT_ACK, "d": None})
+
+            case OPCODE.IDENTIFY:
+                shard_id, total_shards = data.get("shard", (0, 1))
+                # like Discord, compress each payload on its own if asked to
+                compress = data.get("compress", False) or payload.get("compress", False)
+                connection.compress_payloads = connection.compressor is None and compress
+                connection.session = _Session(shard_id, total_shards)
+                self.sessions[connection.session.session_id] = connection.session
+                self.identifies += 1
+                await self._notify()
+                await self._send_ready(connection)
+
+            case OPCODE.RESUME:
+                session = self.sessions.get(data["session_id"])
+                if session is None:
+                    await connection.send({"op": OPCODE.INVALIDATE_SESSION, "d": False})
+                    return
+                connection.session = session
+                self.resumes += 1
+                await self._notify()
+                await connection.dispatch("RESUMED", {})
+                self._start_dispatcher(connection)
+
+            case OPCODE.REQUEST_MEMBERS:
+                self.member_requests += 1
+                await self._notify()
+                chunk = {"guild_id": data["guild_id"], "members": [], "chunk_index": 0, "chunk_count": 1}
+                if "nonce" in data:
+                    chunk["nonce"] = data["nonce"]
+                await connection.dispatch("GUILD_MEMBERS_CHUNK", chunk)
+
+    async def _send_ready(self, connection: _Connection) -> None:
+        session = connection.session
+        guild_ids = self.guild_ids(session.shard_id, session.total_shards)
+        await connection.dispatch(
+            "READY",
+            {
+                "v": __api_version__,
+                "user": _bot_user(),
+                "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in guild_ids],
+                "session_id": session.session_id,
+                "resume_gateway_url": self.url,
+                "shard": [session.shard_id, session.total_shards],
+                "application": {"id": SAMPLE_USER_DATA()["id"], "flags": 0},
+            },
+        )
+        for guild_id in guild_ids:
+            await connection.dispatch("GUILD_CREATE", self.guild_factory(guild_id))
+        self._start_dispatcher(connection)
+
+    def _start_dispatcher(self, connection: _Connection) -> None:
+        if self.event_rate and connection.dispatcher is None:
+            connection.dispatcher = asyncio.create_task(self._dispatch_events(connection))
+
+    async def _dispatch_events(self, connection: _Connection) -> None:
+        session = connection.session
+        guild_ids = self.guild_ids(session.shard_id, session.total_shards)
+        start = time.perf_counter()
+        for sent in itertools.count():
+            # send in batches when behind schedule, rather than sleeping between every event
+            delay = sent / self.event_rate - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            event, data = self.event_factory(session.shard_id, session.total_shards, session.sequence, guild_ids)
+            await connection.dispatch(event, data)
+
+
+async def connect_client(client: Client, gateway: FakeGateway, token: str = "fake-token") -> list[asyncio.Task]:
+    """
+    Start the shards of a client against a fake gateway, without logging in over HTTP.
+
+    Args:
+        client: A `Client` or `AutoShardedClient`, an `AutoShardedClient` must be created with `total_shards`
+        gateway: The fake gateway to connect to
+        token: The token to identify with
+
+    Returns:
+        The task of each shard
+
+    """
+    # what `Client.login` would set up, minus the requests
+    client._gather_commands()
+    client.http._HTTPClient__session = aiohttp.ClientSession()
+    client.http.token = token
+    client._user = NaffUser.from_dict(_bot_user(), client)
+
+    if isinstance(client, AutoShardedClient):
+        client._connection_states = [
+            ConnectionState(
+                client,
+                client.intents,
+                shard_id,
+                encoding=client.gateway_encoding,
+                compression=client.gateway_compression,
+            )
+            for shard_id in range(client.total_shards)
+        ]
+        client.identify_scheduler.expected = client.total_shards
+    states = client.shards
+
+    for state in states:
+        state.gateway_url = gateway.gateway_url(client.gateway_encoding, client.gateway_compression)
+    return [asyncio.create_task(state.start()) for state in states]
+
+
+@asynccontextmanager
+async def run_client(
+    client: Client,
+    gateway: FakeGateway,
+    *,
+    wait_until_ready: bool = True,
+    identify_interval: float = 0,
+    timeout: float = 10,
+) -> AsyncIterator[list[asyncio.Task]]:
+    """
+    Run a client against a fake gateway for the duration of an `async with` block, then stop it.
+
+    Args:
+        client: A `Client` or `AutoShardedClient`, an `AutoShardedClient` must be created with `total_shards`
+        gateway: The fake gateway to connect to
+        wait_until_ready: Wait for the client to be ready before entering the block
+        identify_interval: How long each rate limit key waits between identifies, Discord's interval is too slow for tests
+        timeout: How long to wait for the client to be ready, in seconds
+
+    Yields:
+        The task of each shard
+
+    """
+    interval = identify.IDENTIFY_INTERVAL
+    identify.IDENTIFY_INTERVAL = identify_interval
+    tasks = await connect_client(client, gateway)
+    try:
+        if wait_until_ready:
+            await asyncio.wait_for(client.wait_until_ready(), timeout)
+        yield tasks
+    finally:
+        await client.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        identify.IDENTIFY_INTERVAL = interval
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from naff.api.http.http_client import BucketLock, BucketRegistry
+
+__all__ = ()
+
+
+def _headers(remaining: int, reset_after: float, limit: int = 5) -> CIMultiDictProxy:
+    return CIMultiDictProxy(
+        CIMultiDict(
+            {
+                "x-ratelimit-bucket": "bucket",
+                "x-ratelimit-limit": str(limit),
+                "x-ratelimit-remaining": str(remaining),
+                "x-ratelimit-reset-after": str(reset_after),
+            }
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_bucket_lock_concurrency() -> None:
+    lock = BucketLock()
+
+    # until the limit is known, requests are sent one at a time
+    await lock.acquire()
+    assert lock.locked
+    lock.ingest_ratelimit_header(_headers(remaining=4, reset_after=0.2))
+    await lock.release()
+
+    # the remaining calls may all be in flight at once
+    await asyncio.wait_for(asyncio.gather(*(lock.acquire() for _ in range(4))), 1)
+    assert lock.in_flight == 4
+    assert lock.locked
+
+    # headers arriving out of order never raise the remaining count
+    lock.ingest_ratelimit_header(_headers(remaining=0, reset_after=0.2))
+    lock.ingest_ratelimit_header(_headers(remaining=2, reset_after=0.2))
+    assert lock.remaining == 0
+    for _ in range(4):
+        await lock.release()
+
+    # the next request waits for the bucket to reset
+    start = time.monotonic()
+    async with lock:
+        assert time.monotonic() - start >= 0.15
+    assert lock.remaining == 5
+
+
+@pytest.mark.asyncio
+async def test_bucket_lock_block() -> None:
+    lock = BucketLock()
+    lock.ingest_ratelimit_header(_headers(remaining=5, reset_after=10))
+    lock.block(0.1)
+    assert lock.locked
+
+    start = time.monotonic()
+    async with lock:
+        assert time.monotonic() - start >= 0.09
+
+
+def test_bucket_registry() -> None:
+    registry = BucketRegistry(ttl=3600, soft_limit=2, hard_limit=3)
+    for channel_id in range(5):
+        registry[f"GET/channels/{channel_id}"] = "".join(["hash", "1"])
+
+    # the least recently used routes are evicted, and every route shares one interned hash
+    assert len(registry) == 3
+    assert registry.evictions == 2
+    assert registry.get("GET/channels/0") is None
+    assert registry.get("GET/channels/4") is registry.get("GET/channels/3")
+    assert registry.hit_rate == 2 / 3
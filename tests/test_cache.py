@@ -1,12 +1,29 @@
+import asyncio
+
 import discord_typings
 import pytest
 
+from naff.api.events import GuildMembersChunk
 from naff.client.client import Client
+from naff.client.const import MISSING
 from naff.models.discord.channel import DM, GuildText
 from naff.models.discord.snowflake import to_snowflake
+from naff.models.naff.listener import Listener
 from tests.consts import SAMPLE_DM_DATA, SAMPLE_GUILD_DATA, SAMPLE_USER_DATA
 
-__all__ = ("bot", "test_dm_channel", "test_get_user_from_dm", "test_guild_channel", "test_update_guild")
+__all__ = (
+    "bot",
+    "test_dm_channel",
+    "test_get_user_from_dm",
+    "test_guild_channel",
+    "test_update_guild",
+    "test_incremental_guild_create",
+    "test_deferred_guild_members",
+    "test_member_chunks",
+    "test_parallel_http_chunk",
+    "test_fetch_coalescing",
+    "test_fetch_coalescing_failure",
+)
 
 
 @pytest.fixture()
@@ -57,3 +74,138 @@ def test_update_guild(bot: Client) -> None:
     data["mfa_level"] = 1
     bot.cache.place_guild_data(data)
     assert guild.mfa_level == 1
+
+
+def _guild_with_members(count: int) -> dict:
+    members = [
+        {
+            "user": SAMPLE_USER_DATA() | {"id": str(1000 + i)},
+            "roles": [],
+            "joined_at": "2022-07-16T20:56:55.999419+00:00",
+        }
+        for i in range(count)
+    ]
+    return SAMPLE_GUILD_DATA() | {"members": members}
+
+
+@pytest.mark.asyncio
+async def test_incremental_guild_create(bot: Client) -> None:
+    guild = await bot.cache.place_guild_data_incremental(_guild_with_members(250), slice_size=100)
+    assert guild.members_loaded.is_set()
+    assert len(guild._member_ids) == 250
+    assert bot.cache.get_member(guild.id, 1249) is not None
+
+
+@pytest.mark.asyncio
+async def test_deferred_guild_members(bot: Client) -> None:
+    guild = await bot.cache.place_guild_data_incremental(_guild_with_members(250), slice_size=100, defer_members=True)
+    assert bot.cache.get_guild(guild.id) is guild
+    assert not guild.members_loaded.is_set()
+    assert len(guild._member_ids) == 0
+
+    # a member received after GUILD_CREATE is not overwritten by its stale data
+    newer = SAMPLE_USER_DATA() | {"id": "1000"}
+    bot.cache.place_member_data(guild.id, {"user": newer, "roles": [], "nick": "newer"})
+
+    bot._ready.set()
+    await asyncio.wait_for(guild.members_loaded.wait(), 5)
+    assert len(guild._member_ids) == 250
+    assert bot.cache.get_member(guild.id, 1000).nick == "newer"
+
+
+@pytest.mark.asyncio
+async def test_member_chunks(bot: Client) -> None:
+    guild = bot.cache.place_guild_data(SAMPLE_GUILD_DATA())
+    received: list[GuildMembersChunk] = []
+
+    async def on_chunk(event: GuildMembersChunk) -> None:
+        received.append(event)
+
+    bot.add_listener(Listener(on_chunk, "guild_members_chunk", delay_until_ready=False))
+
+    members = _guild_with_members(200)["members"]
+    for index in range(2):
+        chunk_members = members[index * 100 : (index + 1) * 100]
+        presences = [{"user": {"id": m["user"]["id"]}, "status": "online"} for m in chunk_members[:10]]
+        await guild.process_member_chunk(
+            {"members": chunk_members, "presences": presences, "chunk_index": index, "chunk_count": 2}
+        )
+        # members are cached as each chunk arrives
+        assert len(guild._member_ids) == (index + 1) * 100
+        assert guild.chunked.is_set() == (index == 1)
+
+    await asyncio.sleep(0)
+    assert [event.chunk_index for event in received] == [0, 1]
+    assert len(received[1].members) == 100
+    assert guild._chunk_progress == {}
+
+
+@pytest.mark.asyncio
+async def test_parallel_http_chunk(bot: Client) -> None:
+    guild = bot.cache.place_guild_data(SAMPLE_GUILD_DATA())
+    # most users are recent, so the ranges are uneven
+    user_ids = sorted({(i**3) << 22 for i in range(1, 3000)} | {1 << 60, (1 << 60) + 1})
+    requests = []
+
+    async def list_members(guild_id, limit: int = 1, after=None) -> list:
+        requests.append(after)
+        after = int(after or 0)
+        ids = [user_id for user_id in user_ids if user_id > after][:limit]
+        return [{"user": SAMPLE_USER_DATA() | {"id": str(user_id)}, "roles": []} for user_id in ids]
+
+    bot.http.list_members = list_members
+    guild.member_count = len(user_ids)
+    await guild.http_chunk(concurrency=4)
+
+    assert guild.chunked.is_set()
+    assert guild._member_ids == set(user_ids)
+    assert len(requests) < len(user_ids) // 1000 + 12
+
+    # a guild whose members fit in one page is not split, as every range costs a request
+    small = bot.cache.place_guild_data(SAMPLE_GUILD_DATA() | {"id": "1", "member_count": 999})
+    user_ids = user_ids[:999]
+    requests.clear()
+    await small.http_chunk(concurrency=4)
+    assert small._member_ids == set(user_ids)
+    assert requests[0] is MISSING
+    assert all(int(after) in user_ids for after in requests[1:])
+
+
+@pytest.mark.asyncio
+async def test_fetch_coalescing(bot: Client) -> None:
+    requests = []
+
+    async def get_user(user_id) -> dict:
+        requests.append(user_id)
+        await asyncio.sleep(0.01)
+        return SAMPLE_USER_DATA() | {"id": str(user_id)}
+
+    bot.http.get_user = get_user
+    users = await asyncio.gather(*(bot.cache.fetch_user(123) for _ in range(10)), bot.cache.fetch_user(456))
+
+    assert requests == [123, 456]
+    assert all(user is users[0] for user in users[:10])
+    assert bot.cache._fetches == {}
+
+
+@pytest.mark.asyncio
+async def test_fetch_coalescing_failure(bot: Client) -> None:
+    requests = []
+
+    class Missing(Exception):
+        pass
+
+    async def get_user(user_id) -> dict:
+        requests.append(user_id)
+        await asyncio.sleep(0.01)
+        raise Missing(user_id)
+
+    bot.http.get_user = get_user
+    results = await asyncio.gather(*(bot.cache.fetch_user(123) for _ in range(3)), return_exceptions=True)
+
+    assert requests == [123]
+    # every caller raises its own exception, caused by the one the fetch raised
+    assert all(isinstance(result, Missing) and result.args == (123,) for result in results)
+    assert len({id(result) for result in results}) == 3
+    assert results[0].__cause__ is results[1].__cause__
+    assert bot.cache._fetches == {}
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from naff.api.gateway.chunking import ChunkScheduler
+from naff.client.auto_shard_client import AutoShardedClient
+from naff.models.discord.guild import Guild
+from naff.models.discord.enums import Intents
+from tests.fake_gateway import FakeGateway, run_client
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_chunk_scheduler() -> None:
+    scheduler = ChunkScheduler(max_in_flight=1)
+
+    async with FakeGateway(guilds_per_shard=3, event_rate=0) as gateway:
+        bot = AutoShardedClient(
+            total_shards=2,
+            sync_interactions=False,
+            intents=Intents.DEFAULT | Intents.GUILD_MEMBERS,
+            fetch_members=True,
+            chunk_scheduler=scheduler,
+        )
+        async with run_client(bot, gateway):
+            pass
+
+    assert gateway.member_requests == 6
+    assert all(guild.chunked.is_set() for guild in bot.guilds)
+    progress = scheduler.progress
+    assert progress["completed"] == 6
+    assert progress["pending"] == progress["in_flight"] == progress["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_member_fetch_concurrency(monkeypatch) -> None:
+    used = []
+
+    async def http_chunk(self: Guild, concurrency: int = 1) -> None:
+        used.append(concurrency)
+        self.chunked.set()
+
+    monkeypatch.setattr(Guild, "http_chunk", http_chunk)
+
+    async with FakeGateway(guilds_per_shard=2) as gateway:
+        bot = AutoShardedClient(
+            total_shards=2,
+            sync_interactions=False,
+            intents=Intents.DEFAULT | Intents.GUILD_MEMBERS,
+            fetch_members=True,
+            member_fetch_concurrency=4,
+        )
+        async with run_client(bot, gateway):
+            pass
+
+    # startup chunking fetches the members of each guild in parallel ranges
+    assert used == [4] * 4
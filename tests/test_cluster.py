@@ -0,0 +1,105 @@
+import asyncio
+import logging
+
+import pytest
+
+from naff.api.gateway import identify
+from naff.client.cluster import Cluster, ClusterManager
+
+__all__ = ()
+
+
+class DummyClient:
+    def __init__(self, guild_count: int) -> None:
+        self.logger = logging.getLogger("naff.tests")
+        self.cache = type("DummyCache", (), {"guild_cache": dict.fromkeys(range(guild_count))})()
+
+
+def test_split_shards() -> None:
+    manager = ClusterManager(lambda: None, shards_per_cluster=4)
+    assert manager.split_shards(10) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    manager = ClusterManager(lambda: None, clusters=3)
+    assert manager.split_shards(10) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+@pytest.mark.asyncio
+async def test_cluster_query() -> None:
+    manager = ClusterManager(lambda: None, shards_per_cluster=1)
+    manager.cluster_shards = manager.split_shards(2)
+    server = await asyncio.start_server(manager._handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    clusters = [
+        Cluster(DummyClient(count), c_id, manager.cluster_shards, 2, port, manager._secret)
+        for c_id, count in enumerate((3, 4))
+    ]
+    for cluster in clusters:
+        await cluster.connect()
+    while len(manager._clusters) < 2:
+        await asyncio.sleep(0.01)
+
+    @clusters[1].register_handler()
+    async def echo(value: str) -> str:
+        return value
+
+    assert await clusters[0].guild_count() == 7
+    assert await clusters[0].query("echo", 1, value="naff") == {1: "naff"}
+
+    # clusters that fail to answer are left out of the count
+    async def broken() -> int:
+        raise RuntimeError("broken")
+
+    clusters[1].handlers["guild_count"] = broken
+    assert await clusters[0].guild_count() == 3
+
+    @clusters[1].register_handler()
+    async def hang() -> None:
+        await asyncio.sleep(10)
+
+    # a cluster that does not answer in time has no result
+    assert await asyncio.wait_for(clusters[0].query("hang", 1, timeout=0.1), 5) == {1: None}
+
+    # neither does one that disconnects mid-query
+    query = asyncio.create_task(clusters[0].query("hang", 1))
+    await asyncio.sleep(0.05)
+    await clusters[1].close()
+    assert await asyncio.wait_for(query, 5) == {1: None}
+    assert manager._pending == {}
+
+    # as are clusters that are not connected
+    while len(manager._clusters) > 1:
+        await asyncio.sleep(0.01)
+    assert await clusters[0].query("guild_count") == {0: 3}
+    assert await clusters[0].guild_count() == 3
+
+    for cluster in clusters:
+        await cluster.close()
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_cluster_identify(monkeypatch) -> None:
+    monkeypatch.setattr(identify, "IDENTIFY_INTERVAL", 0)
+    manager = ClusterManager(lambda: None, shards_per_cluster=1)
+    manager.cluster_shards = manager.split_shards(2)
+    server = await asyncio.start_server(manager._handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    clusters = [Cluster(DummyClient(0), c_id, manager.cluster_shards, 2, port, manager._secret) for c_id in range(2)]
+    for cluster in clusters:
+        await cluster.connect()
+
+    # both shards share a rate limit key, the second waits until the first has identified
+    await asyncio.wait_for(clusters[0].acquire_identify(0), 5)
+    second = asyncio.create_task(clusters[1].acquire_identify(1))
+    await asyncio.sleep(0.05)
+    assert not second.done()
+    await clusters[0].release_identify(0)
+    await asyncio.wait_for(second, 5)
+
+    # a cluster that disconnects before identifying does not hold up the others
+    await clusters[1].close()
+    await asyncio.wait_for(clusters[0].acquire_identify(0), 5)
+    await clusters[0].close()
+    server.close()
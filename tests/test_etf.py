@@ -0,0 +1,44 @@
+import pytest
+
+from naff.api.gateway import etf
+
+__all__ = ()
+
+
+def test_etf_round_trip() -> None:
+    payload = {
+        "op": 0,
+        "s": 2**20,
+        "t": "MESSAGE_CREATE",
+        "d": {
+            "id": 1012345678901234567,
+            "content": "hello 👋",
+            "tts": False,
+            "pinned": True,
+            "edited_timestamp": None,
+            "mentions": [],
+            "nested": [{"a": -1, "b": 1.5}, [1, 2, 300]],
+        },
+    }
+    assert etf.loads(etf.dumps(payload)) == payload
+
+
+def test_etf_decodes_erlang_terms() -> None:
+    # {op: 10, d: nil} with atom keys, as discord would send it
+    data = bytes([131, 116, 0, 0, 0, 2, 119, 2]) + b"op" + bytes([97, 10, 119, 1]) + b"d" + bytes([119, 3]) + b"nil"
+    assert etf.loads(data) == {"op": 10, "d": None}
+
+    # erlang encodes lists of small integers as STRING_EXT
+    assert etf.loads(bytes([131, 107, 0, 3, 1, 2, 3])) == [1, 2, 3]
+
+
+def test_etf_invalid_payload() -> None:
+    with pytest.raises(etf.ETFDecodeError):
+        etf.loads(b'{"op": 10}')
+
+
+def test_etf_truncated_payload() -> None:
+    data = etf.dumps({"op": 0, "s": 2**20, "d": [1, 2, 300]})
+    for end in range(1, len(data)):
+        with pytest.raises(etf.ETFDecodeError):
+            etf.loads(data[:end])
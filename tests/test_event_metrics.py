@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from naff.client.auto_shard_client import AutoShardedClient
+from naff.models.naff.listener import Listener
+from tests.fake_gateway import FakeGateway, run_client
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_event_metrics() -> None:
+    async def on_guild_join(event) -> None:
+        await asyncio.sleep(0)
+
+    async with FakeGateway(guilds_per_shard=3, event_rate=100) as gateway:
+        bot = AutoShardedClient(total_shards=2, sync_interactions=False, event_metrics=True)
+        bot.add_listener(Listener(on_guild_join, "guild_join", delay_until_ready=False))
+        async with run_client(bot, gateway):
+            await asyncio.sleep(0.1)
+
+    metrics = bot.get_event_metrics()
+    guild_create = metrics["events"]["GUILD_CREATE"]
+    assert set(guild_create) == {0, 1}
+    assert guild_create[0]["count"] == 3
+    assert guild_create[0]["decode"]["count"] == 3
+    assert guild_create[0]["processor"]["count"] == 3
+    assert metrics["events"]["PRESENCE_UPDATE"][1]["count"] > 0
+    assert sum(shard["count"] for shard in metrics["listeners"]["guild_join"].values()) == 6
+
+    text = bot.get_event_metrics(output="prometheus")
+    assert 'naff_gateway_events_total{event="GUILD_CREATE",shard="0"} 3' in text
+    assert "# TYPE naff_event_listener_seconds_total counter" in text
+    with pytest.raises(ValueError):
+        bot.get_event_metrics("json")
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from naff.api.gateway.session_store import FileSessionStore
+from naff.client.auto_shard_client import AutoShardedClient
+from naff.models.naff.listener import Listener
+from tests.fake_gateway import FakeGateway, run_client
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_fake_gateway_reconnects() -> None:
+    async with FakeGateway(guilds_per_shard=3, event_rate=200) as gateway:
+        bot = AutoShardedClient(total_shards=4, sync_interactions=False)
+        async with run_client(bot, gateway):
+            assert gateway.identifies == 4
+            assert len(bot.guilds) == 12
+            assert bot.shards[0].guild_progress == {"expected": 3, "received": 3, "unavailable": 0}
+            assert bot.get_shards_guild(2)[0].id in gateway.guild_ids(2, 4)
+
+            await gateway.send_reconnect(shard_id=1)
+            await gateway.wait_for(lambda: gateway.resumes == 1)
+
+            await gateway.invalidate_session(shard_id=3)
+            await gateway.wait_for_identifies(5)
+
+            # events keep flowing once every shard is back
+            sequence = bot.shards[3].gateway.sequence
+            await asyncio.sleep(0.1)
+            assert bot.shards[3].gateway.sequence > sequence
+
+
+@pytest.mark.asyncio
+async def test_fake_gateway_without_compression() -> None:
+    async with FakeGateway(guilds_per_shard=2) as gateway:
+        bot = AutoShardedClient(total_shards=2, sync_interactions=False, gateway_compression=None)
+        async with run_client(bot, gateway):
+            assert len(bot.guilds) == 4
+            assert all(not connection.compress_payloads for connection in gateway.connections)
+
+
+@pytest.mark.asyncio
+async def test_fake_gateway_cold_resume(tmp_path) -> None:
+    store = FileSessionStore(tmp_path)
+
+    async with FakeGateway(guilds_per_shard=2, event_rate=100) as gateway:
+        async with run_client(AutoShardedClient(total_shards=2, sync_interactions=False, session_store=store), gateway):
+            pass
+
+        # the next process resumes every shard, and starts up once they have all resumed
+        started = []
+        bot = AutoShardedClient(total_shards=2, sync_interactions=False, session_store=store)
+
+        async def on_startup() -> None:
+            started.append(bot.is_ready)
+
+        bot.add_listener(Listener(on_startup, "startup", delay_until_ready=False))
+        startup_tasks = []
+
+        async def startup_task() -> None:
+            startup_tasks.append(all(shard._shard_ready.is_set() for shard in bot.shards))
+
+        bot.async_startup_tasks.append(startup_task())
+        async with run_client(bot, gateway):
+            await asyncio.sleep(0)
+            assert gateway.resumes == 2 and gateway.identifies == 2
+            assert startup_tasks == [True]
+            assert started == [True]
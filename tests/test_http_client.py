@@ -0,0 +1,99 @@
+import asyncio
+import gc
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from naff.api.http.http_client import HTTPClient
+from naff.api.http.route import Route
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_gets() -> None:
+    http = HTTPClient()
+    sent = []
+
+    async def request(route: Route, *args, **kwargs) -> dict:
+        sent.append(route.method)
+        await asyncio.sleep(0.01)
+        return {"id": "1", "roles": []}
+
+    http._request = request
+    route = Route("GET", "/users/{user_id}", user_id=1)
+    first = asyncio.create_task(http.request(route))
+    others = [asyncio.create_task(http.request(route)) for _ in range(4)]
+    await asyncio.sleep(0)
+
+    # cancelling the caller that started the request does not cancel it for the others
+    first.cancel()
+    results = await asyncio.gather(*others, http.request(Route("PATCH", "/users/{user_id}", user_id=1), payload={}))
+
+    assert sent == ["GET", "PATCH"]
+    assert http.coalesced_requests == 4
+    assert all(result == {"id": "1", "roles": []} for result in results[:4])
+    # each caller may mutate its own copy
+    assert results[0]["roles"] is not results[1]["roles"]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_get_errors() -> None:
+    http = HTTPClient()
+
+    class Missing(Exception):
+        def __init__(self, route: Route) -> None:
+            super().__init__(f"{route} was not found")
+            self.route = route
+
+    async def request(route: Route, *args, **kwargs) -> dict:
+        await asyncio.sleep(0.01)
+        raise Missing(route)
+
+    http._request = request
+    route = Route("GET", "/users/{user_id}", user_id=1)
+    results = await asyncio.gather(*(http.request(route) for _ in range(3)), return_exceptions=True)
+
+    # every caller raises its own exception, with the same details
+    assert all(isinstance(result, Missing) and result.route is route for result in results)
+    assert len({id(result) for result in results}) == 3
+    assert results[1].__cause__ is results[0]
+    assert str(results[1]) == str(results[0])
+
+
+@pytest.mark.asyncio
+async def test_exhausted_bucket_outlives_requests(monkeypatch) -> None:
+    async def handle(request: web.Request) -> web.Response:
+        headers = {
+            "x-ratelimit-bucket": "bucket",
+            "x-ratelimit-limit": "1",
+            "x-ratelimit-remaining": "0",
+            "x-ratelimit-reset-after": "0.5",
+        }
+        return web.json_response({"id": "1"}, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/users/{user_id}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    monkeypatch.setattr(Route, "BASE", f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+
+    http = HTTPClient()
+    http._HTTPClient__session = aiohttp.ClientSession()
+    try:
+        route = Route("GET", "/users/{user_id}", user_id=1)
+        await http.request(route)
+        # nothing references the exhausted lock between requests but the client itself
+        gc.collect()
+        assert http.get_ratelimit(route).locked
+
+        start = time.monotonic()
+        await http.request(route)
+        assert time.monotonic() - start >= 0.3
+    finally:
+        await http.close()
+        await runner.cleanup()
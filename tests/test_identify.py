@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import ClientWebSocketResponse
+
+from naff.api.gateway import identify
+from naff.api.gateway.identify import IdentifyScheduler
+from naff.client.auto_shard_client import AutoShardedClient
+from tests.fake_gateway import FakeGateway, run_client
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_identify_concurrency(monkeypatch) -> None:
+    monkeypatch.setattr(identify, "IDENTIFY_INTERVAL", 0.1)
+    scheduler = IdentifyScheduler()
+    scheduler.update({"max_concurrency": 4, "total": 1000, "remaining": 1000, "reset_after": 0})
+
+    async def identify_shard(shard_id: int) -> None:
+        await scheduler.acquire(shard_id)
+        await scheduler.release(shard_id)
+
+    start = time.monotonic()
+    await asyncio.gather(*(identify_shard(shard_id) for shard_id in range(8)))
+
+    # two shards per key, so two windows rather than eight
+    assert 0.1 <= time.monotonic() - start < 0.2
+    assert scheduler.identified == 8
+    assert scheduler.remaining == 992
+
+
+@pytest.mark.asyncio
+async def test_identify_budget(monkeypatch) -> None:
+    monkeypatch.setattr(identify, "IDENTIFY_INTERVAL", 0)
+    scheduler = IdentifyScheduler()
+    scheduler.update({"max_concurrency": 2, "total": 5, "remaining": 1, "reset_after": 200})
+
+    async def identify_shard(shard_id: int) -> None:
+        await scheduler.acquire(shard_id)
+        await scheduler.release(shard_id)
+
+    start = time.monotonic()
+    await asyncio.gather(*(identify_shard(shard_id) for shard_id in range(3)))
+
+    # the budget ran out after the first identify, so the others had to wait for the reset
+    assert time.monotonic() - start >= 0.2
+    assert scheduler.remaining == 3
+
+
+@pytest.mark.asyncio
+async def test_identify_window_starts_when_sent(monkeypatch) -> None:
+    monkeypatch.setattr(identify, "IDENTIFY_INTERVAL", 0.1)
+    scheduler = IdentifyScheduler()
+
+    # the first shard takes a while to connect, the window of its key only starts once it has identified
+    await scheduler.acquire(0)
+    second = asyncio.create_task(scheduler.acquire(1))
+    await asyncio.sleep(0.1)
+    assert not second.done()
+    start = time.monotonic()
+    await scheduler.release(0)
+    await second
+    assert time.monotonic() - start >= 0.09
+    await scheduler.release(1)
+
+
+@pytest.mark.asyncio
+async def test_failed_connect_releases_identify() -> None:
+    async with FakeGateway() as gateway:
+        bot = AutoShardedClient(total_shards=2, sync_interactions=False)
+        websocket_connect = bot.http.websocket_connect
+        attempts = []
+
+        async def flaky_connect(url: str) -> ClientWebSocketResponse:
+            attempts.append(url)
+            if len(attempts) == 1:
+                raise OSError("connection refused")
+            return await websocket_connect(url)
+
+        bot.http.websocket_connect = flaky_connect
+        async with run_client(bot, gateway, wait_until_ready=False):
+            # the shard that failed to connect does not keep the other waiting on its identify slot
+            await gateway.wait_for_identifies(1)
+            assert bot.identify_scheduler._held == {}
+
+
+@pytest.mark.asyncio
+async def test_connect_after_identify_slot() -> None:
+    idle = []
+
+    async def sample(gateway: FakeGateway) -> None:
+        while True:
+            idle.append(sum(connection.session is None for connection in gateway.connections))
+            await asyncio.sleep(0.01)
+
+    async with FakeGateway() as gateway:
+        sampler = asyncio.create_task(sample(gateway))
+        try:
+            async with run_client(
+                AutoShardedClient(total_shards=4, sync_interactions=False), gateway, identify_interval=0.1
+            ):
+                pass
+        finally:
+            sampler.cancel()
+
+    # shards only connect once they may identify, so they are never left waiting on an open connection
+    assert max(idle) <= 1
@@ -0,0 +1,47 @@
+import aiohttp
+import pytest
+from aiohttp import web
+
+from naff.client.utils.input_utils import response_decode
+
+__all__ = ()
+
+
+_RESPONSES = {
+    "/json": (b'[{"id": "1"}]', "application/json; charset=utf-8"),
+    "/problem": (b'{"code": 0}', "application/problem+json"),
+    "/latin": ("caf\xe9".encode("latin-1"), "text/plain; charset=latin-1"),
+    "/unknown-charset": (b"naff", "text/plain; charset=not-a-charset"),
+    "/invalid-bytes": (b"naff\xff", "text/plain; charset=utf-8"),
+}
+
+
+@pytest.mark.asyncio
+async def test_response_decode() -> None:
+    async def handle(request: web.Request) -> web.Response:
+        body, content_type = _RESPONSES[request.path]
+        return web.Response(body=body, headers={"Content-Type": content_type})
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    async def fetch(path: str) -> dict | list | str:
+        async with session.get(f"http://127.0.0.1:{port}{path}") as response:
+            return await response_decode(response)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            # parameters of the content type do not stop a body being decoded as JSON
+            assert await fetch("/json") == [{"id": "1"}]
+            assert await fetch("/problem") == {"code": 0}
+            assert await fetch("/latin") == "caf\xe9"
+            # a bad charset never fails the request
+            assert await fetch("/unknown-charset") == "naff"
+            assert await fetch("/invalid-bytes") == "naff�"
+    finally:
+        await runner.cleanup()
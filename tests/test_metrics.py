@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from naff.client.utils.metrics import Histogram, LoopMonitor
+
+__all__ = ()
+
+
+def test_histogram() -> None:
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    data = histogram.to_dict()
+    assert data["buckets"] == {"0.1": 1, "1": 3, "+Inf": 4}
+    assert data["count"] == 4
+    assert data["max"] == 3
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_stall() -> None:
+    monitor = LoopMonitor(interval=0.02, stall_threshold=0.1)
+    monitor.start()
+    await asyncio.sleep(0.05)
+
+    def block() -> None:
+        time.sleep(0.3)
+
+    block()
+    await asyncio.sleep(0.05)
+    monitor.stop()
+
+    assert monitor.stall_count == 1
+    stall = monitor.stalls[0]
+    assert stall.duration >= 0.1
+    assert "test_loop_monitor_stall" in stall.task
+    assert any("block" in line for line in stall.stack)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+
+import pytest
+
+from naff.api.gateway.pipeline import EventPipeline, EventPipelineConfig, OverflowPolicy
+
+__all__ = ()
+
+
+class DummyGateway:
+    def __init__(self) -> None:
+        self.logger = logging.getLogger("naff.tests")
+        self.shard = (0, 1)
+        self.release = asyncio.Event()
+        self.processed = []
+
+    async def dispatch_event(self, data, seq, event) -> None:
+        await self.release.wait()
+        self.processed.append(seq)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_drop() -> None:
+    gateway = DummyGateway()
+    pipeline = EventPipeline(gateway, EventPipelineConfig(max_size=2, workers=1, overflow="drop"))
+    pipeline.start()
+
+    # the third event blocks until the worker picks up the first
+    for seq in range(1, 4):
+        await pipeline.put({}, seq, "MESSAGE_CREATE")
+    await pipeline.put({}, 4, "TYPING_START")
+
+    assert pipeline.dropped["TYPING_START"] == 1
+    assert pipeline.depth == 2
+
+    gateway.release.set()
+    await pipeline._lanes[0].queue.join()
+    assert gateway.processed == [1, 2, 3]
+    await pipeline.stop()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_spill_keeps_order() -> None:
+    gateway = DummyGateway()
+    pipeline = EventPipeline(gateway, EventPipelineConfig(max_size=1, workers=2, overflow=OverflowPolicy.SPILL))
+    pipeline.start()
+
+    for seq in range(1, 11):
+        await pipeline.put({}, seq, "MESSAGE_CREATE")
+    assert pipeline.spilled > 0
+    assert pipeline.max_depth == 10
+
+    gateway.release.set()
+    while pipeline.processed < 10:
+        await asyncio.sleep(0)
+    assert sorted(gateway.processed) == list(range(1, 11))
+    assert pipeline.depth == 0
+    await pipeline.stop()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_ordered_lanes() -> None:
+    gateway = DummyGateway()
+    gateway.release.set()
+    pipeline = EventPipeline(gateway, EventPipelineConfig(max_size=100, workers=4, ordered=True))
+
+    guild_id = 701347683591389185
+    for seq in range(1, 21):
+        await pipeline.put({"guild_id": str(guild_id)}, seq, "GUILD_MEMBER_UPDATE")
+    await pipeline.put({"id": str(guild_id)}, 21, "GUILD_UPDATE")
+
+    # every event of the guild is routed to the same lane
+    assert sorted(pipeline.stats["lane_depths"]) == [0, 0, 0, 21]
+
+    pipeline.start()
+    while pipeline.processed < 21:
+        await asyncio.sleep(0)
+    assert gateway.processed == list(range(1, 22))
+    await pipeline.stop()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_ready_before_guilds() -> None:
+    class SlowLaneGateway(DummyGateway):
+        async def dispatch_event(self, data, seq, event) -> None:
+            if event == "SLOW":
+                await self.release.wait()
+            self.processed.append(event)
+
+    gateway = SlowLaneGateway()
+    pipeline = EventPipeline(gateway, EventPipelineConfig(max_size=100, workers=4, ordered=True))
+    pipeline.start()
+
+    # events without a guild or channel go to the first lane, which is stuck behind a slow event
+    await pipeline.put({}, 1, "SLOW")
+    await pipeline.put({"guilds": []}, 2, "READY")
+    guild_id = next(i << 22 for i in range(1, 100) if i % 4)
+    await pipeline.put({"id": str(guild_id)}, 3, "GUILD_CREATE")
+
+    while pipeline.processed < 1:
+        await asyncio.sleep(0)
+    assert gateway.processed == ["READY", "GUILD_CREATE"]
+
+    gateway.release.set()
+    while pipeline.processed < 2:
+        await asyncio.sleep(0)
+    assert gateway.processed == ["READY", "GUILD_CREATE", "SLOW"]
+    await pipeline.stop()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_drain() -> None:
+    config = EventPipelineConfig(max_size=1, workers=1, overflow="spill", drain_timeout=0.05)
+
+    for release, processed in ((False, []), (True, [1, 2, 3, 4, 5])):
+        gateway = DummyGateway()
+        pipeline = EventPipeline(gateway, config)
+        pipeline.start()
+        for seq in range(1, 6):
+            await pipeline.put({}, seq, "MESSAGE_CREATE")
+        if release:
+            asyncio.get_running_loop().call_later(0.01, gateway.release.set)
+
+        # events that could not be processed in time are reported, so that their sequence is not saved
+        assert await pipeline.stop(drain=True) is release
+        assert gateway.processed == processed
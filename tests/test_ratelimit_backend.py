@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+
+from naff.api.http.ratelimit import RateLimitCoordinator, SharedRateLimitBackend
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_shared_ratelimits(tmp_path) -> None:
+    path = str(tmp_path / "ratelimit.sock")
+
+    # without a coordinator, the backend falls back on local rate limits
+    offline = SharedRateLimitBackend(path)
+    await asyncio.wait_for(offline.acquire("bucket"), 1)
+    assert not offline.connected
+
+    coordinator = RateLimitCoordinator(path)
+    await coordinator.start()
+    first, second = SharedRateLimitBackend(path), SharedRateLimitBackend(path)
+    try:
+        await asyncio.wait_for(asyncio.gather(first.acquire("bucket"), second.acquire("bucket")), 1)
+        assert first.connected and second.connected
+        assert coordinator.global_lock.calls_remaining == 2
+
+        # a bucket blocked by one process waits in the others, other buckets do not
+        await first.block_bucket("bucket", 0.2)
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await asyncio.wait_for(second.acquire("other"), 1)
+        assert time.monotonic() - start < 0.1
+        await asyncio.wait_for(second.acquire("bucket"), 1)
+        assert time.monotonic() - start >= 0.1
+
+        # as does a global rate limit
+        await first.global_limited(0.2)
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await asyncio.wait_for(second.acquire(None), 1)
+        assert time.monotonic() - start >= 0.1
+    finally:
+        await first.close()
+        await second.close()
+        await coordinator.stop()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_grants(tmp_path) -> None:
+    path = str(tmp_path / "ratelimit.sock")
+    coordinator = RateLimitCoordinator(path)
+    await coordinator.start()
+    backend = SharedRateLimitBackend(path)
+    try:
+        coordinator.block_bucket("bucket", 0.2)
+        pending = [asyncio.create_task(backend.acquire("bucket")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+
+        # the requests of a process that went away must not use the shared budget
+        await backend.close()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await asyncio.sleep(0.3)
+        assert coordinator.global_lock.calls_remaining == 0
+    finally:
+        await backend.close()
+        await coordinator.stop()
@@ -0,0 +1,64 @@
+import pytest
+
+from naff.api.gateway.recorder import GatewayRecorder, read_recording, replay_recording
+from naff.client.client import Client
+from naff.client.const import MISSING
+from naff.client.utils.input_utils import OverriddenJson
+from naff.models.discord.channel import DM
+from naff.models.discord.snowflake import to_snowflake
+from tests.consts import SAMPLE_DM_DATA, SAMPLE_USER_DATA
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path) -> None:
+    path = tmp_path / "traffic.naffrec.gz"
+    recorder = GatewayRecorder(path)
+    recorder.record(0, {"op": 0, "s": 1, "t": "READY", "d": {"user": SAMPLE_USER_DATA()}})
+    recorder.record(1, {"op": 0, "s": 2, "t": "CHANNEL_CREATE", "d": SAMPLE_DM_DATA()})
+    recorder.close()
+
+    # appending continues the same recording
+    recorder.record(0, {"op": 0, "s": 3, "t": "TYPING_START", "d": {}})
+    recorder.close()
+
+    frames = list(read_recording(path))
+    assert [frame.shard_id for frame in frames] == [0, 1, 0]
+    assert frames[1].payload["d"] == SAMPLE_DM_DATA()
+
+    bot = Client()
+    stats = await replay_recording(bot, path, speed=None, shard_id=1)
+    assert stats["counts"] == {"CHANNEL_CREATE": 1}
+    assert isinstance(bot.cache.get_channel(to_snowflake(SAMPLE_DM_DATA()["id"])), DM)
+
+
+@pytest.mark.asyncio
+async def test_replay_sets_user(tmp_path) -> None:
+    path = tmp_path / "traffic.naffrec"
+    user = SAMPLE_USER_DATA() | {"verified": True, "mfa_enabled": False}
+    recorder = GatewayRecorder(path)
+    # raw payloads are recorded as received
+    recorder.record(0, '{"op": 0, "s": 1, "t": "READY", "d": {"user": %s}}' % OverriddenJson.dumps(user))
+    recorder.close()
+
+    bot = Client()
+    await replay_recording(bot, path, speed=None)
+    assert bot.user is not MISSING
+    assert bot.user.id == to_snowflake(user["id"])
+
+
+def test_truncated_recording(tmp_path) -> None:
+    path = tmp_path / "traffic.naffrec.gz"
+    recorder = GatewayRecorder(path, buffer_size=1024)
+    for sequence in range(500):
+        recorder.record(0, {"op": 0, "s": sequence, "t": "TYPING_START", "d": {"user_id": str(sequence)}})
+    recorder.close()
+
+    # a recorder that crashed leaves a compressed file without its end
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) // 2])
+
+    frames = list(read_recording(path))
+    assert 0 < len(frames) < 500
+    assert [frame.payload["s"] for frame in frames] == list(range(len(frames)))
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from naff.api.gateway.websocket import SendPriority, WebsocketRateLimit
+
+__all__ = ()
+
+
+@pytest.mark.asyncio
+async def test_send_priority() -> None:
+    # one token, refilled every 10ms
+    rate_limit = WebsocketRateLimit(rate=7, interval=0.06, burst=1)
+    sent = []
+
+    async def send(name: str, priority: SendPriority) -> None:
+        await rate_limit.rate_limit(priority)
+        sent.append(name)
+
+    await send("first", SendPriority.NORMAL)
+    tasks = [asyncio.create_task(send(f"member-{i}", SendPriority.BULK)) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(send("presence", SendPriority.URGENT)))
+    await asyncio.gather(*tasks)
+
+    # the presence update jumps the queue of member requests
+    assert sent == ["first", "presence", "member-0", "member-1", "member-2"]
+    stats = rate_limit.stats
+    assert stats["bulk"]["sent"] == 3
+    assert stats["bulk"]["max_wait"] > stats["urgent"]["max_wait"] > 0